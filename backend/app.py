@@ -11,6 +11,8 @@ from routes.auth import auth_bp
 from routes.students import students_bp
 from routes.attendance import attendance_bp
 from routes.admin import admin_bp
+from routes.stream import stream_bp
+from routes.jobs import jobs_bp
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -31,6 +33,8 @@ app.register_blueprint(auth_bp)
 app.register_blueprint(students_bp)
 app.register_blueprint(attendance_bp)
 app.register_blueprint(admin_bp)
+app.register_blueprint(stream_bp)
+app.register_blueprint(jobs_bp)
 
 # Root endpoint
 @app.route('/')
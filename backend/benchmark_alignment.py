@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""Measure landmark alignment cost against frames-until-marked
+
+Usage: python benchmark_alignment.py [max frames per student]   (default: 20)
+
+For every enrolled student with at least two crops in uploads/faces/<id>/,
+all crops but the last form the gallery and the last one is replayed as a
+live stream: each frame shows it with random in-plane rotation (up to
+MAX_ROLL degrees), scale and position. A student is "marked" on the first
+frame whose best match is that student under CNN_SIMILARITY_THRESHOLD.
+
+Runs once without and once with FACE_ALIGNMENT and reports the mean
+frames-until-marked, students never marked and crop extraction ms/face.
+Needs the pretrained FaceNet weights for meaningful numbers.
+"""
+
+import sys
+import os
+import glob
+import time
+import cv2
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from face_recognition.cnn_recognizer import CNNFaceRecognizer
+from face_recognition.gallery import EmbeddingGallery
+
+FRAME_SIZE = (640, 480)
+MAX_ROLL = 30  # Degrees of head tilt in the replayed stream
+SCALE_RANGE = (0.8, 1.6)
+
+
+def render_frame(crop, rng):
+    """Place a randomly rotated and scaled crop on a plain background"""
+    width, height = FRAME_SIZE
+    size = int(160 * rng.uniform(*SCALE_RANGE))
+    face = cv2.resize(crop, (size, size))
+    rotation = cv2.getRotationMatrix2D((size / 2, size / 2), rng.uniform(-MAX_ROLL, MAX_ROLL), 1.0)
+    face = cv2.warpAffine(face, rotation, (size, size), borderMode=cv2.BORDER_REPLICATE)
+
+    frame = np.full((height, width, 3), 128, dtype=np.uint8)
+    x = int(rng.integers(0, width - size))
+    y = int(rng.integers(0, height - size))
+    frame[y:y + size, x:x + size] = face
+    return frame
+
+
+def run(recognizer, students, max_frames, aligned):
+    """Returns (mean frames until marked, never marked, extraction ms/face)"""
+    Config.FACE_ALIGNMENT = aligned
+    detector = recognizer.detector
+    rng = np.random.default_rng(0)
+
+    # Gallery from the enrollment crops, extracted the same way as live frames
+    gallery = EmbeddingGallery()
+    for student_id, crops in students.items():
+        faces = []
+        for crop in crops[:-1]:
+            boxes = detector.detect_faces(crop)
+            if len(boxes):
+                faces.append(detector.extract_faces(crop, [max(boxes, key=lambda b: b[2] * b[3])])[0])
+            else:
+                faces.append(cv2.cvtColor(cv2.resize(crop, (160, 160)), cv2.COLOR_BGR2RGB))
+        gallery.add(student_id, recognizer.get_embeddings(faces))
+
+    frames_needed, never, extract_seconds, extracted = [], 0, 0.0, 0
+    for student_id, crops in students.items():
+        marked = None
+        for frame_idx in range(max_frames):
+            frame = render_frame(crops[-1], rng)
+            boxes = detector.detect_faces(frame)
+            if len(boxes) == 0:
+                continue
+
+            start = time.perf_counter()
+            faces = detector.extract_faces(frame, boxes)
+            extract_seconds += time.perf_counter() - start
+            extracted += len(faces)
+
+            for embedding in recognizer.get_embeddings(faces):
+                matches = gallery.search(embedding, k=1)
+                if matches and matches[0][0] == student_id and matches[0][1] < Config.CNN_SIMILARITY_THRESHOLD:
+                    marked = frame_idx + 1
+            if marked:
+                break
+
+        if marked:
+            frames_needed.append(marked)
+        else:
+            never += 1
+
+    mean_frames = np.mean(frames_needed) if frames_needed else float('nan')
+    return mean_frames, never, extract_seconds * 1000 / max(extracted, 1)
+
+
+max_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+students = {}
+for folder in sorted(glob.glob(os.path.join(Config.FACE_IMAGES_FOLDER, '*'))):
+    crops = [img for img in (cv2.imread(f) for f in sorted(glob.glob(os.path.join(folder, '*.jpg')))) if img is not None]
+    if len(crops) >= 2:
+        students[os.path.basename(folder)] = crops
+
+print("=" * 60)
+print("Face Alignment Benchmark")
+print(f"{len(students)} students, up to {max_frames} frames each, roll up to {MAX_ROLL} degrees")
+print("=" * 60)
+
+if not students:
+    print("\nNo students with at least two enrolled crops in", Config.FACE_IMAGES_FOLDER)
+    sys.exit(0)
+
+recognizer = CNNFaceRecognizer()
+for aligned in (False, True):
+    mean_frames, never, ms_per_face = run(recognizer, students, max_frames, aligned)
+    name = 'aligned' if aligned else 'unaligned'
+    print(f"\n{name:<10}: frames until marked={mean_frames:.2f}  never marked={never}  "
+          f"extraction={ms_per_face:.2f} ms/face")
+
+print("\n" + "=" * 60)
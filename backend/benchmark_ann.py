@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""Benchmark IVF approximate search against exact gallery search
+
+Usage: python benchmark_ann.py [gallery sizes...]   (default: 10000 100000 1000000)
+
+Uses synthetic FaceNet-like embeddings: every student has a random identity
+direction and several noisy enrollment shots; queries are new noisy shots.
+The 1M run needs roughly 3 GB of RAM.
+"""
+
+import sys
+import os
+import time
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from face_recognition.gallery import EmbeddingGallery, l2_normalize
+from face_recognition.ann_index import IVFIndex
+
+DIM = 512
+SHOTS_PER_STUDENT = 5
+NOISE = 0.6  # Per-shot noise relative to the identity vector
+NUM_QUERIES = 200
+NPROBES = [4, 8, 16, 32, 64]
+
+
+def make_gallery(n_rows, rng, chunk_size=100000):
+    """Synthetic gallery of n_rows embeddings plus the identity vectors"""
+    n_students = n_rows // SHOTS_PER_STUDENT
+    identities = l2_normalize(rng.standard_normal((n_students, DIM), dtype=np.float32))
+
+    matrix = np.empty((n_students * SHOTS_PER_STUDENT, DIM), dtype=np.float32)
+    row_labels = np.repeat(np.arange(n_students, dtype=np.int32), SHOTS_PER_STUDENT)
+    for start in range(0, len(matrix), chunk_size):
+        stop = min(start + chunk_size, len(matrix))
+        noise = rng.standard_normal((stop - start, DIM), dtype=np.float32) * (NOISE / np.sqrt(DIM))
+        matrix[start:stop] = l2_normalize(identities[row_labels[start:stop]] + noise)
+
+    labels = [f"S{i:07d}" for i in range(n_students)]
+    return EmbeddingGallery(matrix, row_labels, labels), identities
+
+
+def make_queries(identities, rng):
+    picked = rng.choice(len(identities), size=NUM_QUERIES, replace=False)
+    noise = rng.standard_normal((NUM_QUERIES, DIM), dtype=np.float32) * (NOISE / np.sqrt(DIM))
+    return l2_normalize(identities[picked] + noise)
+
+
+def time_queries(search, queries):
+    """Returns (results, queries per second)"""
+    start = time.perf_counter()
+    results = [search(q) for q in queries]
+    elapsed = time.perf_counter() - start
+    return results, len(queries) / elapsed
+
+
+sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+rng = np.random.default_rng(0)
+
+print("=" * 60)
+print("IVF Approximate Search Benchmark")
+print("=" * 60)
+
+for n_rows in sizes:
+    gallery, identities = make_gallery(n_rows, rng)
+    queries = make_queries(identities, rng)
+
+    exact, exact_qps = time_queries(lambda q: gallery.search(q, k=1), queries)
+    exact_top1 = [r[0][0] for r in exact]
+
+    start = time.perf_counter()
+    index = IVFIndex.build(gallery.matrix)
+    build_seconds = time.perf_counter() - start
+
+    print(f"\n{len(gallery):,} embeddings, {index.n_lists} lists (build {build_seconds:.1f}s)")
+    print(f"  exact         : {exact_qps:8.1f} q/s")
+
+    for nprobe in NPROBES:
+        if nprobe > index.n_lists:
+            continue
+        approx, ann_qps = time_queries(
+            lambda q: gallery.search_rows(q, index.candidates(q, nprobe=nprobe), k=1),
+            queries
+        )
+        recall = np.mean([a and a[0][0] == e for a, e in zip(approx, exact_top1)])
+        print(f"  ivf nprobe={nprobe:<3}: {ann_qps:8.1f} q/s  recall@1={recall:.3f}  "
+              f"speed-up={ann_qps / exact_qps:.1f}x")
+
+    del gallery, index
+
+print("\n" + "=" * 60)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""Benchmark reduced-resolution frame decoding for 720p / 1080p / 4K uploads
+
+Usage: python benchmark_decode.py [repeats]   (default: 20)
+
+For each resolution a synthetic classroom-like JPEG is decoded three ways:
+full IMREAD_COLOR (the old path), the reduced detection decode alone (frames
+without faces, or skipped by the motion gate / tracker), and the reduced
+decode plus the full decode for face crops. Reports median decode and
+detection time, and the peak memory allocated per frame (tracemalloc sees
+the decoded arrays, not libjpeg's internal scratch buffers).
+"""
+
+import contextlib
+import io
+import sys
+import os
+import time
+import tracemalloc
+import cv2
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from face_recognition.frame_decode import EncodedFrame
+from face_recognition.mtcnn_detector import get_face_detector
+
+RESOLUTIONS = (('720p', 1280, 720), ('1080p', 1920, 1080), ('4K', 3840, 2160))
+
+
+def synthetic_frame(width, height):
+    """JPEG bytes of a noisy gradient with face-sized blobs (realistic entropy for the decoder)"""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    image = np.stack([x + 0 * y, (x + y) / 2, y + 0 * x], axis=-1)
+    image += rng.normal(0, 4, image.shape).astype(np.float32)
+    for _ in range(30):
+        cx, cy = int(rng.integers(0, width)), int(rng.integers(0, height))
+        radius = int(rng.integers(height // 30, height // 10))
+        cv2.circle(image, (cx, cy), radius, tuple(float(v) for v in rng.integers(60, 220, 3)), -1)
+    ok, encoded = cv2.imencode('.jpg', np.clip(image, 0, 255).astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+
+def measure(fn, repeats):
+    """(median ms, peak bytes) of fn()"""
+    fn()  # Warm-up
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return float(np.median(times)), peak
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    min_side = Config.REDUCED_DECODE_MIN_SIDE
+    detector = get_face_detector()
+
+    print("=" * 60)
+    print("REDUCED-RESOLUTION DECODE BENCHMARK")
+    print("=" * 60)
+    print(f"Repeats: {repeats}, REDUCED_DECODE_MIN_SIDE: {min_side}\n")
+
+    def full_decode(data):
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+    def reduced_and_full(data):
+        frame = EncodedFrame(data, min_side)
+        frame.full()
+        return frame
+
+    for label, width, height in RESOLUTIONS:
+        data = synthetic_frame(width, height)
+        frame = EncodedFrame(data, min_side)
+        full = full_decode(data)
+
+        print(f"{label} ({width}x{height}, {len(data) / 1024:.0f} KB JPEG) -> "
+              f"1/{frame.factor} decode {frame.image.shape[1]}x{frame.image.shape[0]}")
+        rows = [
+            ('full decode', lambda: full_decode(data)),
+            ('reduced decode', lambda: EncodedFrame(data, min_side)),
+            ('reduced + full for crops', lambda: reduced_and_full(data))
+        ]
+        for name, fn in rows:
+            ms, peak = measure(fn, repeats)
+            print(f"  {name:<26} {ms:7.2f} ms   peak {peak / 1024 / 1024:6.2f} MB")
+
+        with contextlib.redirect_stdout(io.StringIO()):  # Detector rejection logs
+            detect_full, _ = measure(lambda: detector.detect_faces(full), repeats)
+            detect_reduced, _ = measure(lambda: detector.detect_faces(frame.image), repeats)
+        print(f"  {'detect on full frame':<26} {detect_full:7.2f} ms")
+        print(f"  {'detect on reduced frame':<26} {detect_reduced:7.2f} ms\n")
+
+
+if __name__ == "__main__":
+    main()
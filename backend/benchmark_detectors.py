@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""Benchmark the DNN, Haar and MTCNN face detectors on multi-face frames
+
+Usage: python benchmark_detectors.py [frames]   (default: 10)
+
+Frames are 1280x720 collages of enrolled face crops (uploads/faces/<id>/*.jpg)
+at random sizes, so the ground-truth boxes are known. Reports ms/frame,
+recall and false positives per frame at IoU >= 0.4. Without enrolled crops
+only latency is reported. Detectors whose model files are missing are skipped.
+"""
+
+import sys
+import os
+import glob
+import time
+import cv2
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from face_recognition.mtcnn_detector import get_face_detector
+from face_recognition.tracker import box_iou
+
+FRAME_SIZE = (1280, 720)
+FACES_PER_FRAME = 12
+FACE_SIZES = (48, 200)  # Pasted crop side range in pixels
+CROP_PADDING = 1.2  # Saved crops are the face box plus 10% padding per side
+IOU_MATCH = 0.4
+
+
+def make_frames(n_frames, crops, rng):
+    """Collages of face crops on a textured background with their face boxes"""
+    width, height = FRAME_SIZE
+    frames = []
+    for _ in range(n_frames):
+        noise = rng.integers(60, 200, size=(height // 8, width // 8, 3), dtype=np.uint8)
+        frame = cv2.resize(noise, FRAME_SIZE, interpolation=cv2.INTER_CUBIC)
+        truth = []
+        if crops:
+            cols, rows = 6, 2
+            cell_w, cell_h = width // cols, height // rows
+            for k in range(FACES_PER_FRAME):
+                size = int(rng.integers(FACE_SIZES[0], min(FACE_SIZES[1], cell_w, cell_h)))
+                x = (k % cols) * cell_w + int(rng.integers(0, cell_w - size + 1))
+                y = (k // cols % rows) * cell_h + int(rng.integers(0, cell_h - size + 1))
+                crop = crops[int(rng.integers(len(crops)))]
+                frame[y:y + size, x:x + size] = cv2.resize(crop, (size, size))
+                face = size / CROP_PADDING
+                offset = (size - face) / 2
+                truth.append([x + offset, y + offset, face, face])
+        frames.append((frame, np.array(truth)))
+    return frames
+
+
+def evaluate(detector, frames):
+    """Returns (ms per frame, recall or None, false positives per frame)"""
+    found = total = false_positives = 0
+    elapsed = 0.0
+    for frame, truth in frames:
+        start = time.perf_counter()
+        boxes = detector.detect_faces(frame)
+        elapsed += time.perf_counter() - start
+
+        boxes = np.array([np.asarray(b, dtype=np.float32) for b in boxes]).reshape(-1, 4)
+        matched = np.zeros(len(boxes), dtype=bool)
+        if len(truth) and len(boxes):
+            iou = box_iou(truth, boxes)
+            for t in range(len(truth)):
+                candidates = np.flatnonzero((iou[t] >= IOU_MATCH) & ~matched)
+                if len(candidates):
+                    matched[candidates[np.argmax(iou[t, candidates])]] = True
+                    found += 1
+        total += len(truth)
+        false_positives += int((~matched).sum())
+
+    recall = found / total if total else None
+    return elapsed * 1000 / len(frames), recall, false_positives / len(frames)
+
+
+n_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+rng = np.random.default_rng(0)
+crop_files = sorted(glob.glob(os.path.join(Config.FACE_IMAGES_FOLDER, '*', '*.jpg')))
+crops = [img for img in (cv2.imread(f) for f in crop_files) if img is not None]
+frames = make_frames(n_frames, crops, rng)
+
+print("=" * 60)
+print("Face Detector Benchmark")
+print(f"{n_frames} frames of {FRAME_SIZE[0]}x{FRAME_SIZE[1]}, "
+      f"{FACES_PER_FRAME if crops else 0} faces each ({len(crops)} enrolled crops)")
+print("=" * 60)
+
+for method in ('dnn', 'haar', 'mtcnn'):
+    detector = get_face_detector(min_confidence=0.5, method=method)
+    if method == 'dnn' and not detector.use_dnn:
+        print(f"\n{method:<6}: skipped (DNN model files missing)")
+        continue
+    if method == 'mtcnn' and detector.mtcnn_pool is None:
+        print(f"\n{method:<6}: skipped (MTCNN weights missing)")
+        continue
+
+    detector.detect_faces(frames[0][0])  # Warm-up
+    ms, recall, false_positives = evaluate(detector, frames)
+    recall_text = f"{recall:.3f}" if recall is not None else "n/a"
+    print(f"\n{method:<6}: {ms:8.1f} ms/frame  recall={recall_text}  false positives/frame={false_positives:.1f}")
+
+print("\n" + "=" * 60)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""Benchmark FaceNet CPU inference backends
+
+Usage: python benchmark_inference.py [batch sizes...]   (default: 1 8 32)
+
+Reports per-face latency, throughput and the cosine similarity to eager
+embeddings for every backend in CNN_INFERENCE_BACKEND's choices (int8 is
+calibrated on random images here; the server calibrates on enrolled faces).
+"""
+
+import sys
+import os
+import time
+import torch
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from face_recognition.facenet_model import get_facenet_model
+from face_recognition.inference_backend import INFERENCE_BACKENDS, build_backend, compare_embeddings
+
+WARMUP = 2
+MIN_FACES = 64  # Faces timed per batch size (at least 3 batches)
+
+
+def time_batches(model, batch_size):
+    """Returns (ms per face, faces per second)"""
+    faces = torch.rand(batch_size, 3, 160, 160) * 2 - 1
+    repeats = max(3, MIN_FACES // batch_size)
+    with torch.no_grad():
+        for _ in range(WARMUP):
+            model(faces)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model(faces)
+    elapsed = time.perf_counter() - start
+    n_faces = repeats * batch_size
+    return elapsed / n_faces * 1000, n_faces / elapsed
+
+
+batch_sizes = [int(arg) for arg in sys.argv[1:]] or [1, 8, 32]
+eager = get_facenet_model(pretrained='vggface2', device='cpu')
+
+print("=" * 60)
+print("FaceNet CPU Inference Benchmark")
+print(f"Threads: {torch.get_num_threads()}, batch sizes: {batch_sizes}")
+print("=" * 60)
+
+baseline = {}
+for backend in INFERENCE_BACKENDS:
+    start = time.perf_counter()
+    model = build_backend(eager, backend)
+    build_seconds = time.perf_counter() - start
+    similarity = compare_embeddings(eager, model)
+
+    print(f"\n{backend} (build {build_seconds:.1f}s, min cosine vs eager {similarity:.5f})")
+    for batch_size in batch_sizes:
+        ms_per_face, faces_per_second = time_batches(model, batch_size)
+        baseline.setdefault(batch_size, ms_per_face)
+        print(f"  batch {batch_size:<3}: {ms_per_face:7.1f} ms/face  {faces_per_second:6.1f} faces/s  "
+              f"speed-up={baseline[batch_size] / ms_per_face:.2f}x")
+
+print("\n" + "=" * 60)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""Benchmark two-stage prototype search against exact gallery search
+
+Usage: python benchmark_prototypes.py [number of students...]   (default: 2000 20000)
+
+Synthetic FaceNet-like embeddings: every student has an identity direction
+and several noisy enrollment shots. Reports queries per second, top-1
+agreement with exact search and identification accuracy for 3/10/20 shots
+per student, with centroid and 3-medoid prototypes.
+"""
+
+import sys
+import os
+import time
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from face_recognition.gallery import EmbeddingGallery, l2_normalize
+from config import Config
+
+DIM = 512
+NOISE = 0.7  # Per-shot noise relative to the identity vector
+NUM_QUERIES = 300
+SHOTS = [3, 10, 20]
+PROTOTYPES = [1, 3]
+
+
+def make_gallery(n_students, shots, rng):
+    identities = l2_normalize(rng.standard_normal((n_students, DIM), dtype=np.float32))
+    row_labels = np.repeat(np.arange(n_students, dtype=np.int32), shots)
+    noise = rng.standard_normal((len(row_labels), DIM), dtype=np.float32) * (NOISE / np.sqrt(DIM))
+    matrix = l2_normalize(identities[row_labels] + noise)
+    labels = [f"S{i:06d}" for i in range(n_students)]
+    return EmbeddingGallery(matrix, row_labels, labels), identities, labels
+
+
+def run(search, queries, truth):
+    """Returns (top-1 ids, queries per second, identification accuracy)"""
+    start = time.perf_counter()
+    results = [search(q) for q in queries]
+    qps = len(queries) / (time.perf_counter() - start)
+
+    top1 = [r[0][0] if r else None for r in results]
+    accepted = [r[0][0] if r and r[0][1] < Config.CNN_SIMILARITY_THRESHOLD else None for r in results]
+    accuracy = np.mean([a == t for a, t in zip(accepted, truth)])
+    return top1, qps, accuracy
+
+
+students = [int(arg) for arg in sys.argv[1:]] or [2000, 20000]
+rng = np.random.default_rng(0)
+
+print("=" * 60)
+print("Two-Stage Prototype Search Benchmark")
+print(f"Threshold: {Config.CNN_SIMILARITY_THRESHOLD}, shortlist: {Config.CNN_PROTOTYPE_SHORTLIST}")
+print("=" * 60)
+
+for n_students in students:
+    for shots in SHOTS:
+        gallery, identities, labels = make_gallery(n_students, shots, rng)
+        picked = rng.choice(n_students, size=NUM_QUERIES, replace=False)
+        noise = rng.standard_normal((NUM_QUERIES, DIM), dtype=np.float32) * (NOISE / np.sqrt(DIM))
+        queries = l2_normalize(identities[picked] + noise)
+        truth = [labels[i] for i in picked]
+
+        exact, exact_qps, exact_acc = run(lambda q: gallery.search(q, k=1), queries, truth)
+        print(f"\n{n_students:,} students x {shots} shots = {len(gallery):,} embeddings")
+        print(f"  exact        : {exact_qps:8.1f} q/s  accuracy={exact_acc:.3f}")
+
+        for per_student in PROTOTYPES:
+            start = time.perf_counter()
+            gallery.build_prototypes(per_student)
+            build_seconds = time.perf_counter() - start
+
+            top1, qps, acc = run(
+                lambda q: gallery.search_prototypes(q, k=1, shortlist=Config.CNN_PROTOTYPE_SHORTLIST),
+                queries, truth
+            )
+            agreement = np.mean([a == e for a, e in zip(top1, exact)])
+            name = 'centroid' if per_student == 1 else f'{per_student}-medoids'
+            print(f"  {name:<13}: {qps:8.1f} q/s  accuracy={acc:.3f}  agreement={agreement:.3f}  "
+                  f"speed-up={qps / exact_qps:.1f}x  (build {build_seconds:.2f}s)")
+
+print("\n" + "=" * 60)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""Check that quantized gallery scans make the same decisions as float32
+
+Usage:
+    python check_quantized_parity.py --record   # Record an evaluation set
+    python check_quantized_parity.py            # Compare float32 / float16 / int8
+
+The evaluation set is recorded from the enrolled gallery: one embedding of
+every student with several shots is held out as a query, and every shot of
+a few students is held out as "unknown" queries. Without an enrolled
+gallery a synthetic FaceNet-like set is recorded instead.
+
+A decision is the top-1 student if its distance is under
+CNN_SIMILARITY_THRESHOLD, otherwise "no match". Exits with status 1 if any
+quantized decision differs from float32.
+"""
+
+import sys
+import os
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from face_recognition.gallery import EmbeddingGallery, l2_normalize, QUANTIZED_PRECISIONS
+from face_recognition.embedding_store import EmbeddingStore
+from config import Config
+
+EVAL_SET_PATH = os.path.join(Config.MODELS_FOLDER, 'quantized_eval_set.npz')
+UNKNOWN_FRACTION = 0.1  # Share of students held out entirely
+DIM = 512
+
+
+def synthetic_gallery(rng, n_students=2000, shots=5, noise=0.7):
+    identities = l2_normalize(rng.standard_normal((n_students, DIM), dtype=np.float32))
+    row_labels = np.repeat(np.arange(n_students, dtype=np.int32), shots)
+    jitter = rng.standard_normal((len(row_labels), DIM), dtype=np.float32) * (noise / np.sqrt(DIM))
+    matrix = l2_normalize(identities[row_labels] + jitter)
+    return EmbeddingGallery(matrix, row_labels, [f"S{i:06d}" for i in range(n_students)])
+
+
+def record(path):
+    rng = np.random.default_rng(0)
+    gallery, version = EmbeddingStore(Config.GALLERY_STORE_PATH).open_gallery()
+    source = f"gallery store version {version}"
+    if gallery.num_students < 2:
+        gallery, source = synthetic_gallery(rng), "synthetic"
+
+    gallery = gallery.compacted()
+    labels = np.asarray(gallery.row_labels)
+    unknown = rng.random(len(gallery.labels)) < UNKNOWN_FRACTION
+
+    # First row of every remaining student with more than one shot is a query
+    counts = np.bincount(labels, minlength=len(gallery.labels))
+    _, first_rows = np.unique(labels, return_index=True)
+    held_out = first_rows[(counts[labels[first_rows]] > 1) & ~unknown[labels[first_rows]]]
+
+    query_rows = np.concatenate([held_out, np.flatnonzero(unknown[labels])])
+    keep = np.ones(len(gallery), dtype=bool)
+    keep[query_rows] = False
+
+    np.savez(
+        path,
+        gallery=np.asarray(gallery.matrix[keep], dtype=np.float32),
+        gallery_labels=labels[keep],
+        queries=np.asarray(gallery.matrix[query_rows], dtype=np.float32),
+        query_labels=labels[query_rows],
+        student_ids=np.array(gallery.labels, dtype=str),
+        source=np.array(source)
+    )
+    print(f"✅ Recorded {len(query_rows)} queries against {int(keep.sum())} embeddings ({source}) to {path}")
+
+
+def decisions(gallery, queries):
+    """(student_id or None, distance) of every query"""
+    results = []
+    for query in queries:
+        matches = gallery.search(query, k=1, rerank=Config.CNN_QUANTIZED_RERANK)
+        student_id, distance = matches[0] if matches else (None, 2.0)
+        results.append((student_id if distance < Config.CNN_SIMILARITY_THRESHOLD else None, distance))
+    return results
+
+
+def check(path):
+    if not os.path.exists(path):
+        print(f"❌ No evaluation set at {path} (run with --record first)")
+        return 1
+
+    with np.load(path) as data:
+        student_ids = data['student_ids'].tolist()
+        gallery = EmbeddingGallery(data['gallery'], data['gallery_labels'], student_ids)
+        queries = data['queries']
+        truth = [student_ids[l] for l in data['query_labels']]
+        source = str(data['source'])
+        known = np.isin(data['query_labels'], data['gallery_labels'])
+
+    print("=" * 60)
+    print("Quantized Gallery Parity Check")
+    print(f"Set: {source}, {len(queries)} queries, {len(gallery):,} embeddings")
+    print(f"Threshold: {Config.CNN_SIMILARITY_THRESHOLD}, re-rank: {Config.CNN_QUANTIZED_RERANK}")
+    print("=" * 60)
+
+    reference = decisions(gallery, queries)
+    failed = False
+    for precision in ('float32',) + QUANTIZED_PRECISIONS:
+        gallery.quantize(precision)
+        results = decisions(gallery, queries) if precision != 'float32' else reference
+
+        correct = [
+            r[0] == (t if k else None) for r, t, k in zip(results, truth, known)
+        ]
+        mismatches = [i for i, (r, ref) in enumerate(zip(results, reference)) if r[0] != ref[0]]
+        drift = max(abs(r[1] - ref[1]) for r, ref in zip(results, reference))
+        memory = gallery.matrix.nbytes if gallery.quantized is None else gallery.quantized.nbytes
+
+        print(f"  {precision:<8}: accuracy={np.mean(correct):.4f}  mismatches={len(mismatches)}  "
+              f"max distance drift={drift:.2e}  scan memory={memory / 1e6:.1f} MB")
+        for i in mismatches[:10]:
+            print(f"      query {i}: float32={reference[i][0]} ({reference[i][1]:.4f}) "
+                  f"{precision}={results[i][0]} ({results[i][1]:.4f})")
+        failed = failed or bool(mismatches)
+
+    print("=" * 60)
+    print("❌ Quantized decisions differ from float32" if failed else "✅ All decisions match float32")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    path = next((arg for arg in sys.argv[1:] if not arg.startswith('--')), EVAL_SET_PATH)
+    if '--record' in sys.argv:
+        record(path)
+    else:
+        sys.exit(check(path))
@@ -24,6 +24,7 @@ class Config:
     UPLOAD_FOLDER = os.path.join(BASE_DIR, os.getenv('UPLOAD_FOLDER', 'uploads'))
     FACE_IMAGES_FOLDER = os.path.join(BASE_DIR, os.getenv('FACE_IMAGES_FOLDER', 'uploads/faces'))
     MODELS_FOLDER = os.path.join(BASE_DIR, os.getenv('MODELS_FOLDER', 'models'))
+    MAX_FRAME_UPLOAD_BYTES = int(os.getenv('MAX_FRAME_UPLOAD_BYTES', str(8 * 1024 * 1024)))  # Raw frame uploads (real-mark/frame, stream)
     
     # Face Recognition Configuration
     FACE_RECOGNITION_THRESHOLD = int(os.getenv('FACE_RECOGNITION_THRESHOLD', '110'))  # Increased to 110 for better matching
@@ -31,6 +32,48 @@ class Config:
     SCALE_FACTOR = float(os.getenv('SCALE_FACTOR', '1.05'))  # Reduced from 1.1 for better detection
     MIN_NEIGHBORS = int(os.getenv('MIN_NEIGHBORS', '3'))  # Reduced from 5 for more lenient detection
     
+    # Face detector: 'dnn' (OpenCV SSD, Haar fallback if the model files are
+    # missing), 'haar', or 'mtcnn' (P/R/O-Net with five-point landmarks)
+    FACE_DETECTOR = os.getenv('FACE_DETECTOR', 'dnn')
+    MTCNN_MIN_FACE_SIZE = int(os.getenv('MTCNN_MIN_FACE_SIZE', '20'))  # Smallest face in the image pyramid
+    
+    # Warp FaceNet crops to canonical eye/nose/mouth positions (O-Net landmarks
+    # with FACE_DETECTOR=mtcnn, eye cascade otherwise). Enrollment and matching
+    # must agree: retrain (train_cnn_model.py) after switching
+    FACE_ALIGNMENT = os.getenv('FACE_ALIGNMENT', 'False') == 'True'
+    
+    # Tiled DNN detection for large classroom frames: frames whose long side
+    # exceeds DNN_TILE_MIN_FRAME are also cut into overlapping tiles, all run
+    # in one batch and merged with NMS (small back-row faces survive)
+    DNN_TILED_DETECTION = os.getenv('DNN_TILED_DETECTION', 'False') == 'True'
+    DNN_TILE_SIZE = int(os.getenv('DNN_TILE_SIZE', '640'))  # Tile side in frame pixels
+    DNN_TILE_OVERLAP = float(os.getenv('DNN_TILE_OVERLAP', '0.25'))
+    DNN_TILE_MIN_FRAME = int(os.getenv('DNN_TILE_MIN_FRAME', '1280'))
+    DNN_TILE_NMS_THRESHOLD = float(os.getenv('DNN_TILE_NMS_THRESHOLD', '0.4'))
+    
+    # Decode uploaded frames at 1/2, 1/4 or 1/8 scale for detection (short side
+    # kept >= REDUCED_DECODE_MIN_SIDE); full resolution is decoded only to cut
+    # face crops. Ignored with DNN_TILED_DETECTION, which needs the full frame
+    REDUCED_DECODE = os.getenv('REDUCED_DECODE', 'True') == 'True'
+    REDUCED_DECODE_MIN_SIDE = int(os.getenv('REDUCED_DECODE_MIN_SIDE', '480'))
+    
+    # Smallest face (pixels) passed on to CNN recognition
+    CNN_MIN_FACE_SIZE = int(os.getenv('CNN_MIN_FACE_SIZE', '80'))
+    
+    # Face crop quality gates (face_recognition/quality.py): mean gray level,
+    # gray-level std (contrast) and Laplacian variance (sharpness)
+    FACE_QUALITY_MIN_BRIGHTNESS = float(os.getenv('FACE_QUALITY_MIN_BRIGHTNESS', '40'))
+    FACE_QUALITY_MAX_BRIGHTNESS = float(os.getenv('FACE_QUALITY_MAX_BRIGHTNESS', '220'))
+    FACE_QUALITY_MIN_CONTRAST = float(os.getenv('FACE_QUALITY_MIN_CONTRAST', '30'))
+    FACE_QUALITY_MIN_SHARPNESS = float(os.getenv('FACE_QUALITY_MIN_SHARPNESS', '100'))
+    CNN_MIN_FACE_QUALITY = float(os.getenv('CNN_MIN_FACE_QUALITY', '0.3'))  # Faces scoring below are not embedded
+    
+    # Same gates for the LBPH path (CLAHE-normalized 100x100 gray crops)
+    LBPH_QUALITY_MIN_BRIGHTNESS = float(os.getenv('LBPH_QUALITY_MIN_BRIGHTNESS', '30'))
+    LBPH_QUALITY_MAX_BRIGHTNESS = float(os.getenv('LBPH_QUALITY_MAX_BRIGHTNESS', '225'))
+    LBPH_QUALITY_MIN_CONTRAST = float(os.getenv('LBPH_QUALITY_MIN_CONTRAST', '20'))
+    LBPH_QUALITY_MIN_SHARPNESS = float(os.getenv('LBPH_QUALITY_MIN_SHARPNESS', '50'))
+    
     # Haar Cascade Path
     HAAR_CASCADE_PATH = os.path.join(BASE_DIR, 'data', 'haarcascade_frontalface_default.xml')
     
@@ -39,7 +82,8 @@ class Config:
     
     # CNN Model Paths
     CNN_MODEL_PATH = os.path.join(MODELS_FOLDER, 'facenet_model.pt')
-    EMBEDDINGS_PATH = os.path.join(MODELS_FOLDER, 'face_embeddings.pkl')
+    EMBEDDINGS_PATH = os.path.join(MODELS_FOLDER, 'face_embeddings.pkl')  # Legacy, migrated on first load
+    GALLERY_STORE_PATH = os.path.join(MODELS_FOLDER, 'gallery')  # Memory-mapped embedding store
     
     # Face Recognition Mode: 'lbph' or 'cnn'
     FACE_RECOGNITION_MODE = os.getenv('FACE_RECOGNITION_MODE', 'cnn')
@@ -50,6 +94,95 @@ class Config:
     # Prevents showing student names in empty spaces
     CNN_SIMILARITY_THRESHOLD = float(os.getenv('CNN_SIMILARITY_THRESHOLD', '0.35'))
     
+    # Maximum number of faces embedded together in one FaceNet forward pass
+    CNN_EMBEDDING_BATCH_SIZE = int(os.getenv('CNN_EMBEDDING_BATCH_SIZE', '32'))
+    
+    # FaceNet CPU inference backend: 'eager', 'torchscript' (BatchNorm folded,
+    # traced and frozen) or 'int8' (static int8 convs/linears, calibrated on up
+    # to CNN_INT8_CALIBRATION_IMAGES enrolled face images at startup).
+    # Falls back to eager if the startup self-check drops below the cosine floor
+    CNN_INFERENCE_BACKEND = os.getenv('CNN_INFERENCE_BACKEND', 'eager')
+    CNN_BACKEND_MIN_COSINE = float(os.getenv('CNN_BACKEND_MIN_COSINE', '0.995'))
+    CNN_INT8_CALIBRATION_IMAGES = int(os.getenv('CNN_INT8_CALIBRATION_IMAGES', '64'))
+    
+    # Short-lived cache of whole-frame results keyed by perceptual hash, scoped
+    # to the session (client retries and repeated frames skip detection/FaceNet).
+    # Off by default: a stale "no match" would miss attendance
+    RESULT_CACHE = os.getenv('RESULT_CACHE', 'False') == 'True'
+    RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '1024'))  # Entries
+    RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', '2'))  # Seconds
+    RESULT_CACHE_MAX_DISTANCE = int(os.getenv('RESULT_CACHE_MAX_DISTANCE', '2'))  # Hash bits that may differ
+    RESULT_CACHE_MAX_PIXEL_DELTA = int(os.getenv('RESULT_CACHE_MAX_PIXEL_DELTA', '12'))  # Gray levels per 64x64 thumbnail pixel
+    
+    # Run enrollment embedding on a background job queue. Off by default:
+    # registration then answers 202 with modelTraining.jobId (poll
+    # /api/jobs/<id>) instead of 201 once the student is enrolled
+    BACKGROUND_JOBS = os.getenv('BACKGROUND_JOBS', 'False') == 'True'
+    
+    # Live-session WebSocket stream (/ws/attendance/session/<id>)
+    STREAM_IDLE_TIMEOUT = float(os.getenv('STREAM_IDLE_TIMEOUT', '60'))  # Seconds without a frame before closing
+    STREAM_SESSION_REFRESH = float(os.getenv('STREAM_SESSION_REFRESH', '2'))  # Seconds between session (ROI) reloads
+    # Each open stream holds one gunicorn request thread (Procfile: --threads 12),
+    # so streams per worker are capped to keep threads free for the REST API
+    STREAM_MAX_CONNECTIONS = int(os.getenv('STREAM_MAX_CONNECTIONS', '4'))
+    SOCK_SERVER_OPTIONS = {'ping_interval': 25, 'max_message_size': MAX_FRAME_UPLOAD_BYTES}
+    
+    # Concurrency inside one worker process (threaded gunicorn workers):
+    # each request thread borrows a cv2 net/cascade from a pool of
+    # DETECTOR_POOL_SIZE, and at most CNN_EMBEDDER_CONCURRENCY FaceNet
+    # forward passes run at once (the rest wait in line)
+    DETECTOR_POOL_SIZE = int(os.getenv('DETECTOR_POOL_SIZE', '2'))
+    CNN_EMBEDDER_CONCURRENCY = int(os.getenv('CNN_EMBEDDER_CONCURRENCY', '1'))
+    
+    # Micro-batching: crops from concurrent requests that queue up while a
+    # FaceNet pass is running share the next pass (at most
+    # CNN_EMBEDDING_BATCH_SIZE crops). Only while other passes are in flight
+    # does a request wait, up to CNN_MICRO_BATCH_WAIT_MS, for more crops
+    CNN_MICRO_BATCHING = os.getenv('CNN_MICRO_BATCHING', 'True') == 'True'
+    CNN_MICRO_BATCH_WAIT_MS = float(os.getenv('CNN_MICRO_BATCH_WAIT_MS', '5'))
+    
+    # Approximate nearest-neighbour search for very large galleries: 'none' or 'ivf'
+    # Exact search is used until the gallery has CNN_ANN_MIN_ROWS embeddings
+    CNN_ANN_INDEX = os.getenv('CNN_ANN_INDEX', 'none')
+    CNN_ANN_MIN_ROWS = int(os.getenv('CNN_ANN_MIN_ROWS', '50000'))
+    CNN_ANN_NPROBE = int(os.getenv('CNN_ANN_NPROBE', '16'))  # Higher = better recall, slower
+    ANN_INDEX_PATH = os.path.join(GALLERY_STORE_PATH, 'ivf_index.npz')
+    
+    # Two-stage search: per-student prototypes first, then re-rank the shortlist
+    # against every embedding of those students (1 prototype = centroid, >1 = k-medoids)
+    CNN_PROTOTYPE_SEARCH = os.getenv('CNN_PROTOTYPE_SEARCH', 'False') == 'True'
+    CNN_PROTOTYPES_PER_STUDENT = int(os.getenv('CNN_PROTOTYPES_PER_STUDENT', '1'))
+    CNN_PROTOTYPE_SHORTLIST = int(os.getenv('CNN_PROTOTYPE_SHORTLIST', '10'))
+    
+    # Gallery precision for the full scan: 'float32', 'float16' or 'int8'
+    # Quantized scans keep 2x/4x less in memory; the best CNN_QUANTIZED_RERANK
+    # rows are always re-scored in float32 before thresholding
+    CNN_GALLERY_PRECISION = os.getenv('CNN_GALLERY_PRECISION', 'float32')
+    CNN_QUANTIZED_RERANK = int(os.getenv('CNN_QUANTIZED_RERANK', '32'))
+    
+    # Match only against the session's department/year/division roster by default
+    CNN_ROSTER_SCOPED = os.getenv('CNN_ROSTER_SCOPED', 'True') == 'True'
+    ROSTER_CACHE_TTL = int(os.getenv('ROSTER_CACHE_TTL', '300'))  # Seconds before a roster is re-read
+    
+    # Cross-frame face tracking for live sessions: a face recognized as the same
+    # student TRACKER_CONFIRM_HITS frames in a row is not re-embedded until
+    # TRACKER_REVERIFY_FRAMES frames have passed
+    FACE_TRACKING = os.getenv('FACE_TRACKING', 'True') == 'True'
+    TRACKER_IOU_THRESHOLD = float(os.getenv('TRACKER_IOU_THRESHOLD', '0.3'))
+    TRACKER_MAX_MISSED = int(os.getenv('TRACKER_MAX_MISSED', '5'))  # Frames a lost face is kept
+    TRACKER_CONFIRM_HITS = int(os.getenv('TRACKER_CONFIRM_HITS', '2'))
+    TRACKER_REVERIFY_FRAMES = int(os.getenv('TRACKER_REVERIFY_FRAMES', '30'))
+    TRACKER_IDLE_TTL = int(os.getenv('TRACKER_IDLE_TTL', '600'))  # Seconds before an idle session tracker is dropped
+    
+    # Motion gating for live sessions: frames whose downscaled grayscale
+    # thumbnail barely changed reuse the last result; when less than
+    # MOTION_PARTIAL_FRACTION changed, only the changed regions are re-detected
+    MOTION_GATING = os.getenv('MOTION_GATING', 'True') == 'True'
+    MOTION_PIXEL_THRESHOLD = int(os.getenv('MOTION_PIXEL_THRESHOLD', '25'))  # Gray levels
+    MOTION_SKIP_FRACTION = float(os.getenv('MOTION_SKIP_FRACTION', '0.002'))
+    MOTION_PARTIAL_FRACTION = float(os.getenv('MOTION_PARTIAL_FRACTION', '0.25'))
+    MOTION_MAX_SKIPS = int(os.getenv('MOTION_MAX_SKIPS', '10'))  # Forced full pass after this many skips
+    
     # CORS Configuration
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
     
@@ -0,0 +1,141 @@
+"""
+Landmark-based face alignment for FaceNet crops
+Warps every face so its eyes, nose and mouth corners land on canonical
+positions of the 160x160 crop, reducing pose variation between frames
+"""
+
+import cv2
+import numpy as np
+
+# Canonical five-point layout (left eye, right eye, nose, left and right mouth
+# corner) of a 112x112 tight face crop, placed inside a 160x160 crop with the
+# same 10% margin per side as SimpleFaceDetector.extract_face
+_TEMPLATE_112 = np.array([
+    [38.2946, 51.6963],
+    [73.5318, 51.5014],
+    [56.0252, 71.7366],
+    [41.5493, 92.3655],
+    [70.7299, 92.2041]
+], dtype=np.float32)
+CROP_MARGIN = 0.1
+
+
+def canonical_landmarks(output_size=160):
+    """Target landmark positions for an output_size x output_size crop"""
+    inner = output_size / (1 + 2 * CROP_MARGIN)
+    return _TEMPLATE_112 * (inner / 112.0) + (output_size - inner) / 2
+
+
+def box_transforms(boxes, image_shape, output_size=160):
+    """
+    Affine matrices reproducing SimpleFaceDetector.extract_face
+
+    That crop pads the box by int(10% of its short side) per side, clips
+    the padded box to the frame and stretches it to output_size (cv2.resize
+    pixel-center convention).
+
+    Args:
+        boxes: (N, 4) face boxes [x, y, w, h]
+        image_shape: Frame shape (height, width, ...)
+        output_size: Crop side
+
+    Returns:
+        (N, 2, 3) float64 affine matrices mapping frame -> crop pixels
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4).astype(np.int64)
+    height, width = image_shape[:2]
+    x, y, w, h = boxes.T
+    padding = (np.minimum(w, h) * CROP_MARGIN).astype(np.int64)
+    x0 = np.maximum(0, x - padding)
+    y0 = np.maximum(0, y - padding)
+    crop_w = np.maximum(np.minimum(width - x0, w + 2 * padding), 1)
+    crop_h = np.maximum(np.minimum(height - y0, h + 2 * padding), 1)
+
+    scale_x = output_size / crop_w
+    scale_y = output_size / crop_h
+    matrices = np.zeros((len(boxes), 2, 3))
+    matrices[:, 0, 0] = scale_x
+    matrices[:, 0, 2] = (0.5 - x0) * scale_x - 0.5
+    matrices[:, 1, 1] = scale_y
+    matrices[:, 1, 2] = (0.5 - y0) * scale_y - 0.5
+    return matrices
+
+
+def similarity_transforms(landmarks, boxes, output_size=160, image_shape=None):
+    """
+    Least-squares similarity transforms (rotation, uniform scale, shift) for all faces at once
+
+    Faces with fewer than two valid landmarks get the same crop
+    SimpleFaceDetector.extract_face would cut (see box_transforms), so
+    they embed exactly like with alignment off.
+
+    Args:
+        landmarks: (N, 5, 2) landmark positions in frame pixels, NaN where unknown
+        boxes: (N, 4) face boxes [x, y, w, h]
+        output_size: Crop side
+        image_shape: Frame shape (needed for the fallback's clipping;
+            default: no clipping)
+
+    Returns:
+        (N, 2, 3) float32 affine matrices mapping frame -> crop pixels
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float64).reshape(-1, 5, 2)
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    target = canonical_landmarks(output_size).astype(np.float64)
+
+    valid = ~np.isnan(landmarks).any(axis=2)  # (N, 5)
+    weights = valid.astype(np.float64)
+    src = np.where(valid[..., None], landmarks, 0.0)
+    count = np.maximum(weights.sum(axis=1, keepdims=True), 1)
+
+    # Weighted centroids and centered points
+    src_mean = (src * weights[..., None]).sum(axis=1) / count
+    dst_mean = (target[None] * weights[..., None]).sum(axis=1) / count
+    p = (src - src_mean[:, None]) * weights[..., None]
+    q = (target[None] - dst_mean[:, None]) * weights[..., None]
+
+    # x' = a*x - b*y + tx, y' = b*x + a*y + ty
+    norm = np.maximum((p ** 2).sum(axis=(1, 2)), 1e-9)
+    a = (p[..., 0] * q[..., 0] + p[..., 1] * q[..., 1]).sum(axis=1) / norm
+    b = (p[..., 0] * q[..., 1] - p[..., 1] * q[..., 0]).sum(axis=1) / norm
+    tx = dst_mean[:, 0] - (a * src_mean[:, 0] - b * src_mean[:, 1])
+    ty = dst_mean[:, 1] - (b * src_mean[:, 0] + a * src_mean[:, 1])
+
+    matrices = np.empty((len(boxes), 2, 3), dtype=np.float32)
+    matrices[:, 0] = np.stack([a, -b, tx], axis=1)
+    matrices[:, 1] = np.stack([b, a, ty], axis=1)
+
+    # Box-only transform for faces without usable landmarks
+    fallback = valid.sum(axis=1) < 2
+    if fallback.any():
+        if image_shape is None:
+            image_shape = (np.iinfo(np.int32).max,) * 2
+        matrices[fallback] = box_transforms(boxes[fallback], image_shape, output_size)
+    return matrices
+
+
+def align_faces(image, boxes, landmarks, output_size=160):
+    """
+    Aligned RGB crops of all faces in a frame
+
+    Args:
+        image: BGR frame
+        boxes: (N, 4) face boxes [x, y, w, h]
+        landmarks: (N, 5, 2) landmarks in frame pixels (NaN where unknown)
+        output_size: Crop side (160 for FaceNet)
+
+    Returns:
+        List of (output_size, output_size, 3) RGB crops
+    """
+    if len(boxes) == 0:
+        return []
+
+    matrices = similarity_transforms(landmarks, boxes, output_size, image.shape)
+    crops = []
+    for matrix in matrices:
+        # warpAffine only samples the output pixels, so each warp is cheap
+        # regardless of the frame size
+        crop = cv2.warpAffine(image, matrix, (output_size, output_size),
+                              flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        crops.append(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+    return crops
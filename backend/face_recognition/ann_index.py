@@ -0,0 +1,153 @@
+"""
+IVF (inverted file) approximate nearest-neighbour index for large galleries
+A spherical k-means coarse quantizer splits the gallery rows into lists;
+a query only scores the rows of its `nprobe` closest lists
+"""
+
+import os
+import numpy as np
+from face_recognition.gallery import l2_normalize
+
+
+class IVFIndex:
+    """Coarse-quantized candidate generator over gallery row indices"""
+
+    def __init__(self, centroids=None, assignments=None, nprobe=8):
+        self.centroids = centroids  # (n_lists, D) unit vectors
+        self.assignments = assignments if assignments is not None else np.empty(0, dtype=np.int32)
+        self.nprobe = nprobe
+        self.source = {}  # Identifies the gallery generation this index was built for
+        self._lists = None  # CSR view: (offsets, rows), rebuilt lazily after inserts
+
+    @property
+    def n_lists(self):
+        return 0 if self.centroids is None else len(self.centroids)
+
+    def __len__(self):
+        return len(self.assignments)
+
+    # ------------------------------------------------------------------
+    # Build / insert
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, matrix, n_lists=None, nprobe=8, iterations=10, sample_size=65536, seed=0):
+        """
+        Train the coarse quantizer and assign every row
+
+        Args:
+            matrix: (N, D) L2-normalized embeddings (may be a memmap)
+            n_lists: Number of inverted lists (default: 4 * sqrt(N))
+            nprobe: Default number of lists probed per query
+            iterations: k-means iterations
+            sample_size: Rows used to train the centroids
+        """
+        n_rows = len(matrix)
+        if n_lists is None:
+            n_lists = int(4 * np.sqrt(n_rows))
+        n_lists = max(1, min(n_lists, n_rows))
+
+        rng = np.random.default_rng(seed)
+        sample_idx = np.sort(rng.choice(n_rows, size=min(sample_size, n_rows), replace=False))
+        sample = np.asarray(matrix[sample_idx], dtype=np.float32)
+
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=n_lists)
+
+            # Re-seed empty lists with random sample rows
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = l2_normalize(sums)
+
+        index = cls(centroids=centroids, nprobe=nprobe)
+        index.insert(matrix)
+        return index
+
+    def _assign(self, vectors, chunk_size=65536):
+        """Nearest centroid of each vector"""
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+            assignments[start:start + chunk_size] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return assignments
+
+    def insert(self, vectors):
+        """
+        Add rows appended to the gallery (row ids continue from len(self))
+
+        Args:
+            vectors: (M, D) L2-normalized embeddings
+        """
+        if len(vectors) == 0:
+            return
+        self.assignments = np.concatenate([self.assignments, self._assign(vectors)])
+        self._lists = None
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            rows = np.argsort(self.assignments, kind='stable').astype(np.int64)
+            offsets = np.searchsorted(self.assignments[rows], np.arange(self.n_lists + 1))
+            self._lists = (offsets, rows)
+        return self._lists
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def candidates(self, query, nprobe=None):
+        """
+        Gallery rows worth scoring exactly for a query
+
+        Args:
+            query: (D,) L2-normalized embedding
+            nprobe: Lists to probe (recall/latency knob, default self.nprobe)
+
+        Returns:
+            int64 array of row indices
+        """
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        centroid_scores = self.centroids @ query
+        if nprobe < self.n_lists:
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(self.n_lists)
+
+        offsets, rows = self._inverted_lists()
+        return np.concatenate([rows[offsets[p]:offsets[p + 1]] for p in probe])
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path):
+        """Atomically write the index to an .npz file"""
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            centroids=self.centroids,
+            assignments=self.assignments,
+            nprobe=np.int32(self.nprobe),
+            source_keys=np.array(list(self.source.keys()), dtype=str),
+            source_values=np.array([str(v) for v in self.source.values()], dtype=str)
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load an index written by save() (None if missing or unreadable)"""
+        try:
+            with np.load(path) as data:
+                index = cls(
+                    centroids=data['centroids'],
+                    assignments=data['assignments'],
+                    nprobe=int(data['nprobe'])
+                )
+                index.source = dict(zip(data['source_keys'].tolist(), data['source_values'].tolist()))
+            return index
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            return None
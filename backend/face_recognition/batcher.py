@@ -0,0 +1,181 @@
+"""
+Micro-batching scheduler for FaceNet forward passes
+Crops submitted by concurrent request threads while the model is busy are
+collected (up to max_batch crops, waiting at most max_wait_ms), run through
+the model in one forward pass, and the embedding rows are routed back to
+each caller. A request arriving at an idle model runs at once
+"""
+
+import bisect
+import collections
+import threading
+import time
+import torch
+
+# Histogram bucket upper bounds (inclusive); the last bucket is open-ended
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+QUEUE_DELAY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Fixed-bucket counter histogram"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+
+    def to_dict(self):
+        labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+        return dict(zip(labels, self.counts))
+
+
+class _Request:
+    __slots__ = ('tensor', 'enqueued', 'done', 'result', 'error')
+
+    def __init__(self, tensor):
+        self.tensor = tensor
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Collects embedding requests from many threads into shared forward passes
+
+    Worker threads (one per allowed concurrent forward pass) take the
+    oldest request and add every request already queued behind it. While
+    another forward pass is in flight they keep waiting for more, until
+    max_batch rows are collected or max_wait_ms has passed since the oldest
+    request arrived; with no pass in flight, waiting would only add latency.
+    """
+
+    def __init__(self, run_batch, max_batch=32, max_wait_ms=5.0, workers=1, name='batcher'):
+        """
+        Args:
+            run_batch: Callable(tensor (N, 3, 160, 160)) -> (N, D) numpy array
+            max_batch: Most rows per forward pass
+            max_wait_ms: Longest time the oldest request waits for company
+            workers: Forward passes that may run at once
+            name: Thread name prefix
+        """
+        self.run_batch = run_batch
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._lock = threading.Lock()
+        self._pending = collections.deque()  # Requests not yet in a batch, oldest first
+        self._arrived = threading.Condition(self._lock)
+        self._batches = 0
+        self._rows = 0
+        self._total_delay = 0.0
+        self._batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self._queue_delays = Histogram(QUEUE_DELAY_BUCKETS_MS)
+        self._in_flight = 0  # Forward passes running now
+
+        for i in range(max(1, int(workers))):
+            threading.Thread(target=self._run, name=f'{name}-{i}', daemon=True).start()
+
+    def submit(self, tensor):
+        """
+        Embed a stack of preprocessed crops, sharing the forward pass with other callers
+
+        Args:
+            tensor: (n, 3, 160, 160) float tensor
+
+        Returns:
+            (n, D) numpy array in input order
+        """
+        request = _Request(tensor)
+        with self._arrived:
+            self._pending.append(request)
+            self._arrived.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _next(self, timeout=None):
+        """Oldest pending request, or None on timeout (0: do not wait)"""
+        with self._arrived:
+            if not self._arrived.wait_for(lambda: self._pending, timeout=timeout):
+                return None
+            return self._pending.popleft()
+
+    def _collect(self):
+        """Block for the oldest request, then gather queued ones (waiting only while the model is busy)"""
+        first = self._next()
+        batch = [first]
+        rows = len(first.tensor)
+        deadline = first.enqueued + self.max_wait
+
+        while rows < self.max_batch:
+            with self._lock:
+                busy = self._in_flight > 0
+            timeout = max(0.0, deadline - time.perf_counter()) if busy else 0
+            request = self._next(timeout=timeout)
+            if request is None:
+                break
+            if rows + len(request.tensor) > self.max_batch:
+                # Too big for this pass: back to the front, so it leads the next batch
+                # (an idle worker can take it right away, ahead of newer arrivals)
+                with self._arrived:
+                    self._pending.appendleft(request)
+                    self._arrived.notify()
+                break
+            batch.append(request)
+            rows += len(request.tensor)
+        return batch, rows
+
+    def _run(self):
+        while True:
+            batch, rows = self._collect()
+            started = time.perf_counter()
+            with self._lock:
+                self._in_flight += 1
+
+            try:
+                tensor = batch[0].tensor if len(batch) == 1 else torch.cat([r.tensor for r in batch])
+                output = self.run_batch(tensor)
+                offset = 0
+                for request in batch:
+                    request.result = output[offset:offset + len(request.tensor)]
+                    offset += len(request.tensor)
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+
+            with self._lock:
+                self._in_flight -= 1
+                self._batches += 1
+                self._rows += rows
+                self._batch_sizes.add(rows)
+                for request in batch:
+                    delay = (started - request.enqueued) * 1000
+                    self._total_delay += delay
+                    self._queue_delays.add(delay)
+
+            for request in batch:
+                request.done.set()
+
+    def get_stats(self):
+        """
+        Returns:
+            Dict with batches, rows, requests, avg batch size, avg queue delay and both histograms
+        """
+        with self._lock:
+            requests = sum(self._queue_delays.counts)
+            return {
+                'max_batch': self.max_batch,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+                'batches': self._batches,
+                'rows': self._rows,
+                'requests': requests,
+                'avg_batch_size': round(self._rows / self._batches, 2) if self._batches else 0.0,
+                'avg_queue_delay_ms': round(self._total_delay / requests, 3) if requests else 0.0,
+                'batch_size_histogram': self._batch_sizes.to_dict(),
+                'queue_delay_histogram_ms': self._queue_delays.to_dict()
+            }
@@ -7,17 +7,37 @@ import torch
 import torch.nn.functional as F
 import cv2
 import numpy as np
+import copy
 import os
-import pickle
+import threading
+import time
 from config import Config
 from models.student import Student
 from face_recognition.facenet_model import get_facenet_model
+from face_recognition.inference_backend import load_inference_model
 from face_recognition.mtcnn_detector import get_face_detector
-from sklearn.metrics.pairwise import cosine_similarity
+from face_recognition.gallery import EmbeddingGallery
+from face_recognition.embedding_store import EmbeddingStore
+from face_recognition.ann_index import IVFIndex
+from face_recognition.tracker import FaceTracker
+from face_recognition.motion_gate import MotionGate, boxes_outside
+from face_recognition.pools import ResourcePool
+from face_recognition.batcher import MicroBatcher
+from face_recognition.result_cache import ResultCache, perceptual_hash, thumbnail
+from face_recognition.roi import RegionOfInterest, parse_polygons, scale_polygons
+from face_recognition.frame_decode import EncodedFrame
+from face_recognition.quality import assess_quality
 from PIL import Image
 import torchvision.transforms as transforms
 from typing import Optional, Tuple, List, Dict
 
+try:
+    import fcntl  # One IVF build across worker processes (not available on Windows)
+except ImportError:
+    fcntl = None
+
+ANN_BUILD_RETRY_SECONDS = 30  # How often a worker without an index retries a build
+
 
 class CNNFaceRecognizer:
     """CNN-based Face Recognition using FaceNet"""
@@ -26,22 +46,69 @@ class CNNFaceRecognizer:
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         print(f"🔧 Using device: {self.device}")
         
+        # Image preprocessing
+        self.transform = transforms.Compose([
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5])
+        ])
+        
         # Load FaceNet model
         self.model = get_facenet_model(pretrained='vggface2', device=self.device)
         self.model.eval()
+        calibration = None
+        if Config.CNN_INFERENCE_BACKEND == 'int8':
+            calibration = self._calibration_faces(Config.CNN_INT8_CALIBRATION_IMAGES)
+        self.model, self.inference_backend = load_inference_model(
+            self.model, Config.CNN_INFERENCE_BACKEND, min_cosine=Config.CNN_BACKEND_MIN_COSINE,
+            calibration=calibration
+        )
+        
+        # Concurrent request threads share the model through a bounded guard
+        self.embedder_pool = ResourcePool(
+            lambda: self.model, size=Config.CNN_EMBEDDER_CONCURRENCY, name='embedder'
+        )
+        
+        # Crops from concurrent requests share forward passes
+        self.batcher = None
+        if Config.CNN_MICRO_BATCHING:
+            self.batcher = MicroBatcher(
+                self._forward,
+                max_batch=Config.CNN_EMBEDDING_BATCH_SIZE,
+                max_wait_ms=Config.CNN_MICRO_BATCH_WAIT_MS,
+                workers=Config.CNN_EMBEDDER_CONCURRENCY,
+                name='embedder-batcher'
+            )
         
         # Face detector
         self.detector = get_face_detector(min_confidence=0.5)
         
-        # Image preprocessing
-        self.transform = transforms.Compose([
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5])
-        ])
+        # Recent frame results keyed by perceptual hash
+        self.result_cache = None
+        if Config.RESULT_CACHE:
+            self.result_cache = ResultCache(max_entries=Config.RESULT_CACHE_SIZE, ttl=Config.RESULT_CACHE_TTL,
+                                            max_distance=Config.RESULT_CACHE_MAX_DISTANCE,
+                                            max_pixel_delta=Config.RESULT_CACHE_MAX_PIXEL_DELTA)
         
-        # Embeddings storage
-        self.embeddings_path = Config.EMBEDDINGS_PATH
-        self.embeddings = {}  # {student_id: [embedding1, embedding2, ...]}
+        # Embeddings storage (memory-mapped, shared by all workers)
+        self.store = EmbeddingStore(
+            Config.GALLERY_STORE_PATH,
+            legacy_pickle_path=Config.EMBEDDINGS_PATH,
+            precision=Config.CNN_GALLERY_PRECISION
+        )
+        self.gallery = EmbeddingGallery()  # L2-normalized (rows, 512) matrix + row -> student_id
+        self.gallery_version = 0
+        self._store_stamp = None
+        self.ann_index = None  # Optional IVF index over gallery rows
+        self._ann_build = None  # Background IVF build thread (see _load_ann_index)
+        self._ann_build_lock = threading.Lock()
+        self._ann_waiting = False  # Exact search until a built index is saved
+        self._ann_file_stamp = None
+        self._ann_attempted = 0.0
+        self._roster_galleries = {}  # {(department, year, division): (version, built_at, gallery)}
+        self._trackers = {}  # {session_id: FaceTracker} for live sessions
+        self._motion_gates = {}  # {session_id: MotionGate}
+        self._rois = {}  # {session_id: RegionOfInterest}
+        self._sessions_lock = threading.Lock()
         self.is_trained = False
         
         # Load existing embeddings
@@ -72,6 +139,34 @@ class CNNFaceRecognizer:
         
         return face_tensor.unsqueeze(0)  # Add batch dimension
     
+    def _calibration_faces(self, limit):
+        """
+        Preprocessed enrolled face crops for int8 calibration
+        
+        Args:
+            limit: Most images to use (spread evenly over all saved images)
+        
+        Returns:
+            (N, 3, 160, 160) tensor, or None when nothing is enrolled yet
+        """
+        paths = []
+        for root, _, files in os.walk(Config.FACE_IMAGES_FOLDER):
+            paths.extend(os.path.join(root, name) for name in sorted(files) if name.endswith('.jpg'))
+        if limit > 0 and len(paths) > limit:
+            paths = paths[::len(paths) // limit][:limit]
+        
+        faces = []
+        for path in paths:
+            img = cv2.imread(path)
+            if img is not None:
+                faces.append(self.preprocess_face(cv2.cvtColor(img, cv2.COLOR_BGR2RGB)))
+        
+        if not faces:
+            print("⚠️  No enrolled face images for int8 calibration, using random images")
+            return None
+        print(f"ℹ️  Calibrating int8 backend on {len(faces)} enrolled face images")
+        return torch.cat(faces)
+    
     def get_embedding(self, face_image):
         """
         Extract face embedding using FaceNet
@@ -82,13 +177,44 @@ class CNNFaceRecognizer:
         Returns:
             512-dimensional embedding vector
         """
-        with torch.no_grad():
-            face_tensor = self.preprocess_face(face_image)
+        return self.get_embeddings([face_image])[0]
+    
+    def get_embeddings(self, face_images, batch_size=None):
+        """
+        Extract embeddings for several faces with batched forward passes
+        
+        Args:
+            face_images: List of RGB face images (160x160)
+            batch_size: Maximum faces per forward pass (default: Config.CNN_EMBEDDING_BATCH_SIZE)
+        
+        Returns:
+            (N, 512) float32 array, one row per input face in input order
+        """
+        if len(face_images) == 0:
+            return np.empty((0, 512), dtype=np.float32)
+        
+        batch_size = batch_size or Config.CNN_EMBEDDING_BATCH_SIZE
+        embeddings = []
+        
+        for start in range(0, len(face_images), batch_size):
+            chunk = face_images[start:start + batch_size]
+            face_tensor = torch.cat([self.preprocess_face(face) for face in chunk])
             face_tensor = face_tensor.to(self.device)
-            embedding = self.model(face_tensor)
-            embedding = embedding.cpu().numpy().flatten()
+            
+            # Concurrent requests' crops share the forward pass when micro-batching
+            if self.batcher is not None:
+                embeddings.append(self.batcher.submit(face_tensor))
+            else:
+                embeddings.append(self._forward(face_tensor))
         
-        return embedding
+        return np.vstack(embeddings)
+    
+    def _forward(self, face_tensor):
+        """One FaceNet forward pass -> (N, 512) numpy array"""
+        with torch.no_grad():
+            # Forward passes queue here when every embedder slot is busy
+            with self.embedder_pool.acquire() as model:
+                return model(face_tensor).cpu().numpy()
     
     def train(self, force_retrain=False):
         """
@@ -103,10 +229,12 @@ class CNNFaceRecognizer:
         if self.is_trained and not force_retrain:
             return True, "Model already trained"
         
-        # Get all students with face images
+        # Get all students with face images (and the store version they go with)
+        start_version = self.store.version()
         students = Student.get_all()
         
         embeddings = {}
+        trained_images = {}
         total_images = 0
         failed_images = 0
         
@@ -118,54 +246,32 @@ class CNNFaceRecognizer:
                 continue
             
             student_id = student['studentId']
-            student_embeddings = []
+            student_faces, failed = self.load_enrolled_faces(face_images)
+            failed_images += failed
             
-            # Extract embeddings for each face image
-            for img_path in face_images:
-                if not os.path.exists(img_path):
-                    failed_images += 1
-                    continue
-                
-                try:
-                    # Read image
-                    img = cv2.imread(img_path)
-                    if img is None:
-                        failed_images += 1
-                        continue
-                    
-                    # Detect face (in case the saved image is full image, not just face)
-                    faces = self.detector.detect_faces(img)
-                    
-                    if len(faces) > 0:
-                        # Extract the largest face
-                        largest_face = max(faces, key=lambda box: box[2] * box[3])
-                        face_rgb = self.detector.extract_face(img, largest_face, output_size=160)
-                    else:
-                        # If no face detected, assume the image is already a cropped face
-                        face_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                        face_rgb = cv2.resize(face_rgb, (160, 160))
-                    
-                    # Get embedding
-                    embedding = self.get_embedding(face_rgb)
-                    student_embeddings.append(embedding)
-                    total_images += 1
-                    
-                except Exception as e:
-                    print(f"❌ Error processing {img_path}: {e}")
-                    failed_images += 1
-                    continue
+            if len(student_faces) == 0:
+                continue
             
-            if len(student_embeddings) > 0:
-                embeddings[student_id] = student_embeddings
-                print(f"✅ {student_id}: {len(student_embeddings)} embeddings")
+            # Embed all of this student's faces in batched forward passes
+            try:
+                student_embeddings = self.get_embeddings(student_faces)
+            except Exception as e:
+                print(f"❌ Error embedding faces for {student_id}: {e}")
+                failed_images += len(student_faces)
+                continue
+            
+            total_images += len(student_embeddings)
+            embeddings[student_id] = list(student_embeddings)
+            trained_images[student_id] = face_images
+            print(f"✅ {student_id}: {len(student_embeddings)} embeddings")
         
         if len(embeddings) == 0:
             return False, "No face images found for training"
         
         # Save embeddings
-        self.embeddings = embeddings
+        self.gallery = EmbeddingGallery.from_dict(embeddings)
         self.is_trained = True
-        self.save_embeddings()
+        self.save_embeddings(trained_from=(start_version, trained_images))
         
         message = f"Model trained with {total_images} images from {len(embeddings)} students"
         if failed_images > 0:
@@ -174,6 +280,56 @@ class CNNFaceRecognizer:
         print(f"✅ {message}")
         return True, message
     
+    def load_enrolled_faces(self, image_paths):
+        """
+        Face crops of saved enrollment images
+        
+        Training and incremental enrollment both embed these crops, so a
+        student gets the same embeddings whichever path enrolled them.
+        
+        Args:
+            image_paths: Paths of a student's saved face images
+        
+        Returns:
+            (list of RGB 160x160 crops, number of images that failed)
+        """
+        student_faces = []
+        failed_images = 0
+        
+        # Extract a face crop from each image
+        for img_path in image_paths:
+            if not os.path.exists(img_path):
+                failed_images += 1
+                continue
+            
+            try:
+                # Read image
+                img = cv2.imread(img_path)
+                if img is None:
+                    failed_images += 1
+                    continue
+                
+                # Detect face (in case the saved image is full image, not just face)
+                faces = self.detector.detect_faces(img)
+                
+                if len(faces) > 0:
+                    # Extract the largest face
+                    largest_face = max(faces, key=lambda box: box[2] * box[3])
+                    face_rgb = self.detector.extract_faces(img, [largest_face], output_size=160)[0]
+                else:
+                    # If no face detected, assume the image is already a cropped face
+                    face_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+                    face_rgb = cv2.resize(face_rgb, (160, 160))
+                
+                student_faces.append(face_rgb)
+                
+            except Exception as e:
+                print(f"❌ Error processing {img_path}: {e}")
+                failed_images += 1
+                continue
+        
+        return student_faces, failed_images
+    
     def predict(self, face_image):
         """
         Predict identity from face image using cosine similarity
@@ -185,84 +341,502 @@ class CNNFaceRecognizer:
             (student_id, confidence) or (None, None) if not recognized
             Note: For cosine similarity, lower distance = better match
         """
-        if not self.is_trained or len(self.embeddings) == 0:
+        if not self.is_trained or len(self.gallery) == 0:
             return None, None
         
         try:
-            # Get embedding for input face
-            query_embedding = self.get_embedding(face_image)
-            
-            # Compare with all stored embeddings
-            best_match = None
-            best_distance = float('inf')
-            
-            for student_id, student_embeddings in self.embeddings.items():
-                for stored_embedding in student_embeddings:
-                    # Calculate cosine distance (1 - cosine similarity)
-                    similarity = cosine_similarity(
-                        query_embedding.reshape(1, -1),
-                        stored_embedding.reshape(1, -1)
-                    )[0][0]
-                    distance = 1 - similarity
-                    
-                    if distance < best_distance:
-                        best_distance = distance
-                        best_match = student_id
-            
-            # Threshold for recognition (cosine distance < 0.6 means good match)
-            threshold = Config.CNN_SIMILARITY_THRESHOLD
-            
-            if best_distance < threshold:
-                # Convert distance to confidence percentage (0-100)
-                confidence = (1 - best_distance) * 100
-                print(f"✅ Match: {best_match} (distance: {best_distance:.3f}, confidence: {confidence:.1f}%)")
-                return best_match, best_distance
-            else:
-                print(f"❌ No match (best distance: {best_distance:.3f}, threshold: {threshold})")
-                return None, best_distance
-                
+            return self.match_embedding(self.get_embedding(face_image))
         except Exception as e:
             print(f"Prediction error: {e}")
             import traceback
             traceback.print_exc()
             return None, None
     
-    def save_embeddings(self):
-        """Save embeddings to disk"""
+    def match_embedding(self, embedding, gallery=None):
+        """
+        Match an already computed embedding against the gallery
+        
+        Args:
+            embedding: 512-dimensional embedding vector
+            gallery: Sub-gallery to search (default: the whole gallery)
+        
+        Returns:
+            (student_id, distance) or (None, best_distance) if above threshold
+        """
+        matches = self.search_gallery(embedding, k=1, gallery=gallery)
+        if not matches:
+            return None, None
+        
+        best_match, best_distance = matches[0]
+        
+        # Threshold for recognition (cosine distance < 0.6 means good match)
+        threshold = Config.CNN_SIMILARITY_THRESHOLD
+        
+        if best_distance < threshold:
+            # Convert distance to confidence percentage (0-100)
+            confidence = (1 - best_distance) * 100
+            print(f"✅ Match: {best_match} (distance: {best_distance:.3f}, confidence: {confidence:.1f}%)")
+            return best_match, best_distance
+        else:
+            print(f"❌ No match (best distance: {best_distance:.3f}, threshold: {threshold})")
+            return None, best_distance
+    
+    def predict_topk(self, face_image, k=5):
+        """
+        Find the k best matching students for a face image
+        
+        Args:
+            face_image: RGB face image (160x160)
+            k: Number of candidate students to return
+        
+        Returns:
+            List of (student_id, cosine_distance), best match first
+        """
+        if not self.is_trained or len(self.gallery) == 0:
+            return []
+        
+        query_embedding = self.get_embedding(face_image)
+        return self.search_gallery(query_embedding, k=k)
+    
+    def search_gallery(self, embedding, k=1, gallery=None):
+        """
+        k best students for an embedding (ANN candidates when an index is active)
+        
+        Args:
+            embedding: 512-dimensional embedding vector
+            k: Number of students to return
+            gallery: Sub-gallery to search exactly (default: the whole gallery)
+        
+        Returns:
+            List of (student_id, cosine_distance), best match first
+        """
+        ann_index = None
+        if gallery is None:
+            gallery, ann_index = self.gallery, self.ann_index
+        
+        if ann_index is not None and len(ann_index) == len(gallery):
+            rows = ann_index.candidates(embedding / np.linalg.norm(embedding), nprobe=Config.CNN_ANN_NPROBE)
+            return gallery.search_rows(embedding, rows, k=k)
+        if Config.CNN_PROTOTYPE_SEARCH:
+            return gallery.search_prototypes(embedding, k=k, shortlist=Config.CNN_PROTOTYPE_SHORTLIST)
+        return gallery.search(embedding, k=k, rerank=Config.CNN_QUANTIZED_RERANK)
+    
+    def roster_gallery(self, department, year, division):
+        """
+        Cached sub-gallery holding only one class section's students
+        
+        Rebuilt when the gallery version changes or after Config.ROSTER_CACHE_TTL
+        seconds (so roster edits are picked up).
+        
+        Returns:
+            EmbeddingGallery
+        """
+        key = (department, year, division)
+        version = self.gallery_version
+        gallery = self.gallery
+        
+        cached = self._roster_galleries.get(key)
+        if cached and cached[0] == version and time.time() - cached[1] < Config.ROSTER_CACHE_TTL:
+            return cached[2]
+        
+        student_ids = [s['studentId'] for s in Student.find_by_filters(department, year, division)]
+        roster = gallery.subset(student_ids)
+        if Config.CNN_PROTOTYPE_SEARCH:
+            roster.build_prototypes(Config.CNN_PROTOTYPES_PER_STUDENT)
+        self._roster_galleries[key] = (version, time.time(), roster)
+        print(f"📋 Roster {department}/{year}/{division}: {roster.num_students} enrolled students")
+        return roster
+    
+    def add_student(self, student_id, image_paths):
+        """
+        Enroll (or extend) one student without retraining the whole gallery
+        
+        Args:
+            student_id: Student ID
+            image_paths: Paths of the student's saved face images
+        
+        Returns:
+            Success status and message
+        """
+        return self.add_students({student_id: image_paths})
+    
+    def add_students(self, students):
+        """
+        Enroll several students with one batched embedding pass
+        
+        Students deleted in the meantime are skipped (checked under the
+        store lock, so a concurrent remove_student always runs after the append).
+        
+        Args:
+            students: {student_id: paths of saved face images}
+        
+        Returns:
+            Success status and message
+        """
+        students = {student_id: paths for student_id, paths in students.items()
+                    if Student.find_by_id(student_id) is not None}
+        if not students:
+            return True, "Nothing to enroll (students were deleted)"
+        
+        students = {student_id: self.load_enrolled_faces(paths)[0] for student_id, paths in students.items()}
+        students = {student_id: faces for student_id, faces in students.items() if len(faces) > 0}
+        if not students:
+            return False, "No face images to enroll"
+        
+        all_faces = [face for faces in students.values() for face in faces]
         try:
-            os.makedirs(os.path.dirname(self.embeddings_path), exist_ok=True)
-            with open(self.embeddings_path, 'wb') as f:
-                pickle.dump(self.embeddings, f)
-            print(f"✅ Embeddings saved to {self.embeddings_path}")
+            embeddings = self.get_embeddings(all_faces)
+        except Exception as e:
+            return False, f"Embedding failed: {str(e)}"
+        
+        # Append just these students' rows, then remap the grown matrix once
+        enrolled = {}
+        with self.store.locked():
+            offset = 0
+            for student_id, faces in students.items():
+                rows = embeddings[offset:offset + len(faces)]
+                offset += len(faces)
+                if Student.find_by_id(student_id) is None:
+                    print(f"⚠️  {student_id} was deleted before enrollment, skipping")
+                    continue
+                self.store.append(student_id, rows)
+                enrolled[student_id] = len(rows)
+            if enrolled:
+                self._open_store()
+        
+        if not enrolled:
+            return True, "Nothing to enroll (students were deleted)"
+        if len(enrolled) == 1:
+            message = f"Enrolled {next(iter(enrolled))} with {sum(enrolled.values())} images"
+        else:
+            message = f"Enrolled {len(enrolled)} students with {sum(enrolled.values())} images"
+        print(f"✅ {message}")
+        return True, message
+    
+    def remove_student(self, student_id):
+        """
+        Remove one student's embeddings from the gallery
+        
+        Returns:
+            Success status and message
+        """
+        with self.store.locked():
+            if self.store.remove(student_id) is None:
+                return True, f"{student_id} was not enrolled"
+            
+            # Rewrite without tombstoned rows once they dominate the file
+            if self.store.dead_fraction() > 0.5:
+                gallery, _ = self.store.open_gallery()
+                self.store.write_snapshot(gallery)
+            
+            self._open_store()
+        
+        message = f"Removed {student_id} from the gallery"
+        print(f"✅ {message}")
+        return True, message
+    
+    def refresh_if_stale(self):
+        """
+        Reload the gallery if another worker changed it since we loaded it
+        
+        Returns:
+            True if the gallery was reloaded
+        """
+        if self.store.stamp() == self._store_stamp:
+            if self._ann_waiting:
+                self._refresh_ann_index()
+            return False
+        
+        with self.store.locked(shared=True):
+            if self.store.version() == self.gallery_version:
+                self._store_stamp = self.store.stamp()
+                return False
+            self._open_store()
+        
+        print(f"🔄 Gallery reloaded (version {self.gallery_version})")
+        return True
+    
+    def _open_store(self):
+        """Map the current store generation (caller holds the store lock)"""
+        self._store_stamp = self.store.stamp()
+        gallery, version = self.store.open_gallery()
+        if Config.CNN_PROTOTYPE_SEARCH:
+            gallery.build_prototypes(Config.CNN_PROTOTYPES_PER_STUDENT)
+        self.ann_index = self._load_ann_index(gallery)
+        self.gallery = gallery
+        self.gallery_version = version  # Set after the gallery so roster caches never pair old rows with a new version
+        self._roster_galleries = {}
+        self.is_trained = gallery.num_students > 0
+    
+    def _load_ann_index(self, gallery):
+        """
+        Load or extend the IVF index for a freshly opened gallery (caller holds the store lock)
+        
+        A missing or stale index is built by a background thread outside
+        the store lock, and exact search is used until it is saved. Only one
+        worker builds; the others load the saved file (see _refresh_ann_index).
+        
+        Returns:
+            IVFIndex, or None when exact search should be used
+        """
+        self._ann_waiting = False
+        if Config.CNN_ANN_INDEX != 'ivf' or gallery.num_live_rows < Config.CNN_ANN_MIN_ROWS:
+            return None
+        
+        # Appends keep row numbers stable; a new matrix file means a compaction
+        matrix_file = self.store.read_header()['matrix_file']
+        self._ann_file_stamp = _file_stamp(Config.ANN_INDEX_PATH)
+        index = IVFIndex.load(Config.ANN_INDEX_PATH)
+        if index is None or index.source.get('matrix_file') != matrix_file or len(index) > len(gallery):
+            self._ann_waiting = True
+            self._start_ann_build(gallery, matrix_file)
+            return None
+        
+        # Rows appended since the index was saved only need their nearest list
+        if len(index) < len(gallery):
+            index.insert(gallery.matrix[len(index):])
+            index.save(Config.ANN_INDEX_PATH)
+        return index
+    
+    def _refresh_ann_index(self):
+        """Install an IVF index saved by a background build (of this or another worker)"""
+        if _file_stamp(Config.ANN_INDEX_PATH) == self._ann_file_stamp:
+            # Retry now and then in case the worker that was building gave up
+            if time.monotonic() - self._ann_attempted >= ANN_BUILD_RETRY_SECONDS:
+                self._start_ann_build(self.gallery, self.store.read_header()['matrix_file'])
+            return
+        
+        with self.store.locked(shared=True):
+            if self.store.version() != self.gallery_version:
+                return  # The next refresh_if_stale reopens the store (and the index)
+            self.ann_index = self._load_ann_index(self.gallery)
+        if self.ann_index is not None:
+            print(f"✅ IVF index installed ({len(self.ann_index)} rows)")
+    
+    def _start_ann_build(self, gallery, matrix_file):
+        """Build the IVF index on a background thread unless one is running already"""
+        with self._ann_build_lock:
+            self._ann_attempted = time.monotonic()
+            if self._ann_build is not None and self._ann_build.is_alive():
+                return
+            self._ann_build = threading.Thread(
+                target=self._build_ann_index, args=(gallery, matrix_file), name='ivf-build', daemon=True
+            )
+            self._ann_build.start()
+    
+    def _build_ann_index(self, gallery, matrix_file):
+        """
+        Train the IVF index against a gallery snapshot and save it
+        
+        The index is only saved if the store still uses the same matrix
+        file (no compaction since the snapshot); rows appended meanwhile are
+        inserted by whichever worker loads it.
+        """
+        lock_path = os.path.join(self.store.store_dir, 'ivf_build.lock')
+        with open(lock_path, 'a') as lock_file:
+            if fcntl:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return  # Another worker is building; its saved file is picked up
+            try:
+                index = IVFIndex.load(Config.ANN_INDEX_PATH)
+                if index is not None and index.source.get('matrix_file') == matrix_file:
+                    return  # Saved by another worker while this one waited
+                
+                print(f"🔄 Building IVF index over {len(gallery)} embeddings (exact search until it is ready)...")
+                start = time.perf_counter()
+                index = IVFIndex.build(gallery.matrix, nprobe=Config.CNN_ANN_NPROBE)
+                index.source = {'matrix_file': matrix_file}
+                
+                with self.store.locked(shared=True):
+                    header = self.store.read_header()
+                    if header is None or header['matrix_file'] != matrix_file:
+                        print("⚠️  Gallery was compacted during the IVF build, discarding it")
+                        return
+                    index.save(Config.ANN_INDEX_PATH)
+                print(f"✅ IVF index built in {time.perf_counter() - start:.1f}s")
+            except Exception as e:
+                print(f"❌ IVF index build failed: {e}")
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def save_embeddings(self, trained_from=None):
+        """
+        Save embeddings to disk (full snapshot)
+        
+        Args:
+            trained_from: (store version, {student_id: face image paths}) the
+                gallery was computed from; students removed or enrolled while
+                it was computed are reconciled before the snapshot replaces the store
+        """
+        try:
+            with self.store.locked():
+                gallery = self.gallery
+                if trained_from is not None:
+                    gallery = self._reconcile_gallery(gallery, *trained_from)
+                self.store.write_snapshot(gallery)
+                self._open_store()
+            print(f"✅ Embeddings saved to {self.store.store_dir}")
             return True
         except Exception as e:
             print(f"Error saving embeddings: {e}")
             return False
     
+    def _reconcile_gallery(self, gallery, start_version, trained_images):
+        """
+        Merge changes made since a retrain started into its gallery (caller holds the store lock)
+        
+        Students deleted in the meantime are dropped. If the store changed,
+        students enrolled after the retrain read the student records (or
+        whose face images changed since) keep their stored rows.
+        
+        Returns:
+            EmbeddingGallery to write
+        """
+        current = {student['studentId']: student.get('faceImages', []) for student in Student.get_all()}
+        embeddings = {student_id: rows for student_id, rows in gallery.to_dict().items() if student_id in current}
+        dropped = len(gallery.student_ids) - len(embeddings)
+        
+        kept = 0
+        if self.store.version() != start_version:
+            stored, _ = self.store.open_gallery()
+            for student_id, rows in stored.to_dict().items():
+                if student_id in current and current[student_id] != trained_images.get(student_id):
+                    embeddings[student_id] = rows
+                    kept += 1
+        
+        if dropped or kept:
+            print(f"🔄 Retrain reconciled with the store: {dropped} deleted, {kept} enrolled meanwhile")
+        return EmbeddingGallery.from_dict(embeddings)
+    
     def load_embeddings(self):
-        """Load embeddings from disk"""
+        """Load embeddings from disk (migrating a legacy pickle on first use)"""
         try:
-            if not os.path.exists(self.embeddings_path):
+            if not self.store.exists():
+                with self.store.locked():
+                    self.store.migrate_legacy()
+            
+            if not self.store.precision_matches():
+                # CNN_GALLERY_PRECISION changed: rewrite the quantized column once
+                with self.store.locked():
+                    if not self.store.precision_matches():
+                        gallery, _ = self.store.open_gallery()
+                        self.store.write_snapshot(gallery)
+                        print(f"✅ Rewrote gallery store as {self.store.precision}")
+            
+            with self.store.locked(shared=True):
+                self._open_store()
+            
+            if not self.is_trained:
                 print("ℹ️  No trained embeddings found")
                 return False
             
-            with open(self.embeddings_path, 'rb') as f:
-                self.embeddings = pickle.load(f)
-            
-            self.is_trained = len(self.embeddings) > 0
-            print(f"✅ Loaded embeddings for {len(self.embeddings)} students")
+            print(f"✅ Loaded embeddings for {self.gallery.num_students} students (version {self.gallery_version})")
             return True
         except Exception as e:
             print(f"Error loading embeddings: {e}")
             return False
     
-    def recognize_from_base64(self, base64_string, detector=None):
+    def cache_stats(self):
+        """Hit/miss/eviction counters of the frame result cache"""
+        return self.result_cache.get_stats() if self.result_cache is not None else None
+    
+    def pool_stats(self):
+        """Wait-time counters of the embedder guard and the detector pools"""
+        stats = {'embedder': self.embedder_pool.get_stats()}
+        if self.batcher is not None:
+            stats['micro_batching'] = self.batcher.get_stats()
+        if hasattr(self.detector, 'get_pool_stats'):
+            stats.update(self.detector.get_pool_stats())
+        return stats
+    
+    def _session_object(self, registry, session_id, factory):
+        """
+        Per-session object from a registry (created on first use)
+        
+        Objects idle for more than Config.TRACKER_IDLE_TTL seconds are dropped.
+        """
+        now = time.time()
+        with self._sessions_lock:
+            for key in [k for k, obj in registry.items() if now - obj.last_used > Config.TRACKER_IDLE_TTL]:
+                del registry[key]
+            
+            obj = registry.get(session_id)
+            if obj is None:
+                obj = registry[session_id] = factory()
+            return obj
+    
+    def session_tracker(self, session_id):
+        """Face tracker of a live session"""
+        return self._session_object(self._trackers, session_id, lambda: FaceTracker(
+            iou_threshold=Config.TRACKER_IOU_THRESHOLD,
+            max_missed=Config.TRACKER_MAX_MISSED,
+            confirm_hits=Config.TRACKER_CONFIRM_HITS,
+            reverify_frames=Config.TRACKER_REVERIFY_FRAMES
+        ))
+    
+    def session_gate(self, session_id):
+        """Motion gate of a live session"""
+        return self._session_object(self._motion_gates, session_id, lambda: MotionGate(
+            pixel_threshold=Config.MOTION_PIXEL_THRESHOLD,
+            skip_fraction=Config.MOTION_SKIP_FRACTION,
+            partial_fraction=Config.MOTION_PARTIAL_FRACTION,
+            max_skips=Config.MOTION_MAX_SKIPS
+        ))
+    
+    def session_roi(self, session_id, polygons):
+        """
+        Region of interest of a live session, rebuilt when its polygons change
+        
+        Args:
+            session_id: Live session, or None for a one-off ROI
+            polygons: ROI polygons (see roi.parse_polygons), or None
+        
+        Returns:
+            RegionOfInterest or None
+        """
+        if not polygons:
+            return None
+        if not session_id:
+            return RegionOfInterest(polygons)
+        
+        roi = self._session_object(self._rois, session_id, lambda: RegionOfInterest(polygons))
+        roi.last_used = time.time()
+        if roi.polygons != polygons:
+            roi = RegionOfInterest(polygons)
+            with self._sessions_lock:
+                self._rois[session_id] = roi
+        return roi
+    
+    def session_stats(self, session_id):
+        """
+        Pipeline counters of a live session in this worker
+        
+        Returns:
+            Dict with 'motion' (gate counters) and 'tracks' (active tracks), or None
+        """
+        with self._sessions_lock:
+            gate = self._motion_gates.get(session_id)
+            tracker = self._trackers.get(session_id)
+        if gate is None and tracker is None:
+            return None
+        return {
+            'motion': gate.get_stats() if gate else None,
+            'tracks': len(tracker.tracks) if tracker else 0
+        }
+    
+    def recognize_from_base64(self, base64_string, detector=None, roster=None, session_id=None, roi=None):
         """
         Recognize faces from base64 encoded image with STRICT accuracy controls
         
         Args:
             base64_string: Base64 encoded image
             detector: Not used (kept for compatibility)
+            roster: Optional (department, year, division) to restrict matching to
+            session_id: Optional live session; confirmed tracks reuse their identity
+            roi: Optional ROI polygons; faces are only detected inside them
         
         Returns:
             List of recognition results
@@ -275,20 +849,144 @@ class CNNFaceRecognizer:
         
         # Decode base64 to image
         img_data = base64.b64decode(base64_string)
-        nparr = np.frombuffer(img_data, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        return self.recognize_from_bytes(img_data, roster=roster, session_id=session_id, roi=roi)
+    
+    def recognize_from_bytes(self, data, roster=None, session_id=None, roi=None):
+        """
+        Recognize faces in an encoded (JPEG/WebP/PNG) frame
+        
+        Args:
+            data: Encoded image bytes (decoded in place, not copied)
+            roster: Optional (department, year, division) to restrict matching to
+            session_id: Optional live session
+            roi: Optional ROI polygons
         
-        if image is None:
+        Returns:
+            List of recognition results
+        """
+        # Pick up students enrolled/removed by other workers
+        self.refresh_if_stale()
+        
+        # Detect on a reduced decode; full resolution is decoded only for face crops
+        # (tiled detection needs the full frame to find small faces)
+        min_side = Config.REDUCED_DECODE_MIN_SIDE if Config.REDUCED_DECODE and not Config.DNN_TILED_DETECTION else 0
+        frame = EncodedFrame(data, min_side)
+        
+        if frame.image is None:
             return []
         
-        # Detect faces
-        faces = self.detector.detect_faces(image)
+        return self.recognize_image(frame.image, roster=roster, session_id=session_id, roi=roi, frame=frame)
+    
+    def recognize_image(self, image, roster=None, session_id=None, roi=None, frame=None):
+        """
+        Recognize faces in a decoded frame
+        
+        Live-session frames pass the session's motion gate first: unchanged
+        frames return the previous result, frames with small changes only
+        re-detect the changed regions.
+        
+        Args:
+            image: BGR frame
+            roster: Optional (department, year, division) to restrict matching to
+            session_id: Optional live session
+            roi: Optional ROI polygons; faces are only detected inside them
+            frame: Optional EncodedFrame that image is the reduced decode of;
+                face crops then come from its full-resolution frame and
+                result boxes are in full-frame pixels
+        
+        Returns:
+            List of recognition results
+        """
+        if roi and frame is not None and frame.scale != 1.0:
+            # Pixel polygons are drawn on the full frame
+            roi = scale_polygons(parse_polygons(roi), 1.0 / frame.scale)
+        roi = self.session_roi(session_id, roi)
+        
+        # Re-uploaded / near-identical frames reuse the result for a few seconds
+        frame_key = None
+        if self.result_cache is not None:
+            # Finer hash for whole frames, verified against a thumbnail: a new face in a corner must not match
+            scope = ('frame', session_id, roster, self.gallery_version, roi.key if roi else None,
+                     frame.scale if frame is not None else 1.0)
+            frame_key = (scope, perceptual_hash(image, hash_size=16))
+            thumb = thumbnail(image)
+            cached = self.result_cache.get(*frame_key, thumb)
+            if cached is not None:
+                return copy.deepcopy(cached)
+        
+        results = self._recognize_gated(image, roster, session_id, roi, frame)
+        
+        if frame_key is not None:
+            self.result_cache.put(*frame_key, copy.deepcopy(results), thumb)
+        return results
+    
+    def _recognize_gated(self, image, roster=None, session_id=None, roi=None, frame=None):
+        """Detection behind the session's motion gate, then recognition"""
+        gate = self.session_gate(session_id) if session_id and Config.MOTION_GATING else None
+        if gate is None:
+            return self._recognize_faces(image, self._detect(image, roi=roi), roster, session_id, frame)
+        
+        start = time.perf_counter()
+        with gate.lock:
+            mode, regions = gate.check(image, roi=roi)
+            if mode == 'skip':
+                return gate.reuse((time.perf_counter() - start) * 1000)
+            previous_boxes = gate.last_boxes
+        
+        if mode == 'partial':
+            faces = boxes_outside(previous_boxes, regions) + self._detect(image, regions, roi)
+        else:
+            faces = self._detect(image, roi=roi)
+        
+        results = self._recognize_faces(image, faces, roster, session_id, frame)
+        
+        with gate.lock:
+            gate.store(mode, faces, results, (time.perf_counter() - start) * 1000)
+        return results
+    
+    def _detect(self, image, regions=None, roi=None):
+        """
+        Detect faces in the whole frame, or only inside regions and/or the ROI
+        
+        Args:
+            image: BGR frame
+            regions: Optional [[x, y, w, h], ...] sub-images to search
+            roi: Optional RegionOfInterest; pixels outside its polygons are never searched
+        
+        Returns:
+            Face boxes in frame coordinates
+        """
+        if roi is None:
+            return self.detector.detect_faces(image) if regions is None else self._detect_regions(image, regions)
+        
+        faces = self._detect_regions(image, roi.clip(regions, image.shape), roi)
+        # Faces cut by a polygon edge count only when their center is inside
+        return [box for box, inside in zip(faces, roi.contains(faces, image.shape)) if inside]
+    
+    def _detect_regions(self, image, regions, roi=None):
+        """Detect faces inside sub-images only, returned in frame coordinates"""
+        faces = []
+        for region in regions:
+            x, y, w, h = region
+            sub = roi.crop(image, region) if roi is not None else image[y:y + h, x:x + w]
+            for box in self.detector.detect_faces(sub):
+                faces.append(np.asarray(box) + np.array([x, y, 0, 0]))
+        return faces
+    
+    def _recognize_faces(self, image, faces, roster=None, session_id=None, frame=None):
+        """
+        Size filter, de-duplication, tracking, embedding and matching of detected faces
         
+        Boxes are in image pixels; with a reduced-decode frame they are mapped
+        to full-frame pixels for the size filter, the crops and the results.
+        """
         if len(faces) == 0:
             return []
         
-        # Filter faces by minimum size (remove tiny detections)
-        MIN_FACE_SIZE = 80  # Minimum 80x80 pixels
+        scale = frame.scale if frame is not None else 1.0
+        
+        # Filter faces by minimum size (remove tiny detections), in full-frame pixels
+        MIN_FACE_SIZE = Config.CNN_MIN_FACE_SIZE / scale  # Default 80x80 pixels
         filtered_faces = []
         for box in faces:
             x, y, w, h = box
@@ -303,29 +1001,76 @@ class CNNFaceRecognizer:
         unique_faces = self._remove_duplicate_faces(filtered_faces)
         print(f"📊 Detected {len(faces)} faces, filtered to {len(unique_faces)} unique faces")
         
-        results = []
-        recognized_students = set()  # Track already recognized students
+        # Quality check first, then embed every passing face in one batched call
+        if frame is not None:
+            full_boxes = frame.to_full(unique_faces)
+        else:
+            full_boxes = [[int(v) for v in box] for box in unique_faces]
+        results = [{'box': box, 'match': None} for box in full_boxes]
+        accepted = []
+        accepted_faces = []
         
-        for idx, box in enumerate(unique_faces):
-            # Extract face
-            face_rgb = self.detector.extract_face(image, box, output_size=160)
-            
-            # Quality check - reject poor quality faces
-            quality_score = self._assess_face_quality(face_rgb)
-            if quality_score < 0.3:
+        # Faces on confirmed tracks keep their identity without FaceNet
+        tracker = self.session_tracker(session_id) if session_id and Config.FACE_TRACKING else None
+        tracks = []
+        carried = set()
+        if tracker is not None:
+            with tracker.lock:
+                if tracker.gallery_version != self.gallery_version:
+                    tracker.reset_identities(self.gallery_version)
+                tracks = tracker.update(unique_faces)
+                for idx, track in enumerate(tracks):
+                    if tracker.is_confirmed(track):
+                        results[idx]['match'] = dict(track.match)
+                        carried.add(idx)
+        
+        # Extract (and align) every face that still needs an embedding in one call
+        pending = [idx for idx in range(len(unique_faces)) if idx not in carried]
+        crops = []
+        if pending:
+            source = frame.full() if frame is not None else image
+            crops = self.detector.extract_faces(source, [full_boxes[idx] for idx in pending], output_size=160)
+        
+        # Quality check - reject poor quality faces (all crops scored in one pass)
+        quality_scores = self._assess_face_quality(crops) if crops else []
+        for idx, face_rgb, quality_score in zip(pending, crops, quality_scores):
+            if quality_score < Config.CNN_MIN_FACE_QUALITY:
                 print(f"⚠️  Face {idx} rejected: poor quality (score: {quality_score:.2f})")
-                results.append({'box': box.tolist(), 'match': None})
                 continue
             
-            # Recognize with STRICT threshold
-            student_id, distance = self.predict(face_rgb)
-            
-            result = {'box': box.tolist(), 'match': None}
+            accepted.append(idx)
+            accepted_faces.append(face_rgb)
+        
+        # Search only the class roster when one is given
+        gallery = self.roster_gallery(*roster) if roster else self.gallery
+        
+        # (student_id, distance) per accepted face
+        matches = {}
+        if self.is_trained and gallery.num_students > 0:
+            try:
+                embeddings = self.get_embeddings(accepted_faces)
+                for idx, embedding in zip(accepted, embeddings):
+                    # Recognize with STRICT threshold
+                    matches[idx] = self.match_embedding(embedding, gallery=gallery if roster else None)
+            except Exception as e:
+                print(f"Prediction error: {e}")
+                import traceback
+                traceback.print_exc()
+        
+        recognized_students = {results[idx]['match']['studentId'] for idx in carried}  # Track already recognized students
+        skipped = set()
+        
+        for idx in accepted:
+            if idx not in matches:
+                continue
+            result = results[idx]
+            student_id, distance = matches[idx]
             
             if student_id:
                 # CRITICAL: Prevent duplicate recognition of same student
                 if student_id in recognized_students:
                     print(f"⚠️  {student_id} already recognized, skipping duplicate")
+                    skipped.add(idx)
                     continue
                 
                 # Get student details
@@ -345,11 +1090,18 @@ class CNNFaceRecognizer:
                         print(f"✅ MATCH: {student.get('name')} (confidence: {confidence:.1f}%, distance: {distance:.3f})")
                     else:
                         print(f"❌ REJECTED: {student.get('name')} (confidence too low: {confidence:.1f}%)")
-            
-            results.append(result)
+        
+        if tracker is not None:
+            with tracker.lock:
+                for idx in accepted:
+                    if idx in matches and idx not in skipped:
+                        tracker.record(tracks[idx], results[idx]['match'])
+        
+        results = [result for idx, result in enumerate(results) if idx not in skipped]
         
         matched_count = sum(1 for r in results if r['match'])
-        print(f"📊 Unique faces: {len(unique_faces)}, Matched: {matched_count}")
+        print(f"📊 Unique faces: {len(unique_faces)}, Matched: {matched_count}"
+              + (f", carried by tracker: {len(carried)}" if carried else ""))
         return results
     
     def _remove_duplicate_faces(self, faces):
@@ -396,33 +1148,30 @@ class CNNFaceRecognizer:
         
         return [faces[i] for i in keep]
     
-    def _assess_face_quality(self, face_rgb):
-        """
-        Assess face image quality
-        Returns score 0-1 (higher is better)
+    def _assess_face_quality(self, faces_rgb):
         """
-        # Convert to grayscale for analysis
-        gray = cv2.cvtColor(face_rgb, cv2.COLOR_RGB2GRAY)
+        Assess the quality of a batch of face crops
         
-        # Check brightness
-        mean_brightness = np.mean(gray)
-        if mean_brightness < 40 or mean_brightness > 220:
-            return 0.1  # Too dark or too bright
-        
-        # Check contrast
-        contrast = np.std(gray)
-        if contrast < 30:
-            return 0.2  # Too low contrast
-        
-        # Check sharpness (Laplacian variance)
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-        if laplacian_var < 100:
-            return 0.3  # Too blurry
-        
-        # Calculate overall quality score
-        brightness_score = 1.0 - abs(mean_brightness - 128) / 128
-        contrast_score = min(1.0, contrast / 80.0)
-        sharpness_score = min(1.0, laplacian_var / 500.0)
+        Args:
+            faces_rgb: List of RGB crops
         
-        quality = (brightness_score + contrast_score + sharpness_score) / 3.0
-        return quality
+        Returns:
+            Array of scores 0-1 (higher is better)
+        """
+        _, scores = assess_quality(
+            faces_rgb,
+            Config.FACE_QUALITY_MIN_BRIGHTNESS,
+            Config.FACE_QUALITY_MAX_BRIGHTNESS,
+            Config.FACE_QUALITY_MIN_CONTRAST,
+            Config.FACE_QUALITY_MIN_SHARPNESS
+        )
+        return scores
+
+
+def _file_stamp(path):
+    """(mtime, size) of a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
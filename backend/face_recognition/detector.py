@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 from config import Config
+from face_recognition.quality import assess_quality
 import os
 
 class FaceDetector:
@@ -99,25 +100,26 @@ class FaceDetector:
         Returns:
             (is_valid, quality_score)
         """
-        # Check if image is too dark or too bright
-        mean_brightness = np.mean(face_image)
-        if mean_brightness < 30 or mean_brightness > 225:
-            return False, 0.0
-        
-        # Check contrast using standard deviation
-        contrast = np.std(face_image)
-        if contrast < 20:  # Too low contrast
-            return False, 0.0
-        
-        # Calculate sharpness using Laplacian variance
-        laplacian_var = cv2.Laplacian(face_image, cv2.CV_64F).var()
-        if laplacian_var < 50:  # Too blurry
-            return False, 0.0
+        passed, scores = self.validate_faces_quality([face_image])
+        return bool(passed[0]), float(scores[0]) if passed[0] else 0.0
+    
+    def validate_faces_quality(self, face_images):
+        """
+        Validate a batch of extracted faces in one pass
         
-        # Quality score (0-1)
-        quality_score = min(1.0, (contrast / 100.0 + laplacian_var / 500.0) / 2)
+        Args:
+            face_images: List of grayscale face images
         
-        return True, quality_score
+        Returns:
+            (passed, scores) arrays
+        """
+        return assess_quality(
+            face_images,
+            Config.LBPH_QUALITY_MIN_BRIGHTNESS,
+            Config.LBPH_QUALITY_MAX_BRIGHTNESS,
+            Config.LBPH_QUALITY_MIN_CONTRAST,
+            Config.LBPH_QUALITY_MIN_SHARPNESS
+        )
     
     def preprocess_image(self, image_path):
         """
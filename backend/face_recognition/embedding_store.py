@@ -0,0 +1,366 @@
+"""
+Memory-mapped on-disk gallery for CNN face recognition
+Columnar layout shared by every gunicorn worker:
+
+    header.json             version, row/label counts, active file names
+    embeddings.<gen>.f32    (rows, dim) L2-normalized float32 matrix
+    row_labels.<gen>.i32    (rows,) int32 label of each row
+    ids.<gen>.txt           one student ID per label, in label order
+    embeddings.<gen>.f16    optional float16 copy  (CNN_GALLERY_PRECISION=float16)
+    embeddings.<gen>.i8     optional int8 copy     (CNN_GALLERY_PRECISION=int8)
+    scales.<gen>.f32        per-row int8 scales
+
+Data files are append-only. Readers only trust the counts in the header,
+so an update is "append rows, then atomically swap the header". Workers
+open the matrix with np.memmap and share the same page-cache pages. A
+snapshot writes a new file generation; the files it replaces are deleted
+by the snapshot after it.
+"""
+
+import json
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+import numpy as np
+from face_recognition.gallery import EmbeddingGallery, l2_normalize, quantize_rows, QUANTIZED_PRECISIONS
+
+try:
+    import fcntl  # Cross-process store lock (not available on Windows)
+except ImportError:
+    fcntl = None
+
+STORE_FORMAT = 1
+QUANTIZED_SUFFIX = {'float16': 'f16', 'int8': 'i8'}
+DATA_FILES = ('matrix_file', 'labels_file', 'ids_file', 'quantized_file', 'scales_file')
+
+
+class EmbeddingStore:
+    """Append-only, memory-mapped embedding gallery on disk"""
+
+    def __init__(self, store_dir, dim=512, legacy_pickle_path=None, precision='float32'):
+        self.store_dir = store_dir
+        self.dim = dim
+        self.precision = precision if precision in QUANTIZED_PRECISIONS else 'float32'
+        self.legacy_pickle_path = legacy_pickle_path
+        self.header_path = os.path.join(store_dir, 'header.json')
+        self.lock_path = os.path.join(store_dir, 'store.lock')
+        self._thread_lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # Locking and header
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def locked(self, shared=False):
+        """Serialize store access across threads and worker processes"""
+        with self._thread_lock:
+            os.makedirs(self.store_dir, exist_ok=True)
+            with open(self.lock_path, 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def exists(self):
+        return os.path.exists(self.header_path)
+
+    def read_header(self):
+        """Read the current header (None if the store was never written)"""
+        try:
+            with open(self.header_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def version(self):
+        header = self.read_header()
+        return header['version'] if header else 0
+
+    def stamp(self):
+        """Cheap stat-based fingerprint that changes on every header swap"""
+        try:
+            st = os.stat(self.header_path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _write_header(self, header):
+        """Atomically replace the header"""
+        tmp_path = self.header_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(header, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.header_path)
+
+    def _path(self, header, key):
+        return os.path.join(self.store_dir, header[key])
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def open_gallery(self):
+        """
+        Open the stored gallery with a memory-mapped matrix
+
+        Returns:
+            (EmbeddingGallery, version)
+        """
+        header = self.read_header()
+        if header is None:
+            return EmbeddingGallery(dim=self.dim), 0
+
+        rows = header['rows']
+        if rows == 0:
+            matrix = np.empty((0, header['dim']), dtype=np.float32)
+            row_labels = np.empty(0, dtype=np.int32)
+        else:
+            matrix = np.memmap(self._path(header, 'matrix_file'), dtype=np.float32,
+                               mode='r', shape=(rows, header['dim']))
+            row_labels = np.fromfile(self._path(header, 'labels_file'), dtype=np.int32, count=rows)
+
+        labels = self._read_ids(header)
+
+        if header['removed']:
+            row_labels = np.where(np.isin(row_labels, header['removed']), -1, row_labels)
+
+        gallery = EmbeddingGallery(matrix, row_labels, labels)
+        if rows and header.get('quantized_file'):
+            dtype = np.float16 if header['precision'] == 'float16' else np.int8
+            quantized = np.memmap(self._path(header, 'quantized_file'), dtype=dtype,
+                                  mode='r', shape=(rows, header['dim']))
+            scales = None
+            if header.get('scales_file'):
+                scales = np.fromfile(self._path(header, 'scales_file'), dtype=np.float32, count=rows)
+            gallery.set_quantized(quantized, scales)
+
+        return gallery, header['version']
+
+    def precision_matches(self):
+        """Whether the stored quantized column matches the configured precision"""
+        header = self.read_header()
+        return header is None or header.get('precision', 'float32') == self.precision
+
+    # ------------------------------------------------------------------
+    # Writing (callers hold `locked()`)
+    # ------------------------------------------------------------------
+
+    def write_snapshot(self, gallery):
+        """
+        Write a compacted gallery as a new file generation and swap it in
+
+        Returns:
+            New version number
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        old_header = self.read_header()
+        version = (old_header['version'] if old_header else 0) + 1
+        gallery = gallery.compacted()
+        ids_data = ''.join(f'{student_id}\n' for student_id in gallery.labels).encode('utf-8')
+
+        header = {
+            'format': STORE_FORMAT,
+            'version': version,
+            'dim': gallery.dim,
+            'rows': len(gallery),
+            'num_labels': len(gallery.labels),
+            'ids_bytes': len(ids_data),
+            'removed': [],
+            'matrix_file': f'embeddings.{version}.f32',
+            'labels_file': f'row_labels.{version}.i32',
+            'ids_file': f'ids.{version}.txt',
+            'precision': self.precision,
+            'quantized_file': None,
+            'scales_file': None,
+            'retired': []  # Files of the previous generation, deleted by the next snapshot
+        }
+
+        with open(self._path(header, 'matrix_file'), 'wb') as f:
+            f.write(np.ascontiguousarray(gallery.matrix, dtype=np.float32).tobytes())
+            os.fsync(f.fileno())
+        with open(self._path(header, 'labels_file'), 'wb') as f:
+            f.write(gallery.row_labels.astype(np.int32).tobytes())
+            os.fsync(f.fileno())
+        with open(self._path(header, 'ids_file'), 'wb') as f:
+            f.write(ids_data)
+            os.fsync(f.fileno())
+
+        if self.precision in QUANTIZED_PRECISIONS:
+            quantized, scales = quantize_rows(gallery.matrix, self.precision)
+            header['quantized_file'] = f'embeddings.{version}.{QUANTIZED_SUFFIX[self.precision]}'
+            with open(self._path(header, 'quantized_file'), 'wb') as f:
+                f.write(quantized.tobytes())
+                os.fsync(f.fileno())
+            if scales is not None:
+                header['scales_file'] = f'scales.{version}.f32'
+                with open(self._path(header, 'scales_file'), 'wb') as f:
+                    f.write(scales.tobytes())
+                    os.fsync(f.fileno())
+
+        # The replaced generation is only retired: a worker may have read its
+        # header without mapping it yet. Files retired by the previous
+        # snapshot are deleted now; those still in use (mapped files cannot be
+        # deleted on Windows) stay retired until a later snapshot.
+        if old_header:
+            header['retired'] = [old_header[key] for key in DATA_FILES if old_header.get(key)]
+            for name in old_header.get('retired', []):
+                try:
+                    os.remove(os.path.join(self.store_dir, name))
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    header['retired'].append(name)
+
+        self._write_header(header)
+        return version
+
+    def append(self, student_id, embeddings):
+        """
+        Append one student's embeddings (new label if not enrolled yet)
+
+        Returns:
+            New version number
+        """
+        header = self.read_header()
+        if header is None:
+            self.write_snapshot(EmbeddingGallery(dim=self.dim))
+            header = self.read_header()
+
+        embeddings = l2_normalize(np.vstack(embeddings)).astype(np.float32)
+        labels = self._read_ids(header)
+        removed = set(header['removed'])
+
+        # Re-enrolling a removed student gets a fresh label
+        label = None
+        for idx in range(len(labels) - 1, -1, -1):
+            if labels[idx] == student_id and idx not in removed:
+                label = idx
+                break
+
+        if label is None:
+            label = header['num_labels']
+            id_data = f'{student_id}\n'.encode('utf-8')
+            self._append_bytes(header, 'ids_file', id_data, header['ids_bytes'])
+            header['num_labels'] += 1
+            header['ids_bytes'] += len(id_data)
+
+        rows = header['rows']
+        self._append_bytes(header, 'matrix_file', embeddings.tobytes(), rows * header['dim'] * 4)
+        self._append_bytes(header, 'labels_file',
+                           np.full(len(embeddings), label, dtype=np.int32).tobytes(), rows * 4)
+
+        if header.get('quantized_file'):
+            quantized, scales = quantize_rows(embeddings, header['precision'])
+            self._append_bytes(header, 'quantized_file', quantized.tobytes(),
+                               rows * header['dim'] * quantized.itemsize)
+            if scales is not None:
+                self._append_bytes(header, 'scales_file', scales.tobytes(), rows * 4)
+
+        header['rows'] = rows + len(embeddings)
+        header['version'] += 1
+        self._write_header(header)
+        return header['version']
+
+    def remove(self, student_id):
+        """
+        Tombstone all rows of a student (header-only update)
+
+        Returns:
+            New version number, or None if the student was not stored
+        """
+        header = self.read_header()
+        if header is None:
+            return None
+
+        labels = self._read_ids(header)
+        removed = set(header['removed'])
+        dropped = [idx for idx, sid in enumerate(labels) if sid == student_id and idx not in removed]
+        if not dropped:
+            return None
+
+        header['removed'] = sorted(removed.union(dropped))
+        header['version'] += 1
+        self._write_header(header)
+        return header['version']
+
+    def dead_fraction(self):
+        """Share of stored rows that belong to removed students"""
+        header = self.read_header()
+        if not header or header['rows'] == 0 or not header['removed']:
+            return 0.0
+        row_labels = np.fromfile(self._path(header, 'labels_file'), dtype=np.int32, count=header['rows'])
+        return float(np.isin(row_labels, header['removed']).mean())
+
+    def _read_ids(self, header):
+        """Student IDs of the committed labels, in label order"""
+        with open(self._path(header, 'ids_file'), 'rb') as f:
+            data = f.read(header['ids_bytes'])
+        return data.decode('utf-8').split('\n')[:header['num_labels']]
+
+    def _append_bytes(self, header, key, data, committed_size):
+        """
+        Append to a data file after dropping any uncommitted tail
+
+        A crash between an append and its header swap leaves bytes past the
+        committed size; they are never visible to readers and are cut here.
+        """
+        with open(self._path(header, key), 'r+b') as f:
+            f.truncate(committed_size)
+            f.seek(committed_size)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    # ------------------------------------------------------------------
+    # Migration
+    # ------------------------------------------------------------------
+
+    def migrate_legacy(self):
+        """
+        Convert a legacy face_embeddings.pkl (plus its journal) into the store
+
+        No-op once the store exists. The pickle is kept as <name>.migrated
+        for rollback. Callers hold `locked()`.
+
+        Returns:
+            True if a migration happened
+        """
+        pickle_path = self.legacy_pickle_path
+        journal_path = pickle_path + '.journal' if pickle_path else None
+        if self.exists() or not pickle_path:
+            return False
+        if not os.path.exists(pickle_path) and not os.path.exists(journal_path):
+            return False
+
+        gallery = EmbeddingGallery(dim=self.dim)
+        if os.path.exists(pickle_path):
+            with open(pickle_path, 'rb') as f:
+                gallery = EmbeddingGallery.from_dict(pickle.load(f), dim=self.dim)
+
+        if os.path.exists(journal_path):
+            with open(journal_path, 'rb') as f:
+                while True:
+                    try:
+                        action, student_id, embeddings = pickle.load(f)
+                    except EOFError:
+                        break
+                    if action == 'add':
+                        gallery.add(student_id, embeddings)
+                    elif action == 'remove':
+                        gallery.remove(student_id)
+
+        self.write_snapshot(gallery)
+
+        if os.path.exists(pickle_path):
+            os.replace(pickle_path, pickle_path + '.migrated')
+        for leftover in (journal_path, pickle_path + '.version', pickle_path + '.lock'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+        print(f"✅ Migrated {gallery.num_students} students from {pickle_path} to {self.store_dir}")
+        return True
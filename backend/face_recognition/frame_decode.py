@@ -0,0 +1,114 @@
+"""
+Reduced-resolution frame decoding
+Detection never needs every pixel of a 1080p/4K upload (the DNN detector
+shrinks the frame to 300x300 anyway), so the frame is decoded at 1/2, 1/4
+or 1/8 scale with the JPEG decoder's built-in downscaling. The full
+resolution frame is decoded only when face crops have to be cut for FaceNet
+"""
+
+import io
+import threading
+import cv2
+import numpy as np
+from PIL import Image
+
+# EXIF orientations that rotate the image by 90 degrees (width and height swap)
+EXIF_ORIENTATION_TAG = 0x0112
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+# Largest reduction first
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2)
+)
+
+
+def encoded_size(data):
+    """
+    Frame (width, height) from the image header, without decoding pixels
+
+    cv2.imdecode applies the EXIF orientation, so the size is the one after
+    that rotation (phone JPEGs are often stored sideways).
+
+    Returns:
+        (width, height), or None if the format is not recognized
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as header:
+            width, height = header.size
+            if header.getexif().get(EXIF_ORIENTATION_TAG) in TRANSPOSED_ORIENTATIONS:
+                width, height = height, width
+            return width, height
+    except Exception:
+        return None
+
+
+def reduction_factor(width, height, min_side):
+    """
+    Largest decode reduction (1, 2, 4 or 8) that keeps the short side >= min_side
+
+    Args:
+        width, height: Full frame size
+        min_side: Smallest short side the detector should see
+    """
+    short_side = min(width, height)
+    for factor, _ in REDUCED_DECODE_FLAGS:
+        if short_side // factor >= min_side:
+            return factor
+    return 1
+
+
+class EncodedFrame:
+    """
+    An uploaded frame decoded at detection resolution
+
+    `image` is the reduced frame used for hashing, motion gating and
+    detection; `scale` maps its coordinates to the full frame. `full()`
+    decodes the full-resolution frame on first use only.
+    """
+
+    def __init__(self, data, min_side=480):
+        """
+        Args:
+            data: Encoded image bytes
+            min_side: Smallest short side of the detection image
+        """
+        self._buffer = np.frombuffer(data, np.uint8)
+        self._lock = threading.Lock()
+        self._full = None
+        self.factor = 1
+        self.scale = 1.0
+
+        size = encoded_size(data) if min_side else None
+        if size is not None:
+            self.factor = reduction_factor(size[0], size[1], min_side)
+
+        if self.factor == 1:
+            self.image = cv2.imdecode(self._buffer, cv2.IMREAD_COLOR)
+            self._full = self.image
+            return
+
+        self.image = cv2.imdecode(self._buffer, dict(REDUCED_DECODE_FLAGS)[self.factor])
+        if self.image is not None:
+            # The decoder rounds odd sizes up, so use the exact ratio
+            self.scale = size[0] / self.image.shape[1]
+
+    def full(self):
+        """Full-resolution BGR frame (decoded once, on first call)"""
+        with self._lock:
+            if self._full is None:
+                self._full = cv2.imdecode(self._buffer, cv2.IMREAD_COLOR)
+            return self._full
+
+    def to_full(self, boxes):
+        """
+        Map boxes from detection-image to full-frame coordinates
+
+        Args:
+            boxes: [[x, y, w, h], ...] in `image` pixels
+
+        Returns:
+            List of [x, y, w, h] int lists in full-frame pixels
+        """
+        return [[int(round(v * self.scale)) for v in box] for box in boxes]
@@ -0,0 +1,441 @@
+"""
+Embedding gallery for CNN face recognition
+Keeps all enrolled FaceNet embeddings in one contiguous, L2-normalized
+float32 matrix so matching is a single matrix-vector product
+"""
+
+import warnings
+import numpy as np
+
+QUANTIZED_PRECISIONS = ('float16', 'int8')
+
+
+def l2_normalize(vectors):
+    """
+    L2-normalize embedding rows
+
+    Args:
+        vectors: (N, D) or (D,) array
+
+    Returns:
+        float32 array of the same shape with unit-length rows
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize_rows(matrix, precision):
+    """
+    Quantize L2-normalized embedding rows
+
+    Args:
+        matrix: (N, D) float32 array
+        precision: 'float16', or 'int8' with one scale per row
+
+    Returns:
+        (quantized, scales); scales is None for float16
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if precision == 'float16':
+        return matrix.astype(np.float16), None
+
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.round(matrix / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+class EmbeddingGallery:
+    """
+    Contiguous matrix of enrolled embeddings
+
+    A student may own several rows in any order. `row_labels[i]` is the index into
+    `labels` of the student owning row i, so `labels[row_labels]` is the
+    parallel row -> student_id array. Removed rows keep their place in the
+    matrix with a label of -1, so the matrix may be a read-only memmap.
+    """
+
+    def __init__(self, matrix=None, row_labels=None, labels=None, dim=512):
+        if matrix is None:
+            matrix = np.empty((0, dim), dtype=np.float32)
+            row_labels = np.empty(0, dtype=np.int32)
+            labels = []
+
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.row_labels = np.asarray(row_labels, dtype=np.int32)
+        self.labels = list(labels)
+        self.dim = self.matrix.shape[1]
+        self.set_quantized(None)  # Optional float16/int8 copy used for coarse scans
+        self._index_rows()
+
+    @classmethod
+    def from_dict(cls, embeddings, dim=512):
+        """
+        Build a gallery from {student_id: [embedding1, embedding2, ...]}
+        """
+        labels = []
+        blocks = []
+        row_labels = []
+
+        for student_id, student_embeddings in embeddings.items():
+            if len(student_embeddings) == 0:
+                continue
+            label = len(labels)
+            labels.append(student_id)
+            blocks.append(np.vstack(student_embeddings))
+            row_labels.append(np.full(len(student_embeddings), label, dtype=np.int32))
+
+        if not blocks:
+            return cls(dim=dim)
+
+        return cls(
+            matrix=l2_normalize(np.vstack(blocks)),
+            row_labels=np.concatenate(row_labels),
+            labels=labels
+        )
+
+    def copy(self):
+        """
+        Copy of the gallery that can be modified while this one is searched
+
+        add/remove always build new arrays, so the matrix is shared until then
+        """
+        return EmbeddingGallery(self.matrix, self.row_labels, self.labels)
+
+    def to_dict(self):
+        """Return the gallery as {student_id: [embedding, ...]}"""
+        embeddings = {}
+        for label, student_id in enumerate(self.labels):
+            rows = np.asarray(self.matrix[self.row_labels == label])
+            if len(rows) > 0:
+                embeddings[student_id] = [row.copy() for row in rows]
+        return embeddings
+
+    def _index_rows(self):
+        """Recompute per-student row counts used by search"""
+        live = self.row_labels >= 0
+        counts = np.bincount(self.row_labels[live], minlength=len(self.labels))
+        self._label_of = {sid: label for label, sid in enumerate(self.labels) if counts[label] > 0}
+        self._max_rows_per_student = int(counts.max()) if len(counts) > 0 else 0
+        self._dead_rows = None if live.all() else ~live
+        self._label_rows = None
+        self.prototypes = None  # (P, D) per-student prototypes, see build_prototypes()
+        self.prototype_labels = None
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def num_live_rows(self):
+        return len(self) if self._dead_rows is None else int(len(self) - self._dead_rows.sum())
+
+    @property
+    def num_students(self):
+        return len(self._label_of)
+
+    @property
+    def student_ids(self):
+        return list(self._label_of.keys())
+
+    @property
+    def row_ids(self):
+        """Parallel row -> student_id array"""
+        return np.asarray(self.labels, dtype=object)[self.row_labels]
+
+    def __contains__(self, student_id):
+        return student_id in self._label_of
+
+    def add(self, student_id, embeddings):
+        """
+        Append embeddings for a student (existing rows are kept)
+
+        Args:
+            student_id: Student ID
+            embeddings: (N, D) array or list of embedding vectors
+        """
+        embeddings = l2_normalize(np.vstack(embeddings))
+        if student_id in self._label_of:
+            label = self._label_of[student_id]
+        else:
+            label = len(self.labels)
+            self.labels.append(student_id)
+
+        self.matrix = np.vstack([self.matrix, embeddings])
+        self.set_quantized(None)
+        self.row_labels = np.concatenate([
+            self.row_labels, np.full(len(embeddings), label, dtype=np.int32)
+        ])
+        self._index_rows()
+
+    def remove(self, student_id):
+        """
+        Drop all rows of a student (rows are tombstoned, the matrix is untouched)
+
+        Returns:
+            Number of rows removed
+        """
+        label = self._label_of.get(student_id)
+        if label is None:
+            return 0
+
+        dropped = self.row_labels == label
+        self.row_labels = np.where(dropped, -1, self.row_labels).astype(np.int32)
+        self._index_rows()
+        return int(dropped.sum())
+
+    def subset(self, student_ids):
+        """
+        Gallery restricted to the given students (rows are copied)
+
+        Args:
+            student_ids: Iterable of student IDs; unknown IDs are ignored
+        """
+        wanted = [self._label_of[sid] for sid in student_ids if sid in self._label_of]
+        if not wanted:
+            return EmbeddingGallery(dim=self.dim)
+
+        keep = np.flatnonzero(np.isin(self.row_labels, wanted))
+        return EmbeddingGallery(
+            np.asarray(self.matrix[keep]), self.row_labels[keep], self.labels
+        )
+
+    def compacted(self):
+        """Copy of the gallery without removed rows or unused labels"""
+        return EmbeddingGallery.from_dict(self.to_dict(), dim=self.dim)
+
+    def _rows_by_label(self):
+        """
+        Live rows grouped by label
+
+        Returns:
+            (offsets, rows): rows of label l are rows[offsets[l]:offsets[l + 1]]
+        """
+        if self._label_rows is None:
+            live_rows = np.flatnonzero(self.row_labels >= 0)
+            rows = live_rows[np.argsort(self.row_labels[live_rows], kind='stable')]
+            offsets = np.searchsorted(self.row_labels[rows], np.arange(len(self.labels) + 1))
+            self._label_rows = (offsets, rows)
+        return self._label_rows
+
+    def build_prototypes(self, per_student=1):
+        """
+        Compute a compact set of prototypes for every student
+
+        Args:
+            per_student: 1 for the normalized centroid; more for k-medoids
+                (students with fewer rows keep all of them)
+        """
+        offsets, rows = self._rows_by_label()
+        counts = np.diff(offsets)
+        present = np.flatnonzero(counts > 0)
+
+        if len(present) == 0:
+            self.prototypes = np.empty((0, self.dim), dtype=np.float32)
+            self.prototype_labels = np.empty(0, dtype=np.int32)
+            return
+
+        if per_student <= 1:
+            sums = np.add.reduceat(np.asarray(self.matrix[rows]), offsets[present], axis=0)
+            self.prototypes = l2_normalize(sums)
+            self.prototype_labels = present.astype(np.int32)
+            return
+
+        prototypes = []
+        prototype_labels = []
+        for label in present:
+            vectors = np.asarray(self.matrix[rows[offsets[label]:offsets[label + 1]]])
+            medoids = _k_medoids(vectors, per_student)
+            prototypes.append(vectors[medoids])
+            prototype_labels.append(np.full(len(medoids), label, dtype=np.int32))
+
+        self.prototypes = np.vstack(prototypes)
+        self.prototype_labels = np.concatenate(prototype_labels)
+
+    def search_prototypes(self, query, k=1, shortlist=10):
+        """
+        Two-stage search: score prototypes, then re-rank the shortlisted
+        students against all of their embeddings
+
+        Args:
+            query: (D,) embedding vector
+            k: Number of students to return
+            shortlist: Students kept from the prototype stage
+        """
+        if self.num_students == 0 or k <= 0:
+            return []
+        if self.prototypes is None:
+            self.build_prototypes()
+
+        query = l2_normalize(query)
+        scores = self.prototypes @ query
+
+        # A student owns at most `per_student` prototypes, so this many
+        # covers `shortlist` distinct students
+        per_student = int(np.bincount(self.prototype_labels).max())
+        n_top = min(len(scores), max(shortlist, k) * per_student)
+        top = np.argpartition(-scores, n_top - 1)[:n_top]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        labels, first = np.unique(self.prototype_labels[top], return_index=True)
+        shortlisted = labels[np.argsort(first)][:max(shortlist, k)]
+
+        offsets, rows = self._rows_by_label()
+        candidates = np.concatenate([rows[offsets[l]:offsets[l + 1]] for l in shortlisted])
+        return self._top_students(self.matrix[candidates] @ query, k, candidates)
+
+    def set_quantized(self, quantized, scales=None):
+        """
+        Attach a quantized copy of the matrix (e.g. memory-mapped from the store)
+
+        Args:
+            quantized: (N, D) float16 or int8 array, row-aligned with the matrix
+            scales: (N,) float32 per-row scales for int8
+        """
+        self.quantized = quantized
+        self.quantized_scales = scales
+        self._quantized_tensor = None
+
+    def quantize(self, precision):
+        """Build the quantized copy in memory ('float32' drops it)"""
+        if precision not in QUANTIZED_PRECISIONS:
+            self.set_quantized(None)
+            return
+        self.set_quantized(*quantize_rows(self.matrix, precision))
+
+    def _coarse_scores(self, query, chunk_size=16384):
+        """Approximate cosine similarity of every row from the quantized copy"""
+        if self.quantized.dtype == np.float16:
+            # numpy has no fast float16 GEMV; torch does
+            import torch
+            if self._quantized_tensor is None:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')  # Read-only memmap
+                    self._quantized_tensor = torch.from_numpy(self.quantized)
+            query_tensor = torch.from_numpy(query.astype(np.float16))
+            return (self._quantized_tensor @ query_tensor).float().numpy()
+
+        # int8: dequantize chunk by chunk so the float32 temporary stays small
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), chunk_size):
+            chunk = self.quantized[start:start + chunk_size]
+            scores[start:start + chunk_size] = chunk.astype(np.float32) @ query
+        scores *= self.quantized_scales
+        return scores
+
+    def search(self, query, k=1, rerank=32):
+        """
+        Find the k closest students to a query embedding
+
+        With a quantized copy attached, every row is scored on the quantized
+        matrix and only the best `rerank` rows are re-scored in float32.
+
+        Args:
+            query: (D,) embedding vector
+            k: Number of students to return
+            rerank: Rows re-ranked exactly after a quantized scan
+
+        Returns:
+            List of (student_id, cosine_distance), best match first
+        """
+        if self.num_students == 0 or k <= 0:
+            return []
+
+        query = l2_normalize(query)
+
+        if self.quantized is not None:
+            coarse = self._coarse_scores(query)
+            if self._dead_rows is not None:
+                coarse[self._dead_rows] = -np.inf
+            n_rows = min(len(coarse), max(rerank, k * self._max_rows_per_student))
+            rows = np.argpartition(-coarse, n_rows - 1)[:n_rows]
+            return self._top_students(self.matrix[rows] @ query, k, rows)
+
+        scores = self.matrix @ query
+
+        return self._top_students(scores, k)
+
+    def search_rows(self, query, rows, k=1):
+        """
+        Like search(), but only scores the given candidate rows
+
+        Args:
+            query: (D,) embedding vector
+            rows: Row indices to score (e.g. from an ANN index)
+            k: Number of students to return
+        """
+        if self.num_students == 0 or k <= 0 or len(rows) == 0:
+            return []
+
+        query = l2_normalize(query)
+        rows = np.asarray(rows, dtype=np.int64)
+        scores = self.matrix[rows] @ query
+
+        return self._top_students(scores, k, rows)
+
+    def _top_students(self, scores, k, rows=None):
+        """
+        Reduce per-row scores to the k best distinct students
+
+        A student contributes at most `_max_rows_per_student` rows, so the
+        best row of each of the top k students is always inside the top
+        k * _max_rows_per_student rows.
+
+        Args:
+            scores: Cosine similarity per scored row
+            k: Number of students to return
+            rows: Gallery row of each score (None means all rows in order)
+        """
+        row_labels = self.row_labels if rows is None else self.row_labels[rows]
+        if self._dead_rows is not None:
+            dead = self._dead_rows if rows is None else self._dead_rows[rows]
+            scores[dead] = -np.inf
+
+        k = min(k, self.num_students)
+        n_candidates = min(len(scores), k * self._max_rows_per_student)
+
+        if n_candidates < len(scores):
+            candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+        else:
+            candidates = np.arange(len(scores))
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        # First occurrence of each label in score order is that student's best row
+        labels, first = np.unique(row_labels[candidates], return_index=True)
+        best = candidates[np.sort(first[labels >= 0])][:k]
+
+        return [
+            (self.labels[row_labels[i]], float(1.0 - scores[i]))
+            for i in best
+        ]
+
+
+def _k_medoids(vectors, k, iterations=10):
+    """
+    Indices of k medoid rows of a small set of unit vectors (cosine distance)
+
+    Farthest-point initialization followed by alternating assignment and
+    medoid update.
+    """
+    if len(vectors) <= k:
+        return np.arange(len(vectors))
+
+    distances = 1.0 - vectors @ vectors.T
+    medoids = [int(np.argmin(distances.sum(axis=1)))]
+    while len(medoids) < k:
+        medoids.append(int(np.argmax(distances[:, medoids].min(axis=1))))
+    medoids = np.array(medoids)
+
+    for _ in range(iterations):
+        assignment = np.argmin(distances[:, medoids], axis=1)
+        updated = medoids.copy()
+        for cluster in range(k):
+            members = np.flatnonzero(assignment == cluster)
+            if len(members) > 0:
+                within = distances[np.ix_(members, members)].sum(axis=1)
+                updated[cluster] = members[np.argmin(within)]
+        if np.array_equal(updated, medoids):
+            break
+        medoids = updated
+
+    return medoids
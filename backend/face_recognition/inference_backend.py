@@ -0,0 +1,174 @@
+"""
+CPU inference backends for the FaceNet embedder
+
+    eager        the PyTorch module as built (reference)
+    torchscript  BatchNorm folded into conv/linear weights, traced and frozen
+    int8         static int8 quantization (FX graph mode) of the convolutions
+                 and linear layers, calibrated on enrolled face crops
+
+Optimized backends are checked against the eager model at startup and fall
+back to eager if their embeddings drift.
+"""
+
+import copy
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+INFERENCE_BACKENDS = ('eager', 'torchscript', 'int8')
+
+
+def _fold_bn(weight, bias, bn):
+    """Fold an eval-mode BatchNorm into the preceding layer's weight/bias"""
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    shape = [-1] + [1] * (weight.dim() - 1)
+    if bias is None:
+        bias = torch.zeros_like(bn.running_mean)
+    return weight * scale.reshape(shape), (bias - bn.running_mean) * scale + bn.bias
+
+
+def fold_batchnorm(model):
+    """
+    Copy of an InceptionResnetV1 with every conv/linear + BatchNorm pair fused
+
+    Args:
+        model: Eval-mode InceptionResnetV1
+
+    Returns:
+        New module; the BatchNorm layers are replaced by nn.Identity
+    """
+    model = copy.deepcopy(model).eval()
+
+    with torch.no_grad():
+        for module in model.modules():
+            conv, bn = getattr(module, 'conv', None), getattr(module, 'bn', None)
+            if isinstance(conv, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d):
+                weight, bias = _fold_bn(conv.weight, conv.bias, bn)
+                fused = nn.Conv2d(conv.in_channels, conv.out_channels, conv.kernel_size,
+                                  stride=conv.stride, padding=conv.padding, bias=True)
+                fused.weight.copy_(weight)
+                fused.bias.copy_(bias)
+                module.conv, module.bn = fused, nn.Identity()
+
+        linear, bn = model.last_linear, model.last_bn
+        weight, bias = _fold_bn(linear.weight, linear.bias, bn)
+        fused = nn.Linear(linear.in_features, linear.out_features, bias=True)
+        fused.weight.copy_(weight)
+        fused.bias.copy_(bias)
+        model.last_linear, model.last_bn = fused, nn.Identity()
+
+    return model
+
+
+def random_faces(batch_size, seed=0):
+    """Seeded pseudo-random images in the normalized [-1, 1] range used by preprocess_face"""
+    generator = torch.Generator().manual_seed(seed)
+    return torch.rand(batch_size, 3, 160, 160, generator=generator) * 2 - 1
+
+
+def quantize_static(model, calibration, batch_size=8):
+    """
+    Post-training static int8 quantization of every conv and linear layer
+
+    FX graph mode fuses conv + BatchNorm (+ ReLU), inserts observers,
+    runs the calibration batches to record activation ranges and converts
+    the graph to quantized kernels for the current quantized engine.
+
+    Args:
+        model: Eval-mode InceptionResnetV1
+        calibration: (N, 3, 160, 160) preprocessed faces
+        batch_size: Calibration batch size
+
+    Returns:
+        Quantized GraphModule
+    """
+    qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+    prepared = prepare_fx(copy.deepcopy(model).eval(), qconfig_mapping, (calibration[:batch_size],))
+    with torch.no_grad():
+        for start in range(0, len(calibration), batch_size):
+            prepared(calibration[start:start + batch_size])
+    return convert_fx(prepared)
+
+
+def build_backend(model, backend, example_batch=8, calibration=None):
+    """
+    Build an inference module from the eager FaceNet model
+
+    Args:
+        model: Eval-mode InceptionResnetV1 on CPU
+        backend: One of INFERENCE_BACKENDS
+        example_batch: Batch size of the tracing input
+        calibration: Preprocessed faces for int8 calibration (default: random images)
+
+    Returns:
+        Callable module mapping (N, 3, 160, 160) -> (N, 512)
+    """
+    if backend == 'eager':
+        return model
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+
+    if backend == 'int8':
+        if calibration is None:
+            calibration = random_faces(32)
+        optimized = quantize_static(model, calibration)
+    else:
+        optimized = fold_batchnorm(model)
+
+    example = torch.zeros(example_batch, 3, 160, 160)
+    with torch.no_grad():
+        traced = torch.jit.trace(optimized, example)
+        return torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+
+
+def compare_embeddings(reference, candidate, batch_size=8, seed=0, faces=None):
+    """
+    Lowest cosine similarity between two models' embeddings on a fixed batch
+
+    Args:
+        faces: Preprocessed faces to compare on (default: batch_size random images)
+    """
+    if faces is None:
+        faces = random_faces(batch_size, seed)
+    with torch.no_grad():
+        expected = reference(faces)
+        actual = candidate(faces)
+    return float(torch.nn.functional.cosine_similarity(expected, actual, dim=1).min())
+
+
+def load_inference_model(model, backend, min_cosine=0.995, calibration=None):
+    """
+    Build the configured backend and verify it against the eager model
+
+    Args:
+        model: Eval-mode InceptionResnetV1
+        backend: One of INFERENCE_BACKENDS
+        min_cosine: Lowest acceptable cosine similarity to eager embeddings
+        calibration: Preprocessed real faces; int8 calibrates on them and
+            the self-check compares on them
+
+    Returns:
+        (module, backend actually in use)
+    """
+    if backend == 'eager':
+        return model, 'eager'
+
+    if next(model.parameters()).device.type != 'cpu':
+        print(f"ℹ️  Inference backend '{backend}' is CPU-only, using eager")
+        return model, 'eager'
+
+    try:
+        optimized = build_backend(model, backend, calibration=calibration)
+        similarity = compare_embeddings(model, optimized, faces=calibration)
+    except Exception as e:
+        print(f"⚠️ Could not build inference backend '{backend}': {e}")
+        return model, 'eager'
+
+    if similarity < min_cosine:
+        print(f"⚠️ Inference backend '{backend}' failed self-check "
+              f"(cosine {similarity:.5f} < {min_cosine}), using eager")
+        return model, 'eager'
+
+    print(f"✅ Inference backend '{backend}' passed self-check (cosine {similarity:.5f})")
+    return optimized, backend
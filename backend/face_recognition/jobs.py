@@ -0,0 +1,143 @@
+"""
+Background queue for gallery jobs
+Enrollment embedding and full retraining run on one worker thread instead
+of inside the HTTP request. There is at most one queued job per gallery:
+new requests are merged into it, so a burst of registrations becomes a
+single batched embedding pass (or rides along with a queued retrain)
+"""
+
+import threading
+import time
+import traceback
+from datetime import datetime
+from models.job import Job
+
+
+class JobQueue:
+    """
+    Gallery job queue of one recognizer
+
+    Jobs are 'enroll' (embed the saved images of new students) or 'train'
+    (re-embed every student from disk). A 'train' job covers everything an
+    'enroll' job would do, so merging an enrollment into a queued train job
+    just records the student.
+    """
+
+    def __init__(self, recognizer, retention_hours=24):
+        self.recognizer = recognizer
+        self.retention_hours = retention_hours
+        self._cond = threading.Condition()
+        self._pending = None  # Queued job: {'id', 'kind', 'students': {student_id: image paths}}
+        self._running = None  # Job id being processed
+        self._worker = None
+        self.stats = {'submitted': 0, 'merged': 0, 'completed': 0, 'failed': 0}
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='gallery-jobs', daemon=True)
+            self._worker.start()
+
+    def _submit(self, kind, student_id=None, image_paths=None):
+        """Queue a job or merge it into the queued one; returns the job id"""
+        with self._cond:
+            self.stats['submitted'] += 1
+            pending = self._pending
+            if pending is None:
+                students = {student_id: image_paths} if student_id else {}
+                record = Job.create(kind, list(students))
+                self._pending = {'id': record['jobId'], 'kind': kind, 'students': students, 'requests': 1}
+            else:
+                self.stats['merged'] += 1
+                if kind == 'train':
+                    pending['kind'] = 'train'
+                if student_id:
+                    pending['students'][student_id] = image_paths
+                pending['requests'] += 1
+                Job.update(pending['id'], {
+                    'kind': pending['kind'],
+                    'studentIds': list(pending['students']),
+                    'requests': pending['requests']
+                })
+            job_id = self._pending['id']
+            self._ensure_worker()
+            self._cond.notify()
+            return job_id
+
+    def submit_enroll(self, student_id, image_paths):
+        """
+        Queue embedding of a new student's saved face images
+
+        Args:
+            student_id: Student ID
+            image_paths: Paths of the saved face images
+
+        Returns:
+            Job id (shared with the requests it was merged with)
+        """
+        return self._submit('enroll', student_id, image_paths)
+
+    def cancel_student(self, student_id):
+        """
+        Drop a deleted student from the queued job
+
+        A job that is already running skips the student itself
+        (add_students checks that the student still exists).
+
+        Returns:
+            True if the student was queued
+        """
+        with self._cond:
+            pending = self._pending
+            if pending is None or student_id not in pending['students']:
+                return False
+            del pending['students'][student_id]
+            Job.update(pending['id'], {'studentIds': list(pending['students'])})
+            return True
+
+    def submit_train(self):
+        """Queue a full retrain from the enrolled images on disk; returns the job id"""
+        return self._submit('train')
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                job, self._pending = self._pending, None
+                self._running = job['id']
+
+            Job.update(job['id'], {'status': 'running', 'startedAt': datetime.now().isoformat()})
+            print(f"🔄 Job {job['id']}: {job['kind']} ({len(job['students'])} students, {job['requests']} requests)")
+            start = time.perf_counter()
+            try:
+                if job['kind'] == 'train':
+                    success, message = self.recognizer.train(force_retrain=True)
+                else:
+                    success, message = self.recognizer.add_students(job['students'])
+            except Exception as e:
+                traceback.print_exc()
+                success, message = False, str(e)
+
+            Job.update(job['id'], {
+                'status': 'done' if success else 'failed',
+                'success': success,
+                'message': message,
+                'finishedAt': datetime.now().isoformat(),
+                'elapsedMs': round((time.perf_counter() - start) * 1000, 1)
+            })
+            print(f"{'✅' if success else '❌'} Job {job['id']}: {message}")
+
+            with self._cond:
+                self._running = None
+                self.stats['completed' if success else 'failed'] += 1
+            Job.prune(self.retention_hours)
+
+    def get_stats(self):
+        """
+        Returns:
+            Dict with submitted/merged/completed/failed counters and the queued/running job ids
+        """
+        with self._cond:
+            return dict(self.stats,
+                        queued=self._pending['id'] if self._pending else None,
+                        running=self._running)
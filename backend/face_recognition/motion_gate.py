@@ -0,0 +1,140 @@
+"""
+Motion / scene-change gate for live sessions
+Compares a small grayscale thumbnail of each frame with the previous one:
+unchanged frames reuse the last result, frames with a few changed regions
+only re-detect those regions
+"""
+
+import copy
+import threading
+import time
+import cv2
+import numpy as np
+
+THUMBNAIL_WIDTH = 160
+
+
+class MotionGate:
+    """
+    Per-session frame gate
+
+    check() classifies a frame as 'skip' (reuse the last result),
+    'partial' (re-detect only the changed regions) or 'full'.
+    """
+
+    def __init__(self, pixel_threshold=25, skip_fraction=0.002, partial_fraction=0.25, max_skips=10):
+        self.pixel_threshold = pixel_threshold  # Gray-level change that counts as motion
+        self.skip_fraction = skip_fraction  # Changed thumbnail share below which a frame is skipped
+        self.partial_fraction = partial_fraction  # Changed share above which the whole frame is re-detected
+        self.max_skips = max_skips  # Consecutive skips before a forced full pass
+        self.lock = threading.Lock()  # Held by callers around check()/store()
+        self.last_used = time.time()
+
+        self._thumbnail = None
+        self._shape = None
+        self._skips_in_row = 0
+        self.last_boxes = []  # Detections of the last processed frame
+        self.last_results = None
+        self._full_ms = None  # Moving average of a full pipeline pass
+
+        self.stats = {'frames': 0, 'skipped': 0, 'partial': 0, 'full': 0, 'saved_ms': 0.0}
+
+    def _make_thumbnail(self, image):
+        h, w = image.shape[:2]
+        size = (THUMBNAIL_WIDTH, max(1, int(h * THUMBNAIL_WIDTH / w)))
+        gray = cv2.cvtColor(cv2.resize(image, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)  # Ignore sensor noise
+
+    def check(self, image, roi=None):
+        """
+        Compare a frame with the previous one
+
+        Args:
+            image: BGR frame
+            roi: Optional RegionOfInterest; motion outside it is ignored
+
+        Returns:
+            ('skip', None), ('partial', [[x, y, w, h], ...]) in frame pixels, or ('full', None)
+        """
+        self.last_used = time.time()
+        self.stats['frames'] += 1
+        thumbnail = self._make_thumbnail(image)
+        previous, self._thumbnail = self._thumbnail, thumbnail
+
+        if previous is None or self.last_results is None or self._shape != image.shape:
+            self._shape = image.shape
+            return 'full', None
+
+        mask = (cv2.absdiff(thumbnail, previous) > self.pixel_threshold).astype(np.uint8)
+        if roi is not None:
+            # Doorways and projector screens outside the ROI do not count
+            roi_mask = roi.scaled_mask(image.shape, mask.shape)
+            mask &= roi_mask
+            changed = float(mask.sum()) / max(int(roi_mask.sum()), 1)
+        else:
+            changed = float(mask.mean())
+
+        if changed < self.skip_fraction and self._skips_in_row < self.max_skips:
+            self._skips_in_row += 1
+            return 'skip', None
+
+        self._skips_in_row = 0
+        if changed > self.partial_fraction:
+            return 'full', None
+
+        # Changed regions in frame pixels, padded so a moving face is fully inside
+        mask = cv2.dilate(mask, np.ones((9, 9), np.uint8))
+        count, _, components, _ = cv2.connectedComponentsWithStats(mask)
+        scale = image.shape[1] / thumbnail.shape[1]
+        frame_h, frame_w = image.shape[:2]
+
+        regions = []
+        for x, y, w, h, _ in components[1:count]:
+            pad = max(w, h) * scale * 0.5
+            x1 = int(max(0, x * scale - pad))
+            y1 = int(max(0, y * scale - pad))
+            x2 = int(min(frame_w, (x + w) * scale + pad))
+            y2 = int(min(frame_h, (y + h) * scale + pad))
+            regions.append([x1, y1, x2 - x1, y2 - y1])
+        return 'partial', regions
+
+    def store(self, mode, boxes, results, elapsed_ms):
+        """
+        Remember a processed frame and update the counters
+
+        Args:
+            mode: Result of check()
+            boxes: Detections used for the frame (frame pixels)
+            results: Recognition results returned for the frame
+            elapsed_ms: Time spent on the frame
+        """
+        self.stats[mode] += 1
+        if mode == 'full':
+            self._full_ms = elapsed_ms if self._full_ms is None else 0.8 * self._full_ms + 0.2 * elapsed_ms
+        elif self._full_ms is not None:
+            self.stats['saved_ms'] += max(0.0, self._full_ms - elapsed_ms)
+        self.last_boxes = [np.asarray(box) for box in boxes]
+        self.last_results = copy.deepcopy(results)
+
+    def reuse(self, elapsed_ms):
+        """Last result for a skipped frame"""
+        self.stats['skipped'] += 1
+        if self._full_ms is not None:
+            self.stats['saved_ms'] += max(0.0, self._full_ms - elapsed_ms)
+        return copy.deepcopy(self.last_results)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['saved_ms'] = round(stats['saved_ms'], 1)
+        stats['full_frame_ms'] = round(self._full_ms, 1) if self._full_ms is not None else None
+        return stats
+
+
+def boxes_outside(boxes, regions):
+    """Boxes that do not overlap any of the regions"""
+    kept = []
+    for box in boxes:
+        x, y, w, h = [int(v) for v in box]
+        if not any(x < rx + rw and rx < x + w and y < ry + rh and ry < y + h for rx, ry, rw, rh in regions):
+            kept.append(box)
+    return kept
@@ -3,6 +3,8 @@ MTCNN Face Detector using PyTorch
 Multi-task Cascaded Convolutional Networks for face detection
 """
 
+import importlib.util
+import os
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -10,6 +12,11 @@ import cv2
 import numpy as np
 from PIL import Image
 import torchvision.transforms as transforms
+import threading
+import time
+from config import Config
+from face_recognition.pools import ResourcePool
+from face_recognition.alignment import align_faces
 
 
 class PNet(nn.Module):
@@ -58,6 +65,7 @@ class RNet(nn.Module):
         x = self.pool1(self.prelu1(self.conv1(x)))
         x = self.pool2(self.prelu2(self.conv2(x)))
         x = self.prelu3(self.conv3(x))
+        x = x.permute(0, 3, 2, 1).contiguous()  # Flatten in the layout the pretrained weights expect
         x = x.view(x.size(0), -1)
         x = self.prelu4(self.dense4(x))
         scores = F.softmax(self.dense5_1(x), dim=1)
@@ -92,6 +100,7 @@ class ONet(nn.Module):
         x = self.pool2(self.prelu2(self.conv2(x)))
         x = self.pool3(self.prelu3(self.conv3(x)))
         x = self.prelu4(self.conv4(x))
+        x = x.permute(0, 3, 2, 1).contiguous()  # Flatten in the layout the pretrained weights expect
         x = x.view(x.size(0), -1)
         x = self.prelu5(self.dense5(x))
         scores = F.softmax(self.dense6_1(x), dim=1)
@@ -100,13 +109,92 @@ class ONet(nn.Module):
         return scores, boxes, landmarks
 
 
+def tile_rects(width, height, tile_size, overlap):
+    """
+    Overlapping square tiles covering a frame
+    
+    Args:
+        width, height: Frame size
+        tile_size: Tile side in pixels (clamped to the frame)
+        overlap: Fraction of a tile shared with its neighbour
+    
+    Returns:
+        List of (x, y, w, h); the last row/column is aligned to the frame edge
+    """
+    def starts(length, size):
+        if length <= size:
+            return [0]
+        stride = max(1, int(size * (1 - overlap)))
+        positions = list(range(0, length - size, stride))
+        return positions + [length - size]
+    
+    tile_w, tile_h = min(tile_size, width), min(tile_size, height)
+    return [(x, y, tile_w, tile_h) for y in starts(height, tile_h) for x in starts(width, tile_w)]
+
+
+def _cascade_pool(filename, size):
+    """Pool of OpenCV cascade classifiers (None if the cascade file is unavailable)"""
+    path = cv2.data.haarcascades + filename
+    if cv2.CascadeClassifier(path).empty():
+        return None
+    return ResourcePool(lambda: cv2.CascadeClassifier(path), size=size, name=filename)
+
+
+# Skin tone ranges in HSV (lighter and darker skin)
+SKIN_LOWER_LIGHT = np.array([0, 20, 70], dtype=np.uint8)
+SKIN_UPPER_LIGHT = np.array([20, 255, 255], dtype=np.uint8)
+SKIN_LOWER_DARK = np.array([0, 10, 60], dtype=np.uint8)
+SKIN_UPPER_DARK = np.array([25, 150, 255], dtype=np.uint8)
+
+
+class _FrameBuffers:
+    """
+    Color conversions of one frame, shared by every candidate box
+    
+    HSV and grayscale are computed lazily, once, over the bounding rectangle
+    of all boxes; each check slices its box out of them.
+    """
+    
+    def __init__(self, image, boxes):
+        self.image = image
+        self._hsv = None
+        self._gray = None
+        
+        height, width = image.shape[:2]
+        if len(boxes) > 0:
+            boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+            self.x0 = int(np.clip(boxes[:, 0].min(), 0, width))
+            self.y0 = int(np.clip(boxes[:, 1].min(), 0, height))
+            self.x1 = int(np.clip((boxes[:, 0] + boxes[:, 2]).max(), self.x0, width))
+            self.y1 = int(np.clip((boxes[:, 1] + boxes[:, 3]).max(), self.y0, height))
+        else:
+            self.x0, self.y0, self.x1, self.y1 = 0, 0, width, height
+    
+    @property
+    def hsv(self):
+        if self._hsv is None:
+            self._hsv = cv2.cvtColor(self.image[self.y0:self.y1, self.x0:self.x1], cv2.COLOR_BGR2HSV)
+        return self._hsv
+    
+    @property
+    def gray(self):
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.image[self.y0:self.y1, self.x0:self.x1], cv2.COLOR_BGR2GRAY)
+        return self._gray
+    
+    def region(self, buffer, box):
+        """Slice a box (full-image coordinates) out of a shared buffer"""
+        x, y, w, h = box
+        return buffer[y - self.y0:y - self.y0 + h, x - self.x0:x - self.x0 + w]
+
+
 class SimpleFaceDetector:
     """
     Simplified face detector using OpenCV's DNN module with pre-trained model
     Faster and more reliable than MTCNN for this use case
     """
     
-    def __init__(self, min_confidence=0.7):  # Increased from 0.5 to 0.7 for stricter detection
+    def __init__(self, min_confidence=0.7, method='dnn'):  # Increased from 0.5 to 0.7 for stricter detection
         self.min_confidence = min_confidence
         
         # Use OpenCV's DNN face detector (ResNet-based)
@@ -114,29 +202,46 @@ class SimpleFaceDetector:
         model_file = "opencv_face_detector_uint8.pb"
         config_file = "opencv_face_detector.pbtxt"
         
+        # cv2 nets and cascades are not safe for concurrent calls: every
+        # request thread borrows its own instance from a bounded pool
+        pool_size = Config.DETECTOR_POOL_SIZE
+        
         # Try to load DNN model, fallback to Haar Cascade if not available
         try:
             model_path = os.path.join(os.path.dirname(__file__), '..', 'data', model_file)
             config_path = os.path.join(os.path.dirname(__file__), '..', 'data', config_file)
             
-            if os.path.exists(model_path) and os.path.exists(config_path):
-                self.net = cv2.dnn.readNetFromTensorflow(model_path, config_path)
+            if method != 'haar' and os.path.exists(model_path) and os.path.exists(config_path):
+                self.net_pool = ResourcePool(
+                    lambda: cv2.dnn.readNetFromTensorflow(model_path, config_path),
+                    size=pool_size, name='dnn_net'
+                )
+                with self.net_pool.acquire():
+                    pass  # Load the first net now so a broken model falls back to Haar
                 self.use_dnn = True
-                print("✅ Using DNN face detector")
+                print(f"✅ Using DNN face detector (pool of {pool_size})")
             else:
                 # Fallback to Haar Cascade
-                self.face_cascade = cv2.CascadeClassifier(
-                    cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-                )
+                self.face_cascade_pool = _cascade_pool('haarcascade_frontalface_default.xml', pool_size)
                 self.use_dnn = False
                 print("✅ Using Haar Cascade face detector (fallback)")
         except Exception as e:
             print(f"⚠️ DNN model loading failed: {e}")
-            self.face_cascade = cv2.CascadeClassifier(
-                cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-            )
+            self.face_cascade_pool = _cascade_pool('haarcascade_frontalface_default.xml', pool_size)
             self.use_dnn = False
             print("✅ Using Haar Cascade face detector (fallback)")
+        
+        # Eye cascade for the face-structure check, loaded once per pooled instance
+        self.eye_cascade_pool = _cascade_pool('haarcascade_eye.xml', pool_size)
+        
+        # False-positive filter chain, cheapest check first
+        self.filters = [
+            ('skin_tone', self._has_skin_tone, "❌ No skin tone detected"),
+            ('edge_density', self._has_appropriate_edge_density, "❌ Inappropriate edge density"),
+            ('face_structure', self._has_face_structure, "❌ No face structure detected"),
+        ]
+        self.filter_stats = {name: {'calls': 0, 'rejected': 0, 'seconds': 0.0} for name, _, _ in self.filters}
+        self._stats_lock = threading.Lock()
     
     def detect_faces(self, image):
         """
@@ -148,102 +253,123 @@ class SimpleFaceDetector:
         Returns:
             List of face bounding boxes [[x, y, w, h], ...]
         """
-        if self.use_dnn:
-            faces = self._detect_dnn(image)
-        else:
-            faces = self._detect_haar(image)
+        faces = self._detect(image)
         
         # CRITICAL: Validate each detected face to prevent false positives in empty spaces
+        frame = _FrameBuffers(image, faces)
         validated_faces = []
         for face in faces:
-            if self._validate_face_region(image, face):
+            if self._validate_face_region(frame, face):
                 validated_faces.append(face)
             else:
                 print(f"⚠️  Rejected false detection at {face}")
         
         return validated_faces if len(validated_faces) > 0 else np.array([])
     
-    def _validate_face_region(self, image, box):
+    def detect_with_landmarks(self, image):
+        """
+        Detect faces together with five-point landmarks when the detector has them
+        
+        Returns:
+            (boxes, landmarks); landmarks is an (N, 5, 2) array or None
+        """
+        return self.detect_faces(image), None
+    
+    def _detect(self, image):
+        """Raw detections of the active backend (before validation)"""
+        if self.use_dnn:
+            return self._detect_dnn(image)
+        return self._detect_haar(image)
+    
+    def _validate_face_region(self, frame, box):
         """
         Validate that detected region is actually a face (not empty space/wall/object)
         
+        Runs the filter chain cheapest check first and stops at the first rejection.
+        
         Args:
-            image: Full image
+            frame: _FrameBuffers of the full image
             box: Detected face box [x, y, w, h]
         
         Returns:
             True if valid face, False if false positive
         """
         x, y, w, h = [int(v) for v in box]
+        image = frame.image
         
         # Ensure box is within image bounds
         if x < 0 or y < 0 or x + w > image.shape[1] or y + h > image.shape[0]:
             return False
         
-        # Extract region
-        region = image[y:y+h, x:x+w]
-        
-        if region.size == 0:
-            return False
-        
-        # 1. Check if region has skin-like colors
-        if not self._has_skin_tone(region):
-            print(f"❌ No skin tone detected")
-            return False
-        
-        # 2. Check for face-like structure (eyes, nose area)
-        if not self._has_face_structure(region):
-            print(f"❌ No face structure detected")
+        if w <= 0 or h <= 0:
             return False
         
-        # 3. Check edge density (faces have moderate edges, empty spaces have few)
-        if not self._has_appropriate_edge_density(region):
-            print(f"❌ Inappropriate edge density")
-            return False
+        for name, check, message in self.filters:
+            start = time.perf_counter()
+            passed = check(frame, (x, y, w, h))
+            elapsed = time.perf_counter() - start
+            
+            with self._stats_lock:
+                stats = self.filter_stats[name]
+                stats['calls'] += 1
+                stats['seconds'] += elapsed
+                if not passed:
+                    stats['rejected'] += 1
+            
+            if not passed:
+                print(message)
+                return False
         
         return True
     
-    def _has_skin_tone(self, region):
-        """Check if region contains skin-like colors"""
-        # Convert to HSV for better skin detection
-        hsv = cv2.cvtColor(region, cv2.COLOR_BGR2HSV)
-        
-        # Skin tone ranges in HSV
-        # Lower range (lighter skin)
-        lower1 = np.array([0, 20, 70], dtype=np.uint8)
-        upper1 = np.array([20, 255, 255], dtype=np.uint8)
+    def get_pool_stats(self):
+        """Wait-time counters of the detector's net/cascade pools"""
+        pools = [getattr(self, name, None) for name in ('net_pool', 'face_cascade_pool', 'eye_cascade_pool', 'mtcnn_pool')]
+        return {pool.name: pool.get_stats() for pool in pools if pool is not None}
+    
+    def get_filter_stats(self):
+        """
+        Per-check counters of the false-positive filter chain
         
-        # Upper range (darker skin)
-        lower2 = np.array([0, 10, 60], dtype=np.uint8)
-        upper2 = np.array([25, 150, 255], dtype=np.uint8)
+        Returns:
+            {name: {'calls', 'rejected', 'seconds', 'avg_ms'}} in chain order
+        """
+        with self._stats_lock:
+            return {
+                name: dict(stats, avg_ms=stats['seconds'] * 1000 / stats['calls'] if stats['calls'] else 0.0)
+                for name, stats in self.filter_stats.items()
+            }
+    
+    def _has_skin_tone(self, frame, box):
+        """Check if region contains skin-like colors"""
+        hsv = frame.region(frame.hsv, box)
         
-        # Create masks
-        mask1 = cv2.inRange(hsv, lower1, upper1)
-        mask2 = cv2.inRange(hsv, lower2, upper2)
+        # Create masks (lighter and darker skin ranges in HSV)
+        mask1 = cv2.inRange(hsv, SKIN_LOWER_LIGHT, SKIN_UPPER_LIGHT)
+        mask2 = cv2.inRange(hsv, SKIN_LOWER_DARK, SKIN_UPPER_DARK)
         mask = cv2.bitwise_or(mask1, mask2)
         
         # Calculate percentage of skin pixels
-        skin_percentage = np.sum(mask > 0) / mask.size
+        skin_percentage = cv2.countNonZero(mask) / mask.size
         
         # At least 15% of region should be skin-like
         return skin_percentage > 0.15
     
-    def _has_face_structure(self, region):
+    def _has_face_structure(self, frame, box):
         """Check if region has face-like structure using eye detection"""
-        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+        gray = frame.region(frame.gray, box)
         
         # Try to detect eyes (strong indicator of face)
-        try:
-            eye_cascade = cv2.CascadeClassifier(
-                cv2.data.haarcascades + 'haarcascade_eye.xml'
-            )
-            eyes = eye_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=3, minSize=(10, 10))
-            
-            # If at least one eye detected, likely a face
-            if len(eyes) > 0:
-                return True
-        except:
-            pass
+        if self.eye_cascade_pool is not None:
+            try:
+                with self.eye_cascade_pool.acquire() as eye_cascade:
+                    eyes = eye_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=3, minSize=(10, 10))
+                
+                # If at least one eye detected, likely a face
+                if len(eyes) > 0:
+                    return True
+            except cv2.error:
+                pass
         
         # Alternative: Check for horizontal symmetry (faces are roughly symmetric)
         h, w = gray.shape
@@ -266,15 +392,15 @@ class SimpleFaceDetector:
         
         return False
     
-    def _has_appropriate_edge_density(self, region):
+    def _has_appropriate_edge_density(self, frame, box):
         """Check edge density - faces have moderate edges, empty spaces have very few"""
-        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+        gray = frame.region(frame.gray, box)
         
         # Detect edges
         edges = cv2.Canny(gray, 50, 150)
         
         # Calculate edge density
-        edge_density = np.sum(edges > 0) / edges.size
+        edge_density = cv2.countNonZero(edges) / edges.size
         
         # Faces typically have 5-30% edge density
         # Empty walls/spaces have <3%
@@ -282,17 +408,21 @@ class SimpleFaceDetector:
         return 0.05 < edge_density < 0.35
     
     def _detect_dnn(self, image):
-        """Detect faces using DNN"""
+        """Detect faces using DNN (tiled for large frames when enabled)"""
         h, w = image.shape[:2]
         
+        if Config.DNN_TILED_DETECTION and max(h, w) > Config.DNN_TILE_MIN_FRAME:
+            return self._detect_dnn_tiled(image)
+        
         # Prepare image for DNN
         blob = cv2.dnn.blobFromImage(
             cv2.resize(image, (300, 300)), 1.0,
             (300, 300), (104.0, 177.0, 123.0)
         )
         
-        self.net.setInput(blob)
-        detections = self.net.forward()
+        with self.net_pool.acquire() as net:
+            net.setInput(blob)
+            detections = net.forward()
         
         faces = []
         for i in range(detections.shape[2]):
@@ -313,20 +443,128 @@ class SimpleFaceDetector:
         
         return faces if len(faces) > 0 else np.array([])
     
+    def _detect_dnn_tiled(self, image):
+        """
+        Detect faces on overlapping tiles plus a downscaled full view
+        
+        Every view is resized to 300x300 and run in one blobFromImages batch,
+        so the cost per frame only depends on the frame resolution. Boxes cut
+        by an inner tile border are dropped (the overlapping tile sees the
+        whole face) and the rest are merged across views with NMS.
+        
+        Args:
+            image: BGR frame
+        
+        Returns:
+            List of face boxes [x, y, w, h] in frame coordinates
+        """
+        h, w = image.shape[:2]
+        views = [(0, 0, w, h)] + tile_rects(w, h, Config.DNN_TILE_SIZE, Config.DNN_TILE_OVERLAP)
+        
+        blob = cv2.dnn.blobFromImages(
+            [cv2.resize(image[y:y + th, x:x + tw], (300, 300)) for x, y, tw, th in views],
+            1.0, (300, 300), (104.0, 177.0, 123.0)
+        )
+        with self.net_pool.acquire() as net:
+            net.setInput(blob)
+            detections = net.forward().reshape(-1, 7)
+        
+        # Column 0 is the index of the view in the batch
+        detections = detections[detections[:, 2] > self.min_confidence]
+        boxes, scores = [], []
+        for view_id, _, confidence, left, top, right, bottom in detections:
+            vx, vy, vw, vh = views[int(view_id)]
+            x1, x2 = vx + np.clip([left, right], 0, 1) * vw
+            y1, y2 = vy + np.clip([top, bottom], 0, 1) * vh
+            
+            if int(view_id) > 0:
+                # Skip faces cut by a tile border that is not a frame border
+                margin = 2
+                if (x1 <= vx + margin and vx > 0) or (y1 <= vy + margin and vy > 0) or \
+                   (x2 >= vx + vw - margin and vx + vw < w) or (y2 >= vy + vh - margin and vy + vh < h):
+                    continue
+            
+            if x2 - x1 > 20 and y2 - y1 > 20:  # Minimum face size
+                boxes.append([int(x1), int(y1), int(x2 - x1), int(y2 - y1)])
+                scores.append(float(confidence))
+        
+        if len(boxes) == 0:
+            return np.array([])
+        
+        keep = cv2.dnn.NMSBoxes(boxes, scores, self.min_confidence, Config.DNN_TILE_NMS_THRESHOLD)
+        return [np.array(boxes[i]) for i in np.array(keep).flatten()]
+    
     def _detect_haar(self, image):
         """Detect faces using Haar Cascade with STRICT parameters"""
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         gray = cv2.equalizeHist(gray)
         
-        faces = self.face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=1.1,      # Increased from 1.05 for stricter detection
-            minNeighbors=5,       # Increased from 3 to reduce false positives
-            minSize=(40, 40)      # Increased from (20, 20) to ignore tiny detections
-        )
+        with self.face_cascade_pool.acquire() as face_cascade:
+            faces = face_cascade.detectMultiScale(
+                gray,
+                scaleFactor=1.1,      # Increased from 1.05 for stricter detection
+                minNeighbors=5,       # Increased from 3 to reduce false positives
+                minSize=(40, 40)      # Increased from (20, 20) to ignore tiny detections
+            )
         
         return faces
     
+    def extract_faces(self, image, boxes, output_size=160):
+        """
+        Face crops for FaceNet, landmark-aligned when Config.FACE_ALIGNMENT is on
+        
+        Args:
+            image: Input image (BGR)
+            boxes: Face bounding boxes [[x, y, w, h], ...]
+            output_size: Output face size (default: 160x160 for FaceNet)
+        
+        Returns:
+            List of RGB crops, one per box
+        """
+        if not Config.FACE_ALIGNMENT or len(boxes) == 0:
+            return [self.extract_face(image, box, output_size) for box in boxes]
+        
+        boxes = np.asarray([np.asarray(box, dtype=np.float32) for box in boxes]).reshape(-1, 4)
+        return align_faces(image, boxes, self.landmarks(image, boxes), output_size)
+    
+    def landmarks(self, image, boxes):
+        """
+        Eye centers from the eye cascade (the other landmarks stay unknown)
+        
+        Args:
+            image: BGR frame
+            boxes: (N, 4) face boxes [x, y, w, h]
+        
+        Returns:
+            (N, 5, 2) array in frame pixels, NaN where a point was not found
+        """
+        points = np.full((len(boxes), 5, 2), np.nan, dtype=np.float32)
+        if self.eye_cascade_pool is None:
+            return points
+        
+        frame = _FrameBuffers(image, boxes)
+        height, width = image.shape[:2]
+        with self.eye_cascade_pool.acquire() as eye_cascade:
+            for n, box in enumerate(boxes):
+                x, y, w, h = [int(v) for v in box]
+                x, y = max(0, x), max(0, y)
+                w, h = min(w, width - x), min(h, height - y)
+                if w < 20 or h < 20:
+                    continue
+                
+                # Eyes sit in the upper half of the face box
+                upper = frame.region(frame.gray, (x, y, w, h // 2))
+                eyes = eye_cascade.detectMultiScale(upper, scaleFactor=1.1, minNeighbors=3, minSize=(w // 10, w // 10))
+                if len(eyes) < 2:
+                    continue
+                
+                eyes = sorted(eyes, key=lambda e: e[2] * e[3], reverse=True)[:2]
+                centers = sorted((x + ex + ew / 2, y + ey + eh / 2) for ex, ey, ew, eh in eyes)
+                # One eye on each side of the face center
+                if centers[0][0] < x + w / 2 < centers[1][0]:
+                    points[n, 0], points[n, 1] = centers
+        return points
+    
     def extract_face(self, image, box, output_size=160):
         """
         Extract and preprocess face from image
@@ -360,16 +598,368 @@ class SimpleFaceDetector:
         return face
 
 
-import os
+PYRAMID_GAP = 16  # Empty pixels between pyramid levels in the PNet mosaic
+
+
+def load_mtcnn_weights(net, name):
+    """
+    Load pretrained P/R/O-Net weights shipped with the facenet-pytorch package
+    
+    Returns:
+        True if the weights were loaded
+    """
+    spec = importlib.util.find_spec('facenet_pytorch')
+    if spec is None or not spec.submodule_search_locations:
+        print("⚠️ facenet-pytorch is not installed, no MTCNN weights")
+        return False
+    weights_file = os.path.join(spec.submodule_search_locations[0], 'data', f'{name}.pt')
+    
+    try:
+        net.load_state_dict(torch.load(weights_file, map_location='cpu'))
+        return True
+    except Exception as e:
+        print(f"⚠️ Failed to load MTCNN weights from {weights_file}: {e}")
+        return False
+
+
+def nms(boxes, scores, threshold, method='union'):
+    """
+    Greedy non-maximum suppression
+    
+    Args:
+        boxes: (N, 4) array of x1, y1, x2, y2
+        scores: (N,) array
+        threshold: Overlap above which the lower-scoring box is dropped
+        method: 'union' (IoU) or 'min' (intersection over the smaller box)
+    
+    Returns:
+        Indices of the kept boxes, best first
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    area = (x2 - x1 + 1) * (y2 - y1 + 1)
+    order = np.argsort(-scores)
+    keep = []
+    while len(order) > 0:
+        i, rest = order[0], order[1:]
+        keep.append(i)
+        w = np.maximum(0.0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]) + 1)
+        h = np.maximum(0.0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]) + 1)
+        inter = w * h
+        if method == 'min':
+            overlap = inter / np.minimum(area[i], area[rest])
+        else:
+            overlap = inter / (area[i] + area[rest] - inter)
+        order = rest[overlap <= threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def _regress(boxes, reg):
+    """Apply bounding-box regression offsets (relative to box size)"""
+    w = boxes[:, 2] - boxes[:, 0] + 1
+    h = boxes[:, 3] - boxes[:, 1] + 1
+    out = boxes.copy()
+    out[:, 0] += reg[:, 0] * w
+    out[:, 1] += reg[:, 1] * h
+    out[:, 2] += reg[:, 2] * w
+    out[:, 3] += reg[:, 3] * h
+    return out
+
+
+def _square(boxes):
+    """Expand boxes to squares around their centers"""
+    w = boxes[:, 2] - boxes[:, 0]
+    h = boxes[:, 3] - boxes[:, 1]
+    side = np.maximum(w, h)
+    out = boxes.copy()
+    out[:, 0] = boxes[:, 0] + w * 0.5 - side * 0.5
+    out[:, 1] = boxes[:, 1] + h * 0.5 - side * 0.5
+    out[:, 2] = out[:, 0] + side
+    out[:, 3] = out[:, 1] + side
+    return out
+
+
+def pack_pyramid(sizes, gap=PYRAMID_GAP):
+    """
+    Place pyramid levels side by side in columns of the largest level's height
+    
+    Args:
+        sizes: [(width, height), ...] from largest to smallest
+    
+    Returns:
+        (positions [(x, y), ...], mosaic width, mosaic height); positions are even
+    """
+    height = sizes[0][1]
+    positions = []
+    col_x, col_w, y = 0, 0, 0
+    for w, h in sizes:
+        if y > 0 and y + h > height:
+            col_x += col_w + gap
+            col_w, y = 0, 0
+        positions.append((col_x, y))
+        col_w = max(col_w, w + (w % 2))
+        y += h + gap + (h % 2)
+    return positions, col_x + col_w, height
+
+
+class MTCNNFaceDetector(SimpleFaceDetector):
+    """
+    MTCNN (P-Net -> R-Net -> O-Net) face detector with five-point landmarks
+    
+    The image pyramid is packed into a single mosaic so P-Net runs once per
+    frame; all R-Net and O-Net candidates are refined in one batch each.
+    Falls back to the DNN/Haar path if the MTCNN weights are unavailable.
+    """
+    
+    def __init__(self, min_confidence=0.7, min_face_size=20, thresholds=(0.6, 0.7, 0.7), factor=0.709):
+        super().__init__(min_confidence=min_confidence)
+        self.min_face_size = min_face_size
+        self.thresholds = thresholds
+        self.factor = factor
+        
+        nets = self._load_nets()
+        if nets is None:
+            self.mtcnn_pool = None
+            print("⚠️ MTCNN weights unavailable, using the DNN/Haar detector")
+            return
+        
+        # One (P, R, O) triple per concurrent request thread
+        self.mtcnn_pool = ResourcePool(self._load_nets, size=Config.DETECTOR_POOL_SIZE, name='mtcnn', initial=nets)
+        print("✅ Using MTCNN face detector")
+    
+    @staticmethod
+    def _load_nets():
+        nets = (PNet(), RNet(), ONet())
+        for net, name in zip(nets, ('pnet', 'rnet', 'onet')):
+            if not load_mtcnn_weights(net, name):
+                return None
+            net.eval()
+        return nets
+    
+    def detect_faces(self, image):
+        """
+        Detect faces (O-Net output is trusted, no heuristic validation)
+        
+        Args:
+            image: numpy array (BGR format from cv2)
+        
+        Returns:
+            List of face bounding boxes [[x, y, w, h], ...]
+        """
+        if self.mtcnn_pool is None:
+            return super().detect_faces(image)
+        boxes, _ = self.detect_with_landmarks(image)
+        return boxes if len(boxes) > 0 else np.array([])
+    
+    def detect_with_landmarks(self, image):
+        """
+        Detect faces and their five landmarks (eyes, nose, mouth corners)
+        
+        Returns:
+            (boxes, landmarks): list of [x, y, w, h] and an (N, 5, 2) array in
+            frame pixels
+        """
+        if self.mtcnn_pool is None:
+            return super().detect_with_landmarks(image)
+        
+        with self.mtcnn_pool.acquire() as (pnet, rnet, onet), torch.no_grad():
+            rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            boxes = self._stage_one(rgb, pnet)
+            if len(boxes):
+                boxes = self._stage_two(rgb, boxes, rnet)
+            landmarks = np.empty((0, 5, 2), dtype=np.float32)
+            if len(boxes):
+                boxes, landmarks = self._stage_three(rgb, boxes, onet)
+        
+        h, w = image.shape[:2]
+        faces, kept = [], []
+        for i, (x1, y1, x2, y2, score) in enumerate(boxes[:, :5] if len(boxes) else []):
+            if score < self.min_confidence:
+                continue
+            x1, y1 = max(0, int(x1)), max(0, int(y1))
+            x2, y2 = min(w, int(x2)), min(h, int(y2))
+            if x2 - x1 > 20 and y2 - y1 > 20:  # Minimum face size
+                faces.append(np.array([x1, y1, x2 - x1, y2 - y1]))
+                kept.append(i)
+        return faces, landmarks[kept]
+    
+    def landmarks(self, image, boxes):
+        """
+        Five O-Net landmarks for given boxes (any source: detection, tracker, ROI)
+        
+        Args:
+            image: BGR frame
+            boxes: (N, 4) face boxes [x, y, w, h]
+        
+        Returns:
+            (N, 5, 2) array in frame pixels
+        """
+        if self.mtcnn_pool is None:
+            return super().landmarks(image, boxes)
+        
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        corners = np.hstack([boxes[:, :2], boxes[:, :2] + boxes[:, 2:]])
+        corners = _square(corners)
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        with self.mtcnn_pool.acquire() as (_, _, onet), torch.no_grad():
+            _, _, points = self._run_batched(onet, rgb, corners, 48)
+        
+        points = points.numpy()
+        w = corners[:, 2] - corners[:, 0] + 1
+        h = corners[:, 3] - corners[:, 1] + 1
+        return np.stack([
+            w[:, None] * points[:, :5] + corners[:, 0:1] - 1,
+            h[:, None] * points[:, 5:] + corners[:, 1:2] - 1
+        ], axis=2).astype(np.float32)
+    
+    @staticmethod
+    def _to_tensor(images):
+        """uint8 RGB (N, H, W, 3) -> normalized float (N, 3, H, W)"""
+        batch = torch.from_numpy(np.ascontiguousarray(images)).permute(0, 3, 1, 2).float()
+        return (batch - 127.5) * 0.0078125
+    
+    def _stage_one(self, rgb, pnet):
+        """P-Net over the packed image pyramid: candidate boxes (x1, y1, x2, y2, score, reg...)"""
+        h, w = rgb.shape[:2]
+        scale = 12.0 / self.min_face_size
+        scales = []
+        while min(h, w) * scale >= 12:
+            scales.append(scale)
+            scale *= self.factor
+        if not scales:
+            return np.empty((0, 9), dtype=np.float32)
+        
+        sizes = [(int(np.ceil(w * s)), int(np.ceil(h * s))) for s in scales]
+        positions, mosaic_w, mosaic_h = pack_pyramid(sizes)
+        mosaic = np.zeros((mosaic_h, mosaic_w, 3), dtype=np.uint8)
+        mosaic[:] = 127  # Normalizes to ~0, like an empty background
+        for (lw, lh), (x, y) in zip(sizes, positions):
+            mosaic[y:y + lh, x:x + lw] = cv2.resize(rgb, (lw, lh), interpolation=cv2.INTER_AREA)
+        
+        probs, reg = pnet(self._to_tensor(mosaic[None]))
+        probs, reg = probs[0, 1].numpy(), reg[0].numpy()
+        
+        candidates = []
+        for scale, (lw, lh), (x, y) in zip(scales, sizes, positions):
+            # Output cell (i, j) sees the 12x12 mosaic window at (2j, 2i)
+            i0, j0 = y // 2, x // 2
+            i1, j1 = (y + lh - 12) // 2 + 1, (x + lw - 12) // 2 + 1
+            level_probs = probs[i0:i1, j0:j1]
+            ii, jj = np.nonzero(level_probs >= self.thresholds[0])
+            if len(ii) == 0:
+                continue
+            
+            level_reg = reg[:, i0:i1, j0:j1][:, ii, jj].T
+            boxes = np.stack([
+                np.floor((2 * jj + 1) / scale), np.floor((2 * ii + 1) / scale),
+                np.floor((2 * jj + 12) / scale), np.floor((2 * ii + 12) / scale),
+                level_probs[ii, jj]
+            ], axis=1)
+            level = np.hstack([boxes, level_reg]).astype(np.float32)
+            candidates.append(level[nms(level[:, :4], level[:, 4], 0.5)])
+        
+        if not candidates:
+            return np.empty((0, 9), dtype=np.float32)
+        
+        boxes = np.vstack(candidates)
+        boxes = boxes[nms(boxes[:, :4], boxes[:, 4], 0.7)]
+        
+        # P-Net regression is relative to the unpadded box size
+        w_box = boxes[:, 2] - boxes[:, 0]
+        h_box = boxes[:, 3] - boxes[:, 1]
+        regressed = boxes.copy()
+        regressed[:, 0] += boxes[:, 5] * w_box
+        regressed[:, 1] += boxes[:, 6] * h_box
+        regressed[:, 2] += boxes[:, 7] * w_box
+        regressed[:, 3] += boxes[:, 8] * h_box
+        regressed[:, :4] = _square(regressed[:, :4])
+        return regressed
+    
+    @staticmethod
+    def _crops(rgb, boxes, size):
+        """
+        Resized crops of every box as one batch
+        
+        Parts of a box outside the image are zero-padded (as in the reference
+        MTCNN), so R-Net/O-Net always see the box's own aspect ratio and their
+        regression offsets stay relative to the whole box.
+        """
+        h, w = rgb.shape[:2]
+        crops = np.zeros((len(boxes), size, size, 3), dtype=np.uint8)
+        for k, (x1, y1, x2, y2) in enumerate(boxes[:, :4].astype(np.int64)):
+            # 1-based inclusive box corners; (ix1, iy1)-(ix2, iy2) is the part inside the image
+            ix1, iy1 = max(x1, 1), max(y1, 1)
+            ix2, iy2 = min(x2, w), min(y2, h)
+            if ix2 < ix1 or iy2 < iy1:
+                continue
+            crop = rgb[iy1 - 1:iy2, ix1 - 1:ix2]
+            if (ix1, iy1, ix2, iy2) != (x1, y1, x2, y2):
+                padded = np.zeros((y2 - y1 + 1, x2 - x1 + 1, 3), dtype=np.uint8)
+                padded[iy1 - y1:iy2 - y1 + 1, ix1 - x1:ix2 - x1 + 1] = crop
+                crop = padded
+            crops[k] = cv2.resize(crop, (size, size), interpolation=cv2.INTER_AREA)
+        return crops
+    
+    def _run_batched(self, net, rgb, boxes, size, chunk_size=256):
+        """Run a refinement net over the crops of all boxes (bounded batch memory)"""
+        outputs = [
+            net(self._to_tensor(self._crops(rgb, boxes[start:start + chunk_size], size)))
+            for start in range(0, len(boxes), chunk_size)
+        ]
+        return [torch.cat(parts) for parts in zip(*outputs)]
+    
+    def _stage_two(self, rgb, boxes, rnet):
+        """R-Net refinement of all P-Net candidates in one batch"""
+        probs, reg = self._run_batched(rnet, rgb, boxes, 24)
+        scores = probs[:, 1].numpy()
+        passed = scores > self.thresholds[1]
+        if not passed.any():
+            return np.empty((0, 5), dtype=np.float32)
+        
+        boxes = np.hstack([boxes[passed, :4], scores[passed, None]])
+        reg = reg.numpy()[passed]
+        keep = nms(boxes[:, :4], boxes[:, 4], 0.7)
+        boxes = boxes[keep]
+        boxes[:, :4] = _square(_regress(boxes[:, :4], reg[keep]))
+        return boxes
+    
+    def _stage_three(self, rgb, boxes, onet):
+        """O-Net scores, final boxes and landmarks in one batch"""
+        probs, reg, points = self._run_batched(onet, rgb, boxes, 48)
+        scores = probs[:, 1].numpy()
+        passed = scores > self.thresholds[2]
+        if not passed.any():
+            return np.empty((0, 5), dtype=np.float32), np.empty((0, 5, 2), dtype=np.float32)
+        
+        boxes = np.hstack([boxes[passed, :4], scores[passed, None]])
+        points = points.numpy()[passed]
+        w = boxes[:, 2] - boxes[:, 0] + 1
+        h = boxes[:, 3] - boxes[:, 1] + 1
+        landmarks = np.stack([
+            w[:, None] * points[:, :5] + boxes[:, 0:1] - 1,
+            h[:, None] * points[:, 5:] + boxes[:, 1:2] - 1
+        ], axis=2)
+        
+        boxes[:, :4] = _regress(boxes[:, :4], reg.numpy()[passed])
+        keep = nms(boxes[:, :4], boxes[:, 4], 0.7, method='min')
+        return boxes[keep], landmarks[keep].astype(np.float32)
+
 
-def get_face_detector(min_confidence=0.5):
+def get_face_detector(min_confidence=0.5, method=None):
     """
     Get face detector instance
     
     Args:
         min_confidence: Minimum confidence for face detection
+        method: 'dnn' (DNN with Haar fallback), 'haar' or 'mtcnn'
+                (default: Config.FACE_DETECTOR)
     
     Returns:
-        SimpleFaceDetector instance
+        SimpleFaceDetector or MTCNNFaceDetector instance
     """
-    return SimpleFaceDetector(min_confidence=min_confidence)
+    method = method or Config.FACE_DETECTOR
+    if method == 'mtcnn':
+        return MTCNNFaceDetector(min_confidence=min_confidence, min_face_size=Config.MTCNN_MIN_FACE_SIZE)
+    return SimpleFaceDetector(min_confidence=min_confidence, method=method)
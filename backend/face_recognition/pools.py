@@ -0,0 +1,96 @@
+"""
+Bounded pools for objects that must not be used by two threads at once
+(cv2.dnn nets, cascade classifiers, the FaceNet forward pass)
+"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ResourcePool:
+    """
+    Hands out at most `size` objects, creating them lazily with `factory`
+
+    Threads that find every object in use wait in acquire(); the wait
+    time is recorded for get_stats().
+    """
+
+    def __init__(self, factory, size=1, name='pool', initial=None):
+        self.factory = factory
+        self.size = max(1, int(size))
+        self.name = name
+        self._idle = queue.LifoQueue()  # Most recently used first (warm caches)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._acquisitions = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        if initial is not None:
+            # Already-built first object (e.g. loaded eagerly to validate it)
+            self._idle.put(initial)
+            self._created = 1
+
+    def _take(self):
+        """Returns (resource, seconds spent waiting for another thread)"""
+        try:
+            return self._idle.get_nowait(), 0.0
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return self.factory(), 0.0
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        with self._lock:
+            self._waiting += 1
+        start = time.perf_counter()
+        try:
+            return self._idle.get(), time.perf_counter() - start
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    @contextmanager
+    def acquire(self):
+        """Borrow an object for the duration of the with-block"""
+        resource, waited = self._take()
+
+        with self._lock:
+            self._in_use += 1
+            self._acquisitions += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        try:
+            yield resource
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._idle.put(resource)
+
+    def get_stats(self):
+        """
+        Returns:
+            Dict with size, created, in_use, waiting, acquisitions, avg/max wait in ms
+        """
+        with self._lock:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'acquisitions': self._acquisitions,
+                'avg_wait_ms': round(self._total_wait * 1000 / self._acquisitions, 3) if self._acquisitions else 0.0,
+                'max_wait_ms': round(self._max_wait * 1000, 3)
+            }
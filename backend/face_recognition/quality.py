@@ -0,0 +1,97 @@
+"""
+Batch face-crop quality scoring
+Brightness (mean), contrast (std) and sharpness (Laplacian variance) of a
+whole stack of crops in one pass instead of one Python call per face
+"""
+
+import cv2
+import numpy as np
+
+
+def quality_metrics(crops):
+    """
+    Brightness, contrast and sharpness of every crop
+
+    Crops of the same size are stacked into one tall mosaic, so the gray
+    conversion and the Laplacian are a single OpenCV call per size. The
+    rows at the seams between crops are corrected to the reflected border
+    the per-crop Laplacian would use, so the results are identical.
+
+    Args:
+        crops: List of RGB (H, W, 3) or grayscale (H, W) uint8 crops
+
+    Returns:
+        (brightness, contrast, sharpness) float64 arrays of length N
+    """
+    n = len(crops)
+    brightness = np.zeros(n)
+    contrast = np.zeros(n)
+    sharpness = np.zeros(n)
+
+    groups = {}
+    for idx, crop in enumerate(crops):
+        groups.setdefault(crop.shape, []).append(idx)
+
+    for shape, indices in groups.items():
+        stack = np.stack([crops[idx] for idx in indices])
+        count, height, width = stack.shape[:3]
+        if stack.ndim == 4:
+            gray = cv2.cvtColor(stack.reshape(count * height, width, 3), cv2.COLOR_RGB2GRAY)
+            gray = gray.reshape(count, height, width)
+        else:
+            gray = stack
+        brightness[indices], contrast[indices] = _mean_std(gray.reshape(count, -1))
+
+        if height < 2:
+            continue
+        # Integer Laplacian (exact, and much faster than CV_64F)
+        laplacian = cv2.Laplacian(gray.reshape(count * height, width), cv2.CV_16S)
+        laplacian = laplacian.reshape(count, height, width)
+        if count > 1:
+            # Swap the neighbouring crop's edge row for the reflected row
+            first, second = gray[:, 0].astype(np.int16), gray[:, 1].astype(np.int16)
+            last, before_last = gray[:, -1].astype(np.int16), gray[:, -2].astype(np.int16)
+            laplacian[1:, 0] += second[1:] - last[:-1]
+            laplacian[:-1, -1] += before_last[:-1] - first[1:]
+        sharpness[indices] = _mean_std(laplacian.reshape(count, -1))[1] ** 2
+    return brightness, contrast, sharpness
+
+
+def _mean_std(rows):
+    """Per-row mean and population std, accumulated exactly in float64"""
+    values = rows.astype(np.float64)
+    total = values.sum(axis=1)
+    squares = np.einsum('ij,ij->i', values, values)
+    mean = total / rows.shape[1]
+    return mean, np.sqrt(np.maximum(squares / rows.shape[1] - mean ** 2, 0.0))
+
+
+def assess_quality(crops, min_brightness, max_brightness, min_contrast, min_sharpness):
+    """
+    Quality gate and score for a batch of face crops
+
+    Scores are 0-1 (higher is better). Crops failing a gate get a fixed
+    low score: 0.1 for bad lighting, 0.2 for low contrast, 0.3 for blur.
+
+    Args:
+        crops: List of RGB or grayscale uint8 crops
+        min_brightness, max_brightness: Allowed mean gray level
+        min_contrast: Minimum gray-level standard deviation
+        min_sharpness: Minimum Laplacian variance
+
+    Returns:
+        (passed, scores): bool and float arrays of length N
+    """
+    brightness, contrast, sharpness = quality_metrics(crops)
+
+    lit = (brightness >= min_brightness) & (brightness <= max_brightness)
+    contrasted = contrast >= min_contrast
+    sharp = sharpness >= min_sharpness
+
+    scores = (1.0 - np.abs(brightness - 128) / 128
+              + np.minimum(1.0, contrast / 80.0)
+              + np.minimum(1.0, sharpness / 500.0)) / 3.0
+    scores = np.where(sharp, scores, 0.3)
+    scores = np.where(contrasted, scores, 0.2)
+    scores = np.where(lit, scores, 0.1)
+    return lit & contrasted & sharp, scores
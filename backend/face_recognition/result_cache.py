@@ -0,0 +1,150 @@
+"""
+Short-lived result cache for repeated frames
+Entries are looked up by perceptual (difference) hash within a scope, and a
+hash within a few bits of a cached one is a candidate. A candidate is only a
+hit if a grayscale thumbnail of the frame also matches pixel by pixel, since
+a small face stepping into the frame barely moves a whole-frame hash. So
+re-uploads and frames that differ only by JPEG/sensor noise reuse the result
+"""
+
+import threading
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+
+def perceptual_hash(image, hash_size=8):
+    """
+    Difference hash of an image
+
+    Args:
+        image: BGR or RGB uint8 image
+        hash_size: Hash is hash_size * hash_size bits
+
+    Returns:
+        int
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(small[:, 1:] > small[:, :-1]).tobytes(), 'big')
+
+
+def thumbnail(image, size=64):
+    """
+    Grayscale size x size thumbnail used to verify hash candidates
+
+    Args:
+        image: BGR or RGB uint8 image
+
+    Returns:
+        (size, size) int16 array
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count('1')
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL and hit/miss/eviction counters
+
+    Keys are (scope, hash) pairs; get() returns the most recently used
+    entry of the same scope whose hash is within max_distance bits and,
+    when thumbnails are given, whose thumbnail differs by at most
+    max_pixel_delta gray levels in every pixel.
+    """
+
+    def __init__(self, max_entries=1024, ttl=2.0, max_distance=2, max_pixel_delta=12):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.max_pixel_delta = max_pixel_delta
+        self._entries = OrderedDict()  # (scope, hash) -> (expires_at, value, thumbnail), LRU order
+        self._scopes = {}  # scope -> {hash: None} in insertion order
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+    def _find(self, scope, image_hash, thumb, now):
+        """Key of the closest live entry, dropping expired entries it passes over"""
+        hashes = self._scopes.get(scope)
+        if not hashes:
+            return None
+
+        best, best_distance = None, self.max_distance
+        expired = []
+        for candidate in hashes:
+            distance = hamming_distance(candidate, image_hash)
+            if distance > best_distance:
+                continue
+            expires_at, _, cached_thumb = self._entries[(scope, candidate)]
+            if expires_at < now:
+                expired.append(candidate)
+                continue
+            if thumb is not None and cached_thumb is not None and \
+                    np.abs(thumb - cached_thumb).max() > self.max_pixel_delta:
+                continue
+            # Later entries are more recent, so ties go to the newest one
+            best, best_distance = candidate, distance
+        for candidate in expired:
+            self._remove((scope, candidate))
+        self.stats['expired'] += len(expired)
+        return (scope, best) if best is not None else None
+
+    def _remove(self, key):
+        del self._entries[key]
+        hashes = self._scopes[key[0]]
+        del hashes[key[1]]
+        if not hashes:
+            del self._scopes[key[0]]
+
+    def get(self, scope, image_hash, thumb=None):
+        """
+        Cached value for a (near-)identical image
+
+        Args:
+            scope: Hashable context the result is valid for (session, roster, ...)
+            image_hash: perceptual_hash() of the frame
+            thumb: Optional thumbnail() of the frame to verify candidates with
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        with self._lock:
+            key = self._find(scope, image_hash, thumb, time.time())
+            if key is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return self._entries[key][1]
+
+    def put(self, scope, image_hash, value, thumb=None):
+        """Store a result, evicting the least recently used entries beyond max_entries"""
+        with self._lock:
+            key = (scope, image_hash)
+            self._entries[key] = (time.time() + self.ttl, value, thumb)
+            self._entries.move_to_end(key)
+            hashes = self._scopes.setdefault(scope, {})
+            hashes.pop(image_hash, None)
+            hashes[image_hash] = None
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    def get_stats(self):
+        """
+        Returns:
+            Dict with hits, misses, evictions, expired, entries, max_entries, hit_rate
+        """
+        with self._lock:
+            stats = dict(self.stats, entries=len(self._entries), max_entries=self.max_entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
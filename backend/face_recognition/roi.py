@@ -0,0 +1,170 @@
+"""
+Region-of-interest masks for classroom cameras
+Polygons around the seating area keep doorways, windows and projector
+screens out of detection: only sub-images around the polygons are handed
+to the detector, with the pixels outside the polygons blacked out
+"""
+
+import json
+import threading
+import time
+import cv2
+import numpy as np
+
+MAX_POLYGONS = 16
+MAX_POINTS = 64
+
+
+def parse_polygons(polygons):
+    """
+    Validate ROI polygons
+
+    Points are [x, y] in frame pixels, or fractions of the frame width and
+    height when every coordinate of the polygon is within 0..1 (independent
+    of the camera resolution).
+
+    Args:
+        polygons: List of polygons, each a list of at least three [x, y] points
+
+    Returns:
+        List of polygons as lists of [x, y] floats
+
+    Raises:
+        ValueError: If the polygons are malformed
+    """
+    if not isinstance(polygons, (list, tuple)) or not polygons:
+        raise ValueError('ROI must be a non-empty list of polygons')
+    if len(polygons) > MAX_POLYGONS:
+        raise ValueError(f'ROI has more than {MAX_POLYGONS} polygons')
+
+    parsed = []
+    for polygon in polygons:
+        if not isinstance(polygon, (list, tuple)) or not 3 <= len(polygon) <= MAX_POINTS:
+            raise ValueError(f'Each ROI polygon needs 3 to {MAX_POINTS} points')
+        points = []
+        for point in polygon:
+            if not isinstance(point, (list, tuple)) or len(point) != 2:
+                raise ValueError('ROI points must be [x, y] pairs')
+            try:
+                x, y = float(point[0]), float(point[1])
+            except (TypeError, ValueError):
+                raise ValueError('ROI coordinates must be numbers')
+            if not (np.isfinite(x) and np.isfinite(y)) or x < 0 or y < 0:
+                raise ValueError('ROI coordinates must be non-negative')
+            points.append([x, y])
+        parsed.append(points)
+    return parsed
+
+
+def scale_polygons(polygons, factor):
+    """
+    Pixel polygons mapped to a frame resized by factor (fractional polygons are unchanged)
+
+    Args:
+        polygons: Parsed polygons (see parse_polygons)
+        factor: Size of the target frame relative to the original
+    """
+    return [[[x * factor, y * factor] for x, y in polygon]
+            if max(max(point) for point in polygon) > 1.0 else polygon
+            for polygon in polygons]
+
+
+class RegionOfInterest:
+    """
+    Rasterized ROI polygons
+
+    Masks and bounding rectangles are built once per frame size and cached,
+    so a live session pays for them on its first frame only.
+    """
+
+    def __init__(self, polygons):
+        self.polygons = parse_polygons(polygons)
+        self.key = json.dumps(self.polygons)  # Identifies the ROI in cache keys
+        self.last_used = time.time()  # Idle session ROIs are dropped
+        self._lock = threading.Lock()
+        self._layouts = {}  # (height, width) -> (mask, rects)
+        self._scaled_masks = {}  # (frame size, target size) -> resized frame mask
+
+    def _layout(self, shape):
+        """(mask, rects) for a frame of the given shape"""
+        size = (int(shape[0]), int(shape[1]))
+        layout = self._layouts.get(size)
+        if layout is not None:
+            return layout
+
+        height, width = size
+        mask = np.zeros((height, width), dtype=np.uint8)
+        for polygon in self.polygons:
+            points = np.array(polygon, dtype=np.float64)
+            if points.max() <= 1.0:
+                points = points * [width, height]
+            cv2.fillPoly(mask, [np.round(points).astype(np.int32)], 1)
+
+        # Overlapping polygons share one sub-image
+        count, _, components, _ = cv2.connectedComponentsWithStats(mask)
+        rects = [[int(x), int(y), int(w), int(h)] for x, y, w, h, _ in components[1:count]]
+
+        with self._lock:
+            self._layouts[size] = (mask, rects)
+        return mask, rects
+
+    def mask(self, shape):
+        """uint8 0/1 mask of the polygons for a frame of the given shape"""
+        return self._layout(shape)[0]
+
+    def scaled_mask(self, frame_shape, size):
+        """Frame mask resized to (height, width), e.g. a motion thumbnail"""
+        key = (int(frame_shape[0]), int(frame_shape[1]), int(size[0]), int(size[1]))
+        scaled = self._scaled_masks.get(key)
+        if scaled is None:
+            scaled = cv2.resize(self.mask(frame_shape), (key[3], key[2]), interpolation=cv2.INTER_NEAREST)
+            with self._lock:
+                self._scaled_masks[key] = scaled
+        return scaled
+
+    def rects(self, shape):
+        """Bounding rectangles [x, y, w, h] of the (merged) polygons"""
+        return self._layout(shape)[1]
+
+    def clip(self, regions, shape):
+        """
+        Intersect detection regions with the ROI rectangles
+
+        Args:
+            regions: [[x, y, w, h], ...] in frame pixels, or None for the whole frame
+            shape: Frame shape
+
+        Returns:
+            Non-empty intersections in frame pixels
+        """
+        rects = self.rects(shape)
+        if regions is None:
+            return list(rects)
+
+        clipped = []
+        for x, y, w, h in regions:
+            for rx, ry, rw, rh in rects:
+                x1, y1 = max(x, rx), max(y, ry)
+                x2, y2 = min(x + w, rx + rw), min(y + h, ry + rh)
+                if x2 > x1 and y2 > y1:
+                    clipped.append([x1, y1, x2 - x1, y2 - y1])
+        return clipped
+
+    def crop(self, image, region):
+        """Sub-image of a region with the pixels outside the polygons set to black"""
+        x, y, w, h = region
+        mask = self.mask(image.shape)[y:y + h, x:x + w]
+        sub = image[y:y + h, x:x + w]
+        return cv2.bitwise_and(sub, sub, mask=mask)
+
+    def contains(self, boxes, shape):
+        """Boolean per box: is the box center inside a polygon"""
+        mask = self.mask(shape)
+        height, width = mask.shape
+        inside = []
+        for box in boxes:
+            x, y, w, h = [float(v) for v in box]
+            cx = min(max(int(x + w / 2), 0), width - 1)
+            cy = min(max(int(y + h / 2), 0), height - 1)
+            inside.append(bool(mask[cy, cx]))
+        return inside
@@ -0,0 +1,66 @@
+"""
+Process-wide face recognition service
+All blueprints share one CNNFaceRecognizer (one copy of the FaceNet weights)
+and its face detector
+"""
+
+import threading
+from face_recognition.cnn_recognizer import CNNFaceRecognizer
+from face_recognition.jobs import JobQueue
+
+_recognizer = None
+_job_queue = None
+_init_lock = threading.Lock()
+
+
+def get_recognizer():
+    """
+    Get the shared CNN recognizer, creating it on first use
+
+    Returns:
+        CNNFaceRecognizer instance
+    """
+    global _recognizer
+    if _recognizer is None:
+        with _init_lock:
+            if _recognizer is None:
+                _recognizer = CNNFaceRecognizer()
+    return _recognizer
+
+
+def get_detector():
+    """
+    Get the face detector owned by the shared recognizer
+
+    Returns:
+        SimpleFaceDetector instance
+    """
+    return get_recognizer().detector
+
+
+def get_job_queue():
+    """
+    Get the background gallery job queue of the shared recognizer
+
+    Returns:
+        JobQueue instance
+    """
+    global _job_queue
+    if _job_queue is None:
+        recognizer = get_recognizer()
+        with _init_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue(recognizer)
+    return _job_queue
+
+
+def unenroll_student(student_id):
+    """
+    Remove a deleted student from the queued enrollment job and the gallery
+
+    Returns:
+        (success, message) of the gallery removal
+    """
+    if _job_queue is not None:
+        _job_queue.cancel_student(student_id)
+    return get_recognizer().remove_student(student_id)
@@ -0,0 +1,142 @@
+"""
+Cross-frame face tracking for live sessions
+Associates face boxes between consecutive frames (IoU, then centroid
+distance) so a face that was already identified keeps its identity without
+going through FaceNet again
+"""
+
+import threading
+import time
+import numpy as np
+
+
+def box_iou(boxes_a, boxes_b):
+    """
+    Pairwise IoU of two sets of [x, y, w, h] boxes
+
+    Returns:
+        (len(boxes_a), len(boxes_b)) array
+    """
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 0] + a[:, None, 2], b[None, :, 0] + b[None, :, 2])
+    y2 = np.minimum(a[:, None, 1] + a[:, None, 3], b[None, :, 1] + b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None, :] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+class Track:
+    """One face followed across frames"""
+
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        self.match = None  # Last recognition result dict (or None)
+        self.hits = 0  # Consecutive recognitions of the same student
+        self.missed = 0  # Frames since the track was last seen
+        self.frames_since_check = 0  # Frames since the last embedding
+
+
+class FaceTracker:
+    """
+    Per-session tracker that carries identities forward between frames
+
+    A track is confirmed once the same student was recognized on it
+    `confirm_hits` times in a row. Confirmed tracks skip the embedder
+    until `reverify_frames` frames have passed.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=5, confirm_hits=2, reverify_frames=30):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.confirm_hits = confirm_hits
+        self.reverify_frames = reverify_frames
+        self.tracks = []
+        self.gallery_version = None
+        self.last_used = time.time()
+        self.lock = threading.Lock()  # Held by callers around update()/record()
+        self._next_id = 0
+
+    def update(self, boxes):
+        """
+        Associate this frame's boxes with existing tracks
+
+        Args:
+            boxes: List of face boxes [x, y, w, h]
+
+        Returns:
+            List of Track, one per box in input order (new tracks for unmatched boxes)
+        """
+        self.last_used = time.time()
+        assigned = [None] * len(boxes)
+        free = list(range(len(self.tracks)))
+
+        if len(boxes) > 0 and self.tracks:
+            iou = box_iou(boxes, [t.box for t in self.tracks])
+
+            # Centroid distance relative to face size, for fast head movement
+            boxes_arr = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+            tracks_arr = np.asarray([t.box for t in self.tracks], dtype=np.float32)
+            centers_a = boxes_arr[:, :2] + boxes_arr[:, 2:] / 2
+            centers_b = tracks_arr[:, :2] + tracks_arr[:, 2:] / 2
+            distance = np.linalg.norm(centers_a[:, None] - centers_b[None], axis=2)
+            distance /= np.maximum(boxes_arr[:, 2:].max(axis=1), 1)[:, None]
+
+            # Greedy assignment, best IoU first, then closest centroid
+            score = np.where(iou >= self.iou_threshold, 1 + iou, np.where(distance < 0.5, 1 - distance, 0))
+            for flat in np.argsort(-score, axis=None):
+                box_idx, track_idx = np.unravel_index(flat, score.shape)
+                if score[box_idx, track_idx] <= 0:
+                    break
+                if assigned[box_idx] is None and track_idx in free:
+                    assigned[box_idx] = self.tracks[track_idx]
+                    free.remove(track_idx)
+
+        for track_idx in free:
+            self.tracks[track_idx].missed += 1
+
+        for box_idx, box in enumerate(boxes):
+            track = assigned[box_idx]
+            if track is None:
+                track = Track(self._next_id, box)
+                self._next_id += 1
+                self.tracks.append(track)
+                assigned[box_idx] = track
+            track.box = [int(v) for v in box]
+            track.missed = 0
+            track.frames_since_check += 1
+
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+        return assigned
+
+    def is_confirmed(self, track):
+        """Whether the track can reuse its identity without a new embedding"""
+        return (
+            track.match is not None
+            and track.hits >= self.confirm_hits
+            and track.frames_since_check < self.reverify_frames
+        )
+
+    def record(self, track, match):
+        """
+        Store a fresh recognition result for a track
+
+        Args:
+            track: Track that was embedded this frame
+            match: Result 'match' dict, or None if unrecognized
+        """
+        same = match is not None and track.match is not None and \
+            match['studentId'] == track.match['studentId']
+        track.hits = track.hits + 1 if same else (1 if match else 0)
+        track.match = match
+        track.frames_since_check = 0
+
+    def reset_identities(self, gallery_version):
+        """Forget carried identities after the gallery changed"""
+        for track in self.tracks:
+            track.match = None
+            track.hits = 0
+        self.gallery_version = gallery_version
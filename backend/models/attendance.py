@@ -9,8 +9,8 @@ class Attendance:
     attendance_collection = 'attendance'
     
     @staticmethod
-    def create_session(date, subject, department, year, division, teacher_id=None):
-        """Create a new attendance session"""
+    def create_session(date, subject, department, year, division, teacher_id=None, roi=None):
+        """Create a new attendance session (roi: optional camera ROI polygons)"""
         session = {
             'sessionId': str(uuid.uuid4()),
             'date': date,
@@ -21,7 +21,8 @@ class Attendance:
             'teacherId': teacher_id,
             'createdAt': datetime.now().isoformat(),
             'status': 'active',
-            'totalPresent': 0
+            'totalPresent': 0,
+            'roi': roi
         }
         
         result = db.insert_one(Attendance.sessions_collection, session)
@@ -32,6 +33,15 @@ class Attendance:
         """Get session by ID"""
         return db.find_one(Attendance.sessions_collection, {'sessionId': session_id})
     
+    @staticmethod
+    def set_session_roi(session_id, roi):
+        """Set or clear (roi=None) the camera ROI polygons of a session"""
+        return db.update_one(
+            Attendance.sessions_collection,
+            {'sessionId': session_id},
+            {'roi': roi}
+        )
+    
     @staticmethod
     def get_all_sessions():
         """Get all sessions"""
@@ -55,35 +65,37 @@ class Attendance:
     @staticmethod
     def mark_attendance(session_id, student_id, confidence):
         """Mark attendance for a student in a session"""
-        # Check if already marked
-        existing = db.find_one(
-            Attendance.attendance_collection,
-            {'sessionId': session_id, 'studentId': student_id}
-        )
+        # Check-then-insert under the write lock: concurrent frames must not mark twice
+        with db.write_lock():
+            # Check if already marked
+            existing = db.find_one(
+                Attendance.attendance_collection,
+                {'sessionId': session_id, 'studentId': student_id}
+            )
         
-        if existing:
-            return existing, "Already marked"
+            if existing:
+                return existing, "Already marked"
         
-        attendance_record = {
-            'sessionId': session_id,
-            'studentId': student_id,
-            'timestamp': datetime.now().isoformat(),
-            'confidence': confidence,
-            'status': 'present'
-        }
+            attendance_record = {
+                'sessionId': session_id,
+                'studentId': student_id,
+                'timestamp': datetime.now().isoformat(),
+                'confidence': confidence,
+                'status': 'present'
+            }
         
-        result = db.insert_one(Attendance.attendance_collection, attendance_record)
+            result = db.insert_one(Attendance.attendance_collection, attendance_record)
         
-        # Update session total present count
-        session = Attendance.get_session(session_id)
-        if session:
-            db.update_one(
-                Attendance.sessions_collection,
-                {'sessionId': session_id},
-                {'totalPresent': session.get('totalPresent', 0) + 1}
-            )
+            # Update session total present count
+            session = Attendance.get_session(session_id)
+            if session:
+                db.update_one(
+                    Attendance.sessions_collection,
+                    {'sessionId': session_id},
+                    {'totalPresent': session.get('totalPresent', 0) + 1}
+                )
         
-        return result, None
+            return result, None
     
     @staticmethod
     def get_session_attendance(session_id):
@@ -1,9 +1,17 @@
+import contextlib
 import json
 import os
+import tempfile
+import threading
 from datetime import datetime
 from pymongo import MongoClient
 from config import Config
 
+try:
+    import fcntl  # Cross-process write lock (not available on Windows)
+except ImportError:
+    fcntl = None
+
 class Database:
     """Database abstraction layer with MongoDB and JSON fallback"""
     
@@ -12,33 +20,69 @@ class Database:
         self.db = None
         self.json_storage = Config.JSON_STORAGE_PATH
         
+        # Read-modify-write cycles on the JSON files are serialized across
+        # request threads and worker processes (see write_lock)
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self.lock_path = os.path.join(self.json_storage, '.lock')
+        
         # Always use JSON fallback for now (MongoDB is optional)
         print("ℹ️  Using JSON file storage")
         self._init_json_storage()
     
     def _init_json_storage(self):
         """Initialize JSON storage files"""
-        collections = ['teachers', 'students', 'sessions', 'attendance']
+        collections = ['teachers', 'students', 'sessions', 'attendance', 'jobs']
         for collection in collections:
             filepath = os.path.join(self.json_storage, f'{collection}.json')
             if not os.path.exists(filepath):
                 with open(filepath, 'w') as f:
                     json.dump([], f)
     
+    @contextlib.contextmanager
+    def write_lock(self):
+        """
+        Hold the storage write lock (re-entrant within a thread)
+        
+        Every insert/update/delete runs under it; models wrap it around
+        check-then-write sequences that must not interleave.
+        """
+        with self._lock:
+            self._lock_depth += 1
+            lock_file = None
+            try:
+                if self._lock_depth == 1 and fcntl:
+                    lock_file = open(self.lock_path, 'a')
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+            finally:
+                self._lock_depth -= 1
+                if lock_file is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    lock_file.close()
+    
     def _read_json(self, collection):
         """Read data from JSON file"""
         filepath = os.path.join(self.json_storage, f'{collection}.json')
+        # Only a missing file reads as empty; a corrupt one raises, since the
+        # next write would otherwise replace the whole collection
         try:
             with open(filepath, 'r') as f:
                 return json.load(f)
-        except:
+        except FileNotFoundError:
             return []
     
     def _write_json(self, collection, data):
-        """Write data to JSON file"""
+        """Write data to JSON file (atomically: readers see the old or the new file, never half of one)"""
         filepath = os.path.join(self.json_storage, f'{collection}.json')
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+        fd, tmp_path = tempfile.mkstemp(dir=self.json_storage, prefix=f'.{collection}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2, default=str)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
     
     def insert_one(self, collection, document):
         """Insert a single document"""
@@ -47,13 +91,14 @@ class Database:
             document['_id'] = str(result.inserted_id)
             return document
         else:
-            data = self._read_json(collection)
-            # Generate simple ID
-            document['_id'] = str(len(data) + 1)
-            document['createdAt'] = datetime.now().isoformat()
-            data.append(document)
-            self._write_json(collection, data)
-            return document
+            with self.write_lock():
+                data = self._read_json(collection)
+                # Generate simple ID
+                document['_id'] = str(len(data) + 1)
+                document['createdAt'] = datetime.now().isoformat()
+                data.append(document)
+                self._write_json(collection, data)
+                return document
     
     def find_one(self, collection, query):
         """Find a single document"""
@@ -99,15 +144,16 @@ class Database:
             self.db[collection].update_one(query, {'$set': update})
             return True
         else:
-            data = self._read_json(collection)
-            for doc in data:
-                match = all(doc.get(k) == v for k, v in query.items())
-                if match:
-                    doc.update(update)
-                    doc['updatedAt'] = datetime.now().isoformat()
-                    self._write_json(collection, data)
-                    return True
-            return False
+            with self.write_lock():
+                data = self._read_json(collection)
+                for doc in data:
+                    match = all(doc.get(k) == v for k, v in query.items())
+                    if match:
+                        doc.update(update)
+                        doc['updatedAt'] = datetime.now().isoformat()
+                        self._write_json(collection, data)
+                        return True
+                return False
     
     def delete_one(self, collection, query):
         """Delete a single document"""
@@ -115,13 +161,14 @@ class Database:
             result = self.db[collection].delete_one(query)
             return result.deleted_count > 0
         else:
-            data = self._read_json(collection)
-            original_length = len(data)
-            data = [doc for doc in data if not all(doc.get(k) == v for k, v in query.items())]
-            if len(data) < original_length:
-                self._write_json(collection, data)
-                return True
-            return False
+            with self.write_lock():
+                data = self._read_json(collection)
+                original_length = len(data)
+                data = [doc for doc in data if not all(doc.get(k) == v for k, v in query.items())]
+                if len(data) < original_length:
+                    self._write_json(collection, data)
+                    return True
+                return False
     
     def delete_many(self, collection, query):
         """Delete multiple documents"""
@@ -129,13 +176,14 @@ class Database:
             result = self.db[collection].delete_many(query)
             return result.deleted_count
         else:
-            data = self._read_json(collection)
-            original_length = len(data)
-            data = [doc for doc in data if not all(doc.get(k) == v for k, v in query.items())]
-            deleted_count = original_length - len(data)
-            if deleted_count > 0:
-                self._write_json(collection, data)
-            return deleted_count
+            with self.write_lock():
+                data = self._read_json(collection)
+                original_length = len(data)
+                data = [doc for doc in data if not all(doc.get(k) == v for k, v in query.items())]
+                deleted_count = original_length - len(data)
+                if deleted_count > 0:
+                    self._write_json(collection, data)
+                return deleted_count
     
     def count_documents(self, collection, query=None):
         """Count documents matching query"""
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+from models.database import db
+import uuid
+
+class Job:
+    """Background gallery job (enrollment embedding / full training) status records"""
+
+    collection = 'jobs'
+
+    @staticmethod
+    def create(kind, student_ids=None):
+        """Create a queued job record"""
+        job = {
+            'jobId': str(uuid.uuid4()),
+            'kind': kind,
+            'status': 'queued',
+            'studentIds': list(student_ids or []),
+            'requests': 1,
+            'createdAt': datetime.now().isoformat(),
+            'startedAt': None,
+            'finishedAt': None,
+            'success': None,
+            'message': ''
+        }
+
+        return db.insert_one(Job.collection, job)
+
+    @staticmethod
+    def find_by_id(job_id):
+        """Get job by ID"""
+        return db.find_one(Job.collection, {'jobId': job_id})
+
+    @staticmethod
+    def update(job_id, updates):
+        """Update job fields"""
+        return db.update_one(Job.collection, {'jobId': job_id}, updates)
+
+    @staticmethod
+    def prune(max_age_hours=24):
+        """Delete finished jobs older than max_age_hours"""
+        cutoff = (datetime.now() - timedelta(hours=max_age_hours)).isoformat()
+        with db.write_lock():
+            old = [job['jobId'] for job in db.find(Job.collection)
+                   if job.get('finishedAt') and job['finishedAt'] < cutoff]
+            for job_id in old:
+                db.delete_one(Job.collection, {'jobId': job_id})
+        return len(old)
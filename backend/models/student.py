@@ -12,27 +12,28 @@ class Student:
     @staticmethod
     def create(name, student_id, department, year, division, email=None, phone=None):
         """Create a new student"""
-        # Check if student ID already exists
-        existing = db.find_one(Student.collection, {'studentId': student_id})
-        if existing:
-            return None, "Student ID already registered"
+        with db.write_lock():
+            # Check if student ID already exists
+            existing = db.find_one(Student.collection, {'studentId': student_id})
+            if existing:
+                return None, "Student ID already registered"
         
-        student = {
-            'name': name,
-            'studentId': student_id,
-            'department': department,
-            'year': year,
-            'division': division,
-            'email': email or '',
-            'phone': phone or '',
-            'faceImages': [],
-            'faceEncodings': [],
-            'createdAt': datetime.now().isoformat(),
-            'isActive': True
-        }
+            student = {
+                'name': name,
+                'studentId': student_id,
+                'department': department,
+                'year': year,
+                'division': division,
+                'email': email or '',
+                'phone': phone or '',
+                'faceImages': [],
+                'faceEncodings': [],
+                'createdAt': datetime.now().isoformat(),
+                'isActive': True
+            }
         
-        result = db.insert_one(Student.collection, student)
-        return result, None
+            result = db.insert_one(Student.collection, student)
+            return result, None
     
     @staticmethod
     def find_by_id(student_id):
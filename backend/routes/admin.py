@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from models.teacher import Teacher
 from models.student import Student
 from models.attendance import Attendance
+from face_recognition.service import get_recognizer, unenroll_student
 from config import Config
 
 admin_bp = Blueprint('admin', __name__)
@@ -79,6 +80,25 @@ def get_dashboard_stats():
             'error': str(e)
         }), 500
 
+@admin_bp.route('/api/admin/pipeline-stats', methods=['GET'])
+def get_pipeline_stats():
+    """Pool wait times, result-cache and filter counters of this worker"""
+    try:
+        recognizer = get_recognizer()
+        
+        return jsonify({
+            'success': True,
+            'pools': recognizer.pool_stats(),
+            'resultCache': recognizer.cache_stats(),
+            'filters': recognizer.detector.get_filter_stats()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @admin_bp.route('/api/admin/teachers', methods=['GET'])
 def get_all_teachers():
     """Get all teachers"""
@@ -150,6 +170,9 @@ def delete_student_admin(student_id):
                 'error': 'Student not found'
             }), 404
         
+        # Drop the student from a queued enrollment and their rows from the shared gallery
+        unenroll_student(student_id)
+        
         return jsonify({
             'success': True,
             'message': 'Student deleted successfully'
@@ -1,8 +1,8 @@
 from flask import Blueprint, request, jsonify
 from models.attendance import Attendance
 from models.student import Student
-from face_recognition.cnn_recognizer import CNNFaceRecognizer
-from face_recognition.mtcnn_detector import get_face_detector
+from face_recognition.service import get_recognizer, get_detector
+from face_recognition.roi import parse_polygons
 from openpyxl import Workbook
 from datetime import datetime
 import os
@@ -10,9 +10,9 @@ from config import Config
 
 attendance_bp = Blueprint('attendance', __name__)
 
-# Initialize face detector and recognizer (CNN-based)
-detector = get_face_detector()
-recognizer = CNNFaceRecognizer()
+# Shared face detector and recognizer (CNN-based, one instance per process)
+detector = get_detector()
+recognizer = get_recognizer()
 
 @attendance_bp.route('/api/attendance/create_session', methods=['POST'])
 def create_session():
@@ -26,6 +26,7 @@ def create_session():
         year = data.get('year')
         division = data.get('division')
         teacher_id = data.get('teacherId')
+        roi = data.get('roi')  # Optional camera ROI polygons
         
         if not all([date, subject, department, year, division]):
             return jsonify({
@@ -33,8 +34,17 @@ def create_session():
                 'error': 'Missing required fields'
             }), 400
         
+        if roi is not None:
+            try:
+                roi = parse_polygons(roi)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+        
         session, error = Attendance.create_session(
-            date, subject, department, year, division, teacher_id
+            date, subject, department, year, division, teacher_id, roi
         )
         
         if error:
@@ -56,6 +66,88 @@ def create_session():
             'error': str(e)
         }), 500
 
+def _parse_flag(value, default):
+    """Boolean request flag: JSON true/false, or a 'true'/'false' string from JSON, query or header"""
+    if value is None or value == '':
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() == 'true'
+    return bool(value)
+
+def _mark_frame(recognize, session_id=None, department=None, year=None, division=None,
+                search_all=False, roi=None):
+    """
+    Recognize one frame and mark attendance for the recognized students
+    
+    Args:
+        recognize: Callable(roster, roi) returning the recognition results
+        session_id: Optional live session (its class section is the roster)
+        department, year, division: Optional roster for demo mode
+        search_all: Search every enrolled student instead of the roster
+        roi: Optional ROI polygons for demo mode (sessions store their own)
+    
+    Returns:
+        (response, status code)
+    """
+    session = None
+    if session_id:
+        session = Attendance.get_session(session_id)
+        if not session:
+            return jsonify({
+                'success': False,
+                'error': 'Session not found'
+            }), 404
+        
+        # The session's class section is the roster
+        department = session.get('department')
+        year = session.get('year')
+        division = session.get('division')
+        roi = session.get('roi')
+    elif roi is not None:
+        try:
+            roi = parse_polygons(roi)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+    
+    roster = None
+    if not search_all and any([department, year, division]):
+        roster = (department, year, division)
+    
+    # Recognize faces in the image
+    results = recognize(roster, roi)
+    
+    if not results:
+        return jsonify({
+            'success': True,
+            'message': 'No faces detected',
+            'faces': []
+        }), 200
+    
+    # If session_id is provided, mark attendance
+    if session:
+        # Mark attendance for recognized students
+        for result in results:
+            if result['match']:
+                student_id = result['match']['studentId']
+                confidence = result['match']['confidence']
+                
+                # Mark attendance
+                record, error = Attendance.mark_attendance(
+                    session_id, student_id, confidence
+                )
+                
+                if error and error != "Already marked":
+                    print(f"Error marking attendance for {student_id}: {error}")
+    
+    return jsonify({
+        'success': True,
+        'faces': results,
+        'count': len(results)
+    }), 200
+
 @attendance_bp.route('/api/attendance/real-mark', methods=['POST'])
 def real_time_mark():
     """Real-time face recognition and attendance marking"""
@@ -63,12 +155,6 @@ def real_time_mark():
         data = request.get_json()
         
         image = data.get('image')  # Base64 encoded
-        session_id = data.get('session_id')
-        
-        # Optional filters for demo mode (when no session_id)
-        department = data.get('department')
-        year = data.get('year')
-        division = data.get('division')
         
         if not image:
             return jsonify({
@@ -76,44 +162,73 @@ def real_time_mark():
                 'error': 'No image provided'
             }), 400
         
-        # Recognize faces in the image
-        results = recognizer.recognize_from_base64(image, detector)
+        return _mark_frame(
+            lambda roster, roi: recognizer.recognize_from_base64(
+                image, detector, roster=roster, session_id=data.get('session_id'), roi=roi
+            ),
+            session_id=data.get('session_id'),
+            # Optional filters for demo mode (when no session_id)
+            department=data.get('department'),
+            year=data.get('year'),
+            division=data.get('division'),
+            # Opt out of roster scoping and search every enrolled student
+            search_all=_parse_flag(data.get('searchAllStudents'), not Config.CNN_ROSTER_SCOPED),
+            roi=data.get('roi')
+        )
         
-        if not results:
+    except Exception as e:
+        print(f"Error in real-time recognition: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@attendance_bp.route('/api/attendance/real-mark/frame', methods=['POST'])
+def real_time_mark_frame():
+    """
+    Real-time marking from a raw JPEG/WebP frame
+    
+    The body is the encoded frame (application/octet-stream, image/*) or a
+    multipart form with a 'frame' file. Session metadata comes from the query
+    string (session_id, department, year, division, searchAllStudents) or
+    the X-Session-Id, X-Department, X-Year, X-Division, X-Search-All headers.
+    The frame is decoded straight from the request buffer (no base64/JSON).
+    """
+    try:
+        def param(name, header):
+            return request.args.get(name) or request.headers.get(header)
+        
+        if request.content_length and request.content_length > Config.MAX_FRAME_UPLOAD_BYTES:
             return jsonify({
-                'success': True,
-                'message': 'No faces detected',
-                'faces': []
-            }), 200
-        
-        # If session_id is provided, mark attendance
-        if session_id:
-            session = Attendance.get_session(session_id)
-            if not session:
-                return jsonify({
-                    'success': False,
-                    'error': 'Session not found'
-                }), 404
-            
-            # Mark attendance for recognized students
-            for result in results:
-                if result['match']:
-                    student_id = result['match']['studentId']
-                    confidence = result['match']['confidence']
-                    
-                    # Mark attendance
-                    record, error = Attendance.mark_attendance(
-                        session_id, student_id, confidence
-                    )
-                    
-                    if error and error != "Already marked":
-                        print(f"Error marking attendance for {student_id}: {error}")
+                'success': False,
+                'error': 'Frame too large'
+            }), 413
         
-        return jsonify({
-            'success': True,
-            'faces': results,
-            'count': len(results)
-        }), 200
+        if request.mimetype == 'multipart/form-data':
+            frame = request.files.get('frame')
+            buffer = frame.read() if frame else b''
+        else:
+            buffer = request.get_data(cache=False)
+        
+        if not buffer:
+            return jsonify({
+                'success': False,
+                'error': 'No image provided'
+            }), 400
+        
+        session_id = param('session_id', 'X-Session-Id')
+        search_all = _parse_flag(param('searchAllStudents', 'X-Search-All'), not Config.CNN_ROSTER_SCOPED)
+        
+        return _mark_frame(
+            lambda roster, roi: recognizer.recognize_from_bytes(
+                buffer, roster=roster, session_id=session_id, roi=roi
+            ),
+            session_id=session_id,
+            department=param('department', 'X-Department'),
+            year=param('year', 'X-Year'),
+            division=param('division', 'X-Division'),
+            search_all=search_all
+        )
         
     except Exception as e:
         print(f"Error in real-time recognition: {e}")
@@ -156,6 +271,61 @@ def get_session_attendance(session_id):
             'error': str(e)
         }), 500
 
+@attendance_bp.route('/api/attendance/session/<session_id>/roi', methods=['PUT'])
+def set_session_roi(session_id):
+    """Set the camera ROI polygons of a session (null clears them)"""
+    try:
+        data = request.get_json()
+        roi = data.get('roi')
+        
+        session = Attendance.get_session(session_id)
+        if not session:
+            return jsonify({
+                'success': False,
+                'error': 'Session not found'
+            }), 404
+        
+        if roi is not None:
+            try:
+                roi = parse_polygons(roi)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+        
+        Attendance.set_session_roi(session_id, roi)
+        
+        return jsonify({
+            'success': True,
+            'message': 'ROI updated' if roi else 'ROI cleared',
+            'roi': roi
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@attendance_bp.route('/api/attendance/session/<session_id>/pipeline-stats', methods=['GET'])
+def get_session_pipeline_stats(session_id):
+    """Motion-gate and tracker counters of a live session (this worker only)"""
+    try:
+        stats = get_recognizer().session_stats(session_id)
+        
+        return jsonify({
+            'success': True,
+            'sessionId': session_id,
+            'stats': stats
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @attendance_bp.route('/api/attendance/student/<student_id>', methods=['GET'])
 def get_student_attendance(student_id):
     """Get attendance history for a student"""
@@ -0,0 +1,45 @@
+from flask import Blueprint, jsonify
+from models.job import Job
+from face_recognition.service import get_job_queue
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status of a background enrollment/training job"""
+    try:
+        job = Job.find_by_id(job_id)
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': 'Job not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'job': job
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@jobs_bp.route('/api/jobs/train', methods=['POST'])
+def queue_training():
+    """Queue a full retrain of the gallery (merged with an already queued job)"""
+    try:
+        job_id = get_job_queue().submit_train()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Training queued',
+            'jobId': job_id
+        }), 202
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
@@ -0,0 +1,156 @@
+import base64
+import json
+import struct
+import threading
+import time
+from flask import Blueprint
+from flask_sock import Sock
+from models.attendance import Attendance
+from face_recognition.service import get_recognizer
+from config import Config
+
+stream_bp = Blueprint('stream', __name__)
+sock = Sock()
+
+# Binary frames: 4-byte big-endian sequence number followed by the JPEG/WebP bytes
+SEQ_HEADER = struct.Struct('>I')
+
+# Open streams in this worker (see STREAM_MAX_CONNECTIONS)
+_stream_slots = threading.BoundedSemaphore(Config.STREAM_MAX_CONNECTIONS)
+
+
+def _parse_frame(message):
+    """
+    Split a client message into (seq, encoded image bytes)
+
+    Binary messages carry a SEQ_HEADER prefix; text messages are JSON
+    {"seq": n, "image": "<base64 or data URL>"}.
+
+    Returns:
+        (seq, bytes), or (seq, None) for messages without an image
+    """
+    if isinstance(message, (bytes, bytearray)):
+        if len(message) <= SEQ_HEADER.size:
+            return None, None
+        seq, = SEQ_HEADER.unpack_from(message)
+        return seq, memoryview(message)[SEQ_HEADER.size:]
+
+    data = json.loads(message)
+    image = data.get('image')
+    if not image:
+        return data.get('seq'), None
+    if ',' in image:
+        image = image.split(',')[1]
+    return data.get('seq'), base64.b64decode(image)
+
+
+def _send(ws, message_type, **payload):
+    ws.send(json.dumps(dict(payload, type=message_type)))
+
+
+@sock.route('/ws/attendance/session/<session_id>', bp=stream_bp)
+def session_stream(ws, session_id):
+    """
+    Streaming recognition for a live session
+
+    The client pushes frames; the server answers every processed frame with
+    {"type": "result", "seq", "faces", "count", "elapsedMs", "dropped"} and
+    sends {"type": "marked", "seq", "students"} when students are newly
+    marked present. Frames that arrive while one is being processed are
+    dropped except the newest, so results never lag behind the camera.
+    """
+    if not _stream_slots.acquire(blocking=False):
+        _send(ws, 'error', error='Too many open streams, use the HTTP endpoints')
+        return
+    try:
+        _session_stream(ws, session_id)
+    finally:
+        _stream_slots.release()
+
+
+def _session_stream(ws, session_id):
+    # Looked up once per connection (the ROI every STREAM_SESSION_REFRESH seconds)
+    session = Attendance.get_session(session_id)
+    if not session:
+        _send(ws, 'error', error='Session not found')
+        return
+
+    recognizer = get_recognizer()
+    roster = None
+    if Config.CNN_ROSTER_SCOPED:
+        roster = (session.get('department'), session.get('year'), session.get('division'))
+    roi = session.get('roi')
+    session_loaded = time.monotonic()
+    marked = {record['studentId'] for record in Attendance.get_session_attendance(session_id)}
+
+    _send(ws, 'ready', sessionId=session_id, marked=sorted(marked))
+    print(f"✅ Stream opened for session {session_id}")
+
+    frames = 0
+    try:
+        while True:
+            message = ws.receive(timeout=Config.STREAM_IDLE_TIMEOUT)
+            if message is None:
+                _send(ws, 'error', error='Idle timeout')
+                break
+
+            # Everything queued while the last frame was processed; only the newest frame is kept
+            messages = [message]
+            while True:
+                message = ws.receive(timeout=0)
+                if message is None:
+                    break
+                messages.append(message)
+
+            frame = None
+            dropped = 0
+            for message in messages:
+                try:
+                    seq, buffer = _parse_frame(message)
+                except (ValueError, TypeError) as e:
+                    _send(ws, 'error', error=f'Bad frame: {e}')
+                    continue
+                if buffer is None:
+                    _send(ws, 'error', seq=seq, error='No image provided')
+                    continue
+                dropped += frame is not None
+                frame = (seq, buffer)
+            if frame is None:
+                continue
+            seq, buffer = frame
+
+            # Pick up ROI changes (PUT .../roi) made while the stream is open
+            if time.monotonic() - session_loaded >= Config.STREAM_SESSION_REFRESH:
+                session = Attendance.get_session(session_id) or session
+                roi = session.get('roi')
+                session_loaded = time.monotonic()
+
+            start = time.perf_counter()
+            try:
+                results = recognizer.recognize_from_bytes(buffer, roster=roster, session_id=session_id, roi=roi)
+            except Exception as e:
+                print(f"Error in streamed recognition: {e}")
+                _send(ws, 'error', seq=seq, error=str(e))
+                continue
+            frames += 1
+
+            _send(ws, 'result', seq=seq, faces=results, count=len(results), dropped=dropped,
+                  elapsedMs=round((time.perf_counter() - start) * 1000, 1))
+
+            newly_marked = []
+            for result in results:
+                match = result['match']
+                if not match or match['studentId'] in marked:
+                    continue
+                record, error = Attendance.mark_attendance(session_id, match['studentId'], match['confidence'])
+                if error and error != "Already marked":
+                    print(f"Error marking attendance for {match['studentId']}: {error}")
+                    continue
+                marked.add(match['studentId'])
+                if not error:
+                    newly_marked.append(match)
+
+            if newly_marked:
+                _send(ws, 'marked', seq=seq, students=newly_marked)
+    finally:
+        print(f"ℹ️  Stream closed for session {session_id} after {frames} frames")
@@ -1,8 +1,7 @@
 from flask import Blueprint, request, jsonify
 from models.student import Student
 from face_recognition.detector import FaceDetector
-from face_recognition.cnn_recognizer import CNNFaceRecognizer
-from face_recognition.mtcnn_detector import get_face_detector
+from face_recognition.service import get_recognizer, get_detector, get_job_queue, unenroll_student
 from config import Config
 import os
 import base64
@@ -12,9 +11,9 @@ from datetime import datetime
 
 students_bp = Blueprint('students', __name__)
 
-# Initialize face detector and recognizer (CNN-based)
-detector = get_face_detector()
-recognizer = CNNFaceRecognizer()
+# Shared face detector and recognizer (CNN-based, one instance per process)
+detector = get_detector()
+recognizer = get_recognizer()
 
 @students_bp.route('/api/students/register', methods=['POST'])
 def register_student():
@@ -84,7 +83,7 @@ def register_student():
                 if len(faces) > 0:
                     # Extract the largest face (RGB, 160x160 for CNN)
                     largest_face = max(faces, key=lambda box: box[2] * box[3])
-                    face_img = detector.extract_face(img, largest_face, output_size=160)
+                    face_img = detector.extract_faces(img, [largest_face], output_size=160)[0]
                     # Convert RGB to BGR for saving with OpenCV
                     face_img = cv2.cvtColor(face_img, cv2.COLOR_RGB2BGR)
                     print(f"Face detected in image {idx}, size: {largest_face[2]}x{largest_face[3]}")
@@ -128,14 +127,29 @@ def register_student():
                 'error': 'No valid face images could be processed'
             }), 400
         
-        # Retrain the recognition model automatically
-        print(f"🔄 Auto-training model with {len(saved_images)} new images...")
-        success, message = recognizer.train(force_retrain=True)
+        if Config.BACKGROUND_JOBS:
+            # Embed in the background; poll /api/jobs/<jobId> for the result
+            job_id = get_job_queue().submit_enroll(student_id, saved_images)
+            print(f"🔄 Queued enrollment of {len(saved_images)} images (job {job_id})")
+            
+            return jsonify({
+                'success': True,
+                'message': f'Student registered with {len(saved_images)} face images',
+                'student': student,
+                'modelTraining': {
+                    'status': 'queued',
+                    'jobId': job_id
+                }
+            }), 202
+        
+        # Enroll only this student's embeddings (no full retrain)
+        print(f"🔄 Enrolling {len(saved_images)} new images...")
+        success, message = recognizer.add_student(student_id, saved_images)
         
         if success:
-            print(f"✅ Model trained successfully: {message}")
+            print(f"✅ Student enrolled successfully: {message}")
         else:
-            print(f"⚠️  Model training failed: {message}")
+            print(f"⚠️  Student enrollment failed: {message}")
         
         return jsonify({
             'success': True,
@@ -244,8 +258,8 @@ def delete_student(student_id):
                 'error': 'Student not found'
             }), 404
         
-        # Retrain model after deletion
-        recognizer.train(force_retrain=True)
+        # Drop the student from a queued enrollment and their rows from the gallery
+        unenroll_student(student_id)
         
         return jsonify({
             'success': True,
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""Check IVF candidate search against exact (brute-force) gallery search
+
+Synthetic FaceNet-like gallery (see benchmark_ann.py): recall@1 of the
+IVF search at the configured nprobe must stay close to exact search, both
+right after the build and after new students are inserted into the index
+without retraining the centroids. The recognizer must build the index off
+the store lock and install it once it is saved.
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+
+# Throwaway gallery store for the recognizer check
+tmp_dir = tempfile.mkdtemp(prefix='attendance-ivf-')
+Config.JSON_STORAGE_PATH = os.path.join(tmp_dir, 'storage')
+Config.GALLERY_STORE_PATH = os.path.join(tmp_dir, 'gallery')
+Config.EMBEDDINGS_PATH = os.path.join(tmp_dir, 'face_embeddings.pkl')
+Config.ANN_INDEX_PATH = os.path.join(Config.GALLERY_STORE_PATH, 'ivf_index.npz')
+os.makedirs(Config.JSON_STORAGE_PATH)
+
+from face_recognition.gallery import EmbeddingGallery, l2_normalize
+from face_recognition.ann_index import IVFIndex
+from face_recognition.embedding_store import EmbeddingStore
+
+DIM = 512
+SHOTS_PER_STUDENT = 5
+NOISE = 0.6
+NUM_QUERIES = 300
+MIN_RECALL = 0.95
+
+
+def make_students(rng, n_students):
+    """(identities, enrollment rows) of n_students synthetic students"""
+    identities = l2_normalize(rng.standard_normal((n_students, DIM), dtype=np.float32))
+    shots = np.repeat(identities, SHOTS_PER_STUDENT, axis=0)
+    noise = rng.standard_normal(shots.shape, dtype=np.float32) * (NOISE / np.sqrt(DIM))
+    return identities, l2_normalize(shots + noise)
+
+
+def make_queries(rng, identities, count):
+    picked = rng.choice(len(identities), size=count, replace=False)
+    noise = rng.standard_normal((count, DIM), dtype=np.float32) * (NOISE / np.sqrt(DIM))
+    return l2_normalize(identities[picked] + noise)
+
+
+def recall(gallery, index, queries, nprobe):
+    """Share of queries whose IVF top-1 student equals the exact top-1"""
+    hits = 0
+    for query in queries:
+        exact = gallery.search(query, k=1)[0][0]
+        approx = gallery.search_rows(query, index.candidates(query, nprobe), k=1)
+        hits += bool(approx) and approx[0][0] == exact
+    return hits / len(queries)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    nprobe = Config.CNN_ANN_NPROBE
+    failures = []
+
+    def check(condition, message):
+        print(f"{'✅' if condition else '❌'} {message}")
+        if not condition:
+            failures.append(message)
+
+    print("=" * 60)
+    print("Testing IVF Index Recall")
+    print("=" * 60)
+
+    identities, matrix = make_students(rng, 4000)
+    row_labels = np.repeat(np.arange(len(identities), dtype=np.int32), SHOTS_PER_STUDENT)
+    labels = [f"S{i:06d}" for i in range(len(identities))]
+    gallery = EmbeddingGallery(matrix, row_labels, labels)
+
+    index = IVFIndex.build(gallery.matrix, nprobe=nprobe)
+    check(len(index) == len(gallery), f"Index covers all {len(gallery):,} rows ({index.n_lists} lists)")
+
+    queries = make_queries(rng, identities, NUM_QUERIES)
+    value = recall(gallery, index, queries, nprobe)
+    check(value >= MIN_RECALL, f"Recall@1 at nprobe={nprobe}: {value:.3f} (>= {MIN_RECALL})")
+    value = recall(gallery, index, queries[:50], index.n_lists)
+    check(value == 1.0, f"Probing every list matches exact search ({value:.3f})")
+
+    # New students are only inserted; the centroids are not retrained
+    new_identities, new_rows = make_students(rng, 1000)
+    matrix = np.vstack([matrix, new_rows])
+    row_labels = np.concatenate([row_labels, np.repeat(
+        np.arange(len(labels), len(labels) + len(new_identities), dtype=np.int32), SHOTS_PER_STUDENT)])
+    labels = labels + [f"S{i:06d}" for i in range(len(labels), len(labels) + len(new_identities))]
+    gallery = EmbeddingGallery(matrix, row_labels, labels)
+    index.insert(new_rows)
+    check(len(index) == len(gallery), f"Inserted rows extend the index to {len(index):,} rows")
+
+    value = recall(gallery, index, make_queries(rng, new_identities, NUM_QUERIES), nprobe)
+    check(value >= MIN_RECALL, f"Recall@1 for inserted students: {value:.3f} (>= {MIN_RECALL})")
+
+    # Saved and reloaded index returns the same candidates
+    path = os.path.join(tmp_dir, 'ivf_index.npz')
+    index.save(path)
+    loaded = IVFIndex.load(path)
+    same = loaded is not None and all(
+        np.array_equal(np.sort(index.candidates(q, nprobe)), np.sort(loaded.candidates(q, nprobe)))
+        for q in queries[:20])
+    check(same, "Reloaded index returns the same candidates")
+
+    # Recognizer: the k-means build runs off the store lock, exact search meanwhile
+    store = EmbeddingStore(Config.GALLERY_STORE_PATH)
+    with store.locked():
+        store.write_snapshot(gallery)
+    Config.CNN_ANN_INDEX = 'ivf'
+    Config.CNN_ANN_MIN_ROWS = 1000
+    from face_recognition.cnn_recognizer import CNNFaceRecognizer
+    recognizer = CNNFaceRecognizer()
+    build = recognizer._ann_build
+    check(recognizer.ann_index is None and build is not None and build.is_alive(),
+          "Missing index is built in the background (exact search meanwhile)")
+
+    start = time.perf_counter()
+    with store.locked():
+        waited = time.perf_counter() - start
+    check(build.is_alive() and waited < 0.5, f"Store lock is free during the build (waited {waited * 1000:.1f} ms)")
+    check(recognizer.search_gallery(queries[0])[0][0] == gallery.search(queries[0])[0][0],
+          "Exact search answers while the index is built")
+
+    build.join(120)
+    recognizer.refresh_if_stale()
+    check(recognizer.ann_index is not None and len(recognizer.ann_index) == len(recognizer.gallery),
+          "Saved index is installed on the next refresh")
+
+    # An append only inserts the new rows into the installed index
+    extra_identity, extra_rows = make_students(rng, 1)
+    with store.locked():
+        store.append('S-new', list(extra_rows))
+    recognizer.refresh_if_stale()
+    index = recognizer.ann_index
+    check(index is not None and len(index) == len(recognizer.gallery) and recognizer._ann_build is build,
+          "Appended rows extend the index without a rebuild")
+    query = make_queries(rng, extra_identity, 1)[0]
+    check(recognizer.search_gallery(query)[0][0] == 'S-new', "Appended student is found through the index")
+
+    print("=" * 60)
+    if failures:
+        print(f"❌ {len(failures)} check(s) failed")
+        return 1
+    print("✅ All IVF index checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        status = main()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    sys.exit(status)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+"""Check appending, removing and re-adding students in the on-disk gallery
+
+Each step goes through a fresh EmbeddingStore on the same directory (as
+another worker process would) and compares the opened gallery with the
+embeddings that were written. Runs for the float32 store and the int8
+quantized column. Files of a replaced generation must outlive the snapshot
+that replaced them, and files that cannot be deleted yet are retried.
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from face_recognition.embedding_store import EmbeddingStore, DATA_FILES
+from face_recognition.gallery import EmbeddingGallery, l2_normalize
+
+DIM = 64
+
+
+def data_files(store):
+    """Data file names of the store's current generation"""
+    header = store.read_header()
+    return [header[key] for key in DATA_FILES if header.get(key)]
+
+
+def faces(rng, count):
+    return l2_normalize(rng.normal(size=(count, DIM))).astype(np.float32)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    tmp_dir = tempfile.mkdtemp(prefix='attendance-store-')
+    failures = []
+
+    def check(condition, message):
+        print(f"{'✅' if condition else '❌'} {message}")
+        if not condition:
+            failures.append(message)
+
+    def same(gallery, expected):
+        stored = gallery.to_dict()
+        return (sorted(stored) == sorted(expected)
+                and all(np.allclose(np.vstack(stored[sid]), expected[sid], atol=1e-6) for sid in expected))
+
+    print("=" * 60)
+    print("Testing Embedding Store")
+    print("=" * 60)
+
+    try:
+        for precision in ('float32', 'int8'):
+            store_dir = os.path.join(tmp_dir, precision)
+            store = EmbeddingStore(store_dir, dim=DIM, precision=precision)
+            expected = {sid: faces(rng, 3) for sid in ('S1', 'S2', 'S3')}
+
+            with store.locked():
+                version = store.write_snapshot(EmbeddingGallery.from_dict(
+                    {sid: list(rows) for sid, rows in expected.items()}, dim=DIM))
+            gallery, opened = EmbeddingStore(store_dir, dim=DIM, precision=precision).open_gallery()
+            check(opened == version and same(gallery, expected), f"{precision}: snapshot reopens unchanged")
+
+            # Append a new student and more shots of an enrolled one
+            expected['S4'] = faces(rng, 2)
+            extra = faces(rng, 2)
+            expected['S2'] = np.vstack([expected['S2'], extra])
+            with store.locked():
+                first = store.append('S4', list(expected['S4']))
+                second = store.append('S2', list(extra))
+            gallery, opened = EmbeddingStore(store_dir, dim=DIM, precision=precision).open_gallery()
+            check(first == version + 1 and second == version + 2 and opened == second,
+                  f"{precision}: each append bumps the version")
+            check(same(gallery, expected), f"{precision}: appended rows are stored")
+
+            # Remove (tombstone only)
+            with store.locked():
+                removed = store.remove('S2')
+                missing = store.remove('S9')
+            del expected['S2']
+            gallery, opened = EmbeddingStore(store_dir, dim=DIM, precision=precision).open_gallery()
+            check(removed == second + 1 and missing is None, f"{precision}: remove bumps the version once")
+            check('S2' not in gallery and same(gallery, expected), f"{precision}: removed student is gone")
+            check(abs(store.dead_fraction() - 5 / 13) < 1e-9, f"{precision}: tombstoned rows are counted")
+            match, _ = gallery.search(expected['S1'][0], k=1)[0]
+            check(match == 'S1', f"{precision}: search skips tombstoned rows")
+
+            # Re-add gets a fresh label; the old rows stay dead
+            expected['S2'] = faces(rng, 3)
+            with store.locked():
+                readded = store.append('S2', list(expected['S2']))
+            gallery, opened = EmbeddingStore(store_dir, dim=DIM, precision=precision).open_gallery()
+            check(opened == readded and same(gallery, expected), f"{precision}: re-added student has only the new rows")
+            check(gallery.search(expected['S2'][1], k=1)[0][0] == 'S2', f"{precision}: re-added student matches")
+
+            # Compaction drops the tombstoned rows
+            first_files = data_files(store)
+            with store.locked():
+                compacted = store.write_snapshot(gallery)
+            gallery, opened = EmbeddingStore(store_dir, dim=DIM, precision=precision).open_gallery()
+            check(opened == compacted and len(gallery) == 11 and store.dead_fraction() == 0.0,
+                  f"{precision}: snapshot compacts the store")
+            check(same(gallery, expected), f"{precision}: compacted gallery is unchanged")
+            check(all(os.path.exists(os.path.join(store_dir, name)) for name in first_files),
+                  f"{precision}: replaced generation stays on disk after one snapshot")
+
+            # The next snapshot deletes it; a file still in use (PermissionError on Windows) waits
+            second_files = data_files(store)
+            stuck = second_files[0]
+            remove = os.remove
+
+            def remove_unless_stuck(path):
+                if os.path.basename(path) == stuck:
+                    raise PermissionError(path)
+                remove(path)
+
+            os.remove = remove_unless_stuck
+            try:
+                with store.locked():
+                    store.write_snapshot(gallery)
+                with store.locked():
+                    store.write_snapshot(gallery)
+            finally:
+                os.remove = remove
+            check(not any(os.path.exists(os.path.join(store_dir, name)) for name in first_files),
+                  f"{precision}: retired generation is deleted by the next snapshot")
+            check(os.path.exists(os.path.join(store_dir, stuck)) and stuck in store.read_header()['retired'],
+                  f"{precision}: file that could not be deleted stays retired")
+            with store.locked():
+                store.write_snapshot(gallery)
+            check(not any(os.path.exists(os.path.join(store_dir, name)) for name in second_files),
+                  f"{precision}: it is deleted once it is no longer in use")
+            gallery, _ = EmbeddingStore(store_dir, dim=DIM, precision=precision).open_gallery()
+            check(same(gallery, expected), f"{precision}: gallery is unchanged after the snapshots")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print("=" * 60)
+    if failures:
+        print(f"❌ {len(failures)} check(s) failed")
+        return 1
+    print("✅ All embedding store checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
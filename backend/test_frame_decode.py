@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""Check reduced-resolution decoding and box mapping back to the full frame
+
+A bright rectangle is drawn at a known full-resolution position, located
+in the reduced detection image, and mapped back with EncodedFrame.to_full.
+Covers 720p / 1080p / 4K frames and a sideways phone JPEG (EXIF
+orientation 6), which cv2.imdecode rotates on decode.
+"""
+
+import io
+import sys
+import os
+import cv2
+import numpy as np
+from PIL import Image
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from face_recognition.frame_decode import EncodedFrame
+
+MIN_SIDE = 480
+
+
+def encode(image, orientation=None):
+    """JPEG bytes of a BGR image, optionally tagged with an EXIF orientation"""
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)).save(buffer, 'JPEG', quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+def bright_box(image):
+    """[x, y, w, h] of the pixels brighter than mid-gray"""
+    ys, xs = np.nonzero(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) > 128)
+    return [int(xs.min()), int(ys.min()), int(xs.max() - xs.min() + 1), int(ys.max() - ys.min() + 1)]
+
+
+def main():
+    failures = []
+
+    def check(condition, message):
+        print(f"{'✅' if condition else '❌'} {message}")
+        if not condition:
+            failures.append(message)
+
+    print("=" * 60)
+    print("Testing Reduced-Resolution Decode")
+    print("=" * 60)
+
+    for label, width, height, factor in (('720p', 1280, 720, 1), ('1080p', 1920, 1080, 2), ('4K', 3840, 2160, 4)):
+        image = np.zeros((height, width, 3), dtype=np.uint8)
+        expected = [width // 3, height // 4, height // 5, height // 4]
+        x, y, w, h = expected
+        image[y:y + h, x:x + w] = 255
+
+        frame = EncodedFrame(encode(image), MIN_SIDE)
+        check(frame.factor == factor, f"{label}: decoded at 1/{frame.factor} (expected 1/{factor})")
+        check(frame.full().shape == image.shape, f"{label}: full() is the full-resolution frame")
+
+        mapped = frame.to_full([bright_box(frame.image)])[0]
+        error = max(abs(a - b) for a, b in zip(mapped, expected))
+        check(error <= 2 * factor, f"{label}: box {mapped} maps back to {expected} (off by {error}px)")
+
+    # Stored 4032x3024 landscape, displayed as 3024x4032 portrait
+    stored = np.zeros((3024, 4032, 3), dtype=np.uint8)
+    stored[600:1400, 2000:2600] = 255
+    frame = EncodedFrame(encode(stored, orientation=6), MIN_SIDE)
+    full = frame.full()
+    check(full.shape[:2] == (4032, 3024), "EXIF 6: full() is rotated upright")
+    check(abs(frame.scale - full.shape[1] / frame.image.shape[1]) < 1e-6,
+          f"EXIF 6: scale {frame.scale:.3f} matches the decoded ratio")
+
+    mapped = frame.to_full([bright_box(frame.image)])[0]
+    expected = bright_box(full)
+    error = max(abs(a - b) for a, b in zip(mapped, expected))
+    check(error <= 2 * frame.factor, f"EXIF 6: box {mapped} maps back to {expected} (off by {error}px)")
+
+    print("=" * 60)
+    if failures:
+        print(f"❌ {len(failures)} check(s) failed")
+        return 1
+    print("✅ All frame decode checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
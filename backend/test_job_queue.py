@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""Check enrollment/deletion through the background job queue
+
+Runs against a throwaway JSON store and gallery in a temp directory:
+students deleted while their enrollment is running or still queued must
+not end up in the gallery, an enrollment job must store the same
+embeddings a full retrain computes for that student, and a retrain must not
+undo deletions or enrollments made while it runs.
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+import cv2
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+
+# Point every store at a temp directory before the database is created
+tmp_dir = tempfile.mkdtemp(prefix='attendance-jobs-')
+Config.JSON_STORAGE_PATH = os.path.join(tmp_dir, 'storage')
+Config.FACE_IMAGES_FOLDER = os.path.join(tmp_dir, 'faces')
+Config.GALLERY_STORE_PATH = os.path.join(tmp_dir, 'gallery')
+Config.EMBEDDINGS_PATH = os.path.join(tmp_dir, 'face_embeddings.pkl')
+Config.ANN_INDEX_PATH = os.path.join(Config.GALLERY_STORE_PATH, 'ivf_index.npz')
+Config.RESULT_CACHE = False
+os.makedirs(Config.JSON_STORAGE_PATH)
+
+from models.student import Student
+from models.job import Job
+from face_recognition.service import get_recognizer, get_job_queue, unenroll_student
+
+
+def register(student_id, seed):
+    """Create a student with three saved synthetic face images"""
+    Student.create(f'Student {student_id}', student_id, 'CS', '3', 'A')
+    folder = os.path.join(Config.FACE_IMAGES_FOLDER, student_id)
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for idx in range(3):
+        path = os.path.join(folder, f'{student_id}_{idx}.jpg')
+        cv2.imwrite(path, rng.integers(0, 255, (160, 160, 3), dtype=np.uint8))
+        Student.add_face_image(student_id, path)
+        paths.append(path)
+    return paths
+
+
+def wait_for(job_id, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = Job.find_by_id(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(f'Job {job_id} did not finish')
+
+
+def main():
+    recognizer = get_recognizer()
+    queue = get_job_queue()
+    failures = []
+
+    def check(condition, message):
+        print(f"{'✅' if condition else '❌'} {message}")
+        if not condition:
+            failures.append(message)
+
+    print("=" * 60)
+    print("Testing Job Queue Enrollment")
+    print("=" * 60)
+
+    # Hold the first job inside add_students so later requests stay queued
+    release = threading.Event()
+    started = threading.Event()
+    add_students = recognizer.add_students
+
+    def held_add_students(students):
+        started.set()
+        release.wait()
+        return add_students(students)
+
+    recognizer.add_students = held_add_students
+
+    running_job = queue.submit_enroll('S1', register('S1', 1))
+    started.wait(30)
+    queued_job = queue.submit_enroll('S2', register('S2', 2))
+    check(queue.submit_enroll('S3', register('S3', 3)) == queued_job, "Queued enrollments merge into one job")
+
+    # S1 is being enrolled, S2 is waiting in the queued job
+    for student_id in ('S1', 'S2'):
+        Student.delete(student_id)
+        unenroll_student(student_id)
+    check(Job.find_by_id(queued_job)['studentIds'] == ['S3'], "Deleted student dropped from the queued job")
+
+    release.set()
+    wait_for(running_job)
+    wait_for(queued_job)
+    recognizer.add_students = add_students
+
+    gallery = recognizer.gallery
+    check('S1' not in gallery, "Student deleted during a running job is not enrolled")
+    check('S2' not in gallery, "Student deleted while queued is not enrolled")
+    check('S3' in gallery, "Remaining student is enrolled")
+
+    # Same crops (and embeddings) as a full retrain
+    enrolled = np.asarray(gallery.to_dict()['S3'])
+    wait_for(queue.submit_train())
+    retrained = np.asarray(recognizer.gallery.to_dict()['S3'])
+    check(enrolled.shape == retrained.shape and np.allclose(enrolled, retrained, atol=1e-3),
+          "Enrollment job and retraining store the same embeddings")
+
+    # Delete and enroll while a retrain is embedding (its snapshot must not undo either)
+    held_paths = register('S4', 4)
+    load_enrolled_faces = recognizer.load_enrolled_faces
+    release.clear()
+    started.clear()
+
+    def held_load_enrolled_faces(paths):
+        if paths == held_paths:  # S3 is already embedded by then
+            started.set()
+            release.wait()
+        return load_enrolled_faces(paths)
+
+    recognizer.load_enrolled_faces = held_load_enrolled_faces
+    train_job = queue.submit_train()
+    started.wait(30)
+    Student.delete('S3')
+    unenroll_student('S3')
+    recognizer.add_students({'S5': register('S5', 5)})
+    release.set()
+    wait_for(train_job)
+    recognizer.load_enrolled_faces = load_enrolled_faces
+
+    gallery = recognizer.gallery
+    check('S3' not in gallery, "Student deleted during a retrain stays deleted")
+    check('S5' in gallery, "Student enrolled during a retrain stays enrolled")
+    check('S4' in gallery, "Retrain enrolls the students it read")
+
+    print("=" * 60)
+    if failures:
+        print(f"❌ {len(failures)} check(s) failed")
+        return 1
+    print("✅ All job queue checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        status = main()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    sys.exit(status)
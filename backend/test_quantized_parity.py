@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+"""Check quantized gallery parity on a synthetic evaluation set
+
+Records the synthetic FaceNet-like set of check_quantized_parity.py into a
+temp directory (the enrolled gallery is never read) and requires float16
+and int8 scans to make the same match / no-match decisions as float32.
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+import check_quantized_parity
+
+
+def main():
+    tmp_dir = tempfile.mkdtemp(prefix='attendance-parity-')
+    try:
+        # Empty store, so record() falls back to the synthetic set
+        Config.GALLERY_STORE_PATH = os.path.join(tmp_dir, 'gallery')
+        path = os.path.join(tmp_dir, 'quantized_eval_set.npz')
+        check_quantized_parity.record(path)
+        return check_quantized_parity.check(path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
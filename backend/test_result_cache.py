@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""Check that the frame result cache never serves a result for a changed scene
+
+A synthetic classroom frame is cached; re-uploads of it (JPEG re-encoded)
+must hit, while the same frame with one small face stepped into it must
+miss, also when its perceptual hash stays within RESULT_CACHE_MAX_DISTANCE
+bits. Runs on the ResultCache and through CNNFaceRecognizer.recognize_image.
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import time
+import cv2
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+
+# Throwaway gallery; the cache is switched on for this check only
+tmp_dir = tempfile.mkdtemp(prefix='attendance-cache-')
+Config.JSON_STORAGE_PATH = os.path.join(tmp_dir, 'storage')
+Config.GALLERY_STORE_PATH = os.path.join(tmp_dir, 'gallery')
+Config.EMBEDDINGS_PATH = os.path.join(tmp_dir, 'face_embeddings.pkl')
+Config.ANN_INDEX_PATH = os.path.join(Config.GALLERY_STORE_PATH, 'ivf_index.npz')
+Config.RESULT_CACHE = True
+Config.MOTION_GATING = False
+os.makedirs(Config.JSON_STORAGE_PATH)
+
+from face_recognition.result_cache import ResultCache, perceptual_hash, thumbnail, hamming_distance
+from face_recognition.cnn_recognizer import CNNFaceRecognizer
+from benchmark_decode import synthetic_frame
+
+
+def decode(data):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def reencode(image, quality):
+    ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return decode(encoded.tobytes())
+
+
+def with_face(image, x, y, width=44, height=56):
+    """Copy of the frame with a small drawn face (a student at the back of the room)"""
+    image = image.copy()
+    center = (x + width // 2, y + height // 2)
+    cv2.ellipse(image, center, (width // 2, height // 2), 0, 0, 360, (120, 160, 210), -1)
+    for dx in (-width // 5, width // 5):
+        cv2.circle(image, (center[0] + dx, center[1] - height // 8), max(2, width // 12), (40, 40, 60), -1)
+    cv2.ellipse(image, (center[0], center[1] + height // 4), (width // 6, height // 16), 0, 0, 360, (60, 60, 120), -1)
+    return image
+
+
+def main():
+    failures = []
+
+    def check(condition, message):
+        print(f"{'✅' if condition else '❌'} {message}")
+        if not condition:
+            failures.append(message)
+
+    print("=" * 60)
+    print("Testing Frame Result Cache")
+    print("=" * 60)
+
+    frame = decode(synthetic_frame(1280, 720))
+    resent = reencode(frame, 80)
+    changed = [with_face(frame, x, y) for x, y in ((1100, 80), (620, 330), (40, 600))]
+
+    cache = ResultCache(ttl=Config.RESULT_CACHE_TTL, max_distance=Config.RESULT_CACHE_MAX_DISTANCE,
+                        max_pixel_delta=Config.RESULT_CACHE_MAX_PIXEL_DELTA)
+    scope = ('frame', 'session-1')
+    frame_hash = perceptual_hash(frame, hash_size=16)
+    cache.put(scope, frame_hash, 'no match', thumbnail(frame))
+
+    check(cache.get(scope, perceptual_hash(resent, hash_size=16), thumbnail(resent)) == 'no match',
+          "Re-encoded frame is served from the cache")
+
+    for idx, image in enumerate(changed):
+        image_hash = perceptual_hash(image, hash_size=16)
+        distance = hamming_distance(frame_hash, image_hash)
+        check(cache.get(scope, image_hash, thumbnail(image)) is None,
+              f"Frame with a small face #{idx + 1} misses (hash {distance} bits away)")
+
+    expiring = ResultCache(ttl=0.05)
+    expiring.put(scope, frame_hash, 'no match', thumbnail(frame))
+    time.sleep(0.1)
+    check(expiring.get(scope, frame_hash, thumbnail(frame)) is None, "Entries expire after the TTL")
+
+    # Same behaviour through the recognizer's frame cache
+    recognizer = CNNFaceRecognizer()
+    recognizer.recognize_image(frame, session_id='session-1')
+    recognizer.recognize_image(resent, session_id='session-1')
+    stats = recognizer.cache_stats()
+    check(stats['hits'] == 1, f"Recognizer reuses the result for a re-sent frame ({stats['hits']} hit)")
+    for image in changed:
+        recognizer.recognize_image(image, session_id='session-1')
+    stats = recognizer.cache_stats()
+    check(stats['hits'] == 1 and stats['misses'] == 1 + len(changed),
+          f"Recognizer re-runs recognition for every changed frame ({stats['misses']} misses)")
+
+    print("=" * 60)
+    if failures:
+        print(f"❌ {len(failures)} check(s) failed")
+        return 1
+    print("✅ All result cache checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        status = main()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    sys.exit(status)
@@ -26,8 +26,8 @@ success, message = recognizer.train(force_retrain=True)
 
 if success:
     print(f"✅ {message}")
-    print(f"\nEmbeddings saved to: {Config.EMBEDDINGS_PATH}")
-    print(f"Number of students: {len(recognizer.embeddings)}")
+    print(f"\nEmbeddings saved to: {Config.GALLERY_STORE_PATH}")
+    print(f"Number of students: {recognizer.gallery.num_students}")
 else:
     print(f"❌ {message}")
     sys.exit(1)
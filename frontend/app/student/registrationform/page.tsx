@@ -43,6 +43,18 @@ export default function StudentRegistrationPage() {
     setStep(3);
   };
 
+  const waitForJob = async (jobId: string) => {
+    for (let attempt = 0; attempt < 60; attempt++) {
+      const res = await fetch(`http://localhost:5000/api/jobs/${jobId}`);
+      const data = await res.json();
+      if (data.success && (data.job.status === "done" || data.job.status === "failed")) {
+        return data.job;
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+    return null;
+  };
+
   const handleSubmit = async () => {
     if (faceImages.length < 3) {
       setStatus("Please capture at least 3 face images");
@@ -64,7 +76,19 @@ export default function StudentRegistrationPage() {
 
       const data = await res.json();
 
-      if (data.success) {
+      if (data.success && data.modelTraining?.jobId) {
+        // BACKGROUND_JOBS: the faces are enrolled by a queued job (202)
+        setStatus("Enrolling face images...");
+        const job = await waitForJob(data.modelTraining.jobId);
+        setStatus(
+          job?.status === "done"
+            ? "✅ Student registered successfully!"
+            : `⚠️ Student registered, but face enrollment ${job ? `failed: ${job.message}` : "is still running"}`
+        );
+        setTimeout(() => {
+          router.push("/teacher/dashboard");
+        }, 2000);
+      } else if (data.success) {
         setStatus("✅ Student registered successfully!");
         setTimeout(() => {
           router.push("/teacher/dashboard");